@@ -3,20 +3,51 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from config import Config
+from app.cache import ResponseCache
+from app.pool import build_engine_options, init_pool_monitor
+from app.instrumentation import init_instrumentation
+from app.json_provider import FastJSONProvider
+from app.replicas import RoutingSession, ReplicaRouter
 
 # Inicializa as extensões, mas sem associá-las a uma aplicação ainda
-db = SQLAlchemy()
+# A sessão escolhe o engine de cada consulta (primário ou réplica).
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
+cache = ResponseCache()
+replicas = ReplicaRouter()
 
 def create_app(config_class=Config):
     # Cria a instância da aplicação Flask
     app = Flask(__name__)
     # Carrega as configurações do nosso arquivo config.py
     app.config.from_object(config_class)
+    # JSON provider com codificador rápido opcional (orjson).
+    app.json = FastJSONProvider(app)
+    # Opções do engine (pool, pre-ping, statement timeout) calculadas
+    # a partir das chaves DB_* do Config.
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
 
     # Associa as extensões à instância da aplicação
     db.init_app(app)
     migrate.init_app(app, db)
+    cache.init_app(app)
+    init_pool_monitor(app, db)
+    # Tempo por rota, contagem de SQL, consultas lentas e GET /metrics.
+    init_instrumentation(app, db)
+    # Engines das réplicas de leitura (depois da instrumentação, para
+    # que as consultas nelas também sejam medidas).
+    replicas.init_app(app)
+    # Rate limit por cliente e limite de concorrência das rotas caras
+    # (depois da instrumentação, para que os 429/503 também sejam medidos).
+    from app.admission import init_admission_control
+    init_admission_control(app)
+    # Compressão gzip/brotli negociada pelo Accept-Encoding (registrada
+    # por último: roda antes da instrumentação, que mede o tempo dela).
+    from app.compression import init_compression
+    init_compression(app)
+    # Escritor do group commit (opcional; ver app/group_commit.py).
+    from app.group_commit import init_group_commit
+    init_group_commit(app, db)
 
     # -----------------------------------------------------------------
     # REGISTRO DO BLUEPRINT (PASSO CHAVE)
@@ -0,0 +1,332 @@
+# app/admission.py
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from flask import g, request, jsonify
+
+from app import auth
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------------------------------------------
+# Controle de Admissão (Rate Limiting e Descarte de Carga)
+# -----------------------------------------------------------------
+# Em um pico de tráfego, listagens e exportações simultâneas sem
+# limite esgotam as conexões do pool e a latência desaba para todos.
+# Antes de qualquer rota da API (e antes da autenticação, que já
+# consulta o banco), cada requisição passa por duas barreiras:
+#
+#   1. Rate limit por cliente (token bucket): cada cliente (o hash do
+#      token Bearer ou, sem token, o IP) ganha RATE_LIMIT_PER_SECOND
+#      fichas por segundo, acumulando até RATE_LIMIT_BURST. Sem ficha,
+#      a resposta é 429 com 'Retry-After' (o tempo até a próxima).
+#      Os baldes ficam na memória do processo ou, com
+#      RATE_LIMIT_BACKEND='redis', em um Redis compartilhado.
+#
+#   2. Limite de concorrência das rotas caras (EXPENSIVE_ENDPOINTS):
+#      no máximo ADMISSION_MAX_CONCURRENT por processo. As demais
+#      esperam em uma fila de até ADMISSION_MAX_QUEUE posições, por no
+#      máximo ADMISSION_QUEUE_TIMEOUT_SECONDS. Fila cheia ou prazo
+#      vencido: 503 com 'Retry-After', na hora, sem tocar no banco.
+#
+# Prática Sênior: Falhar rápido. Um 429/503 imediato custa quase nada
+# e diz ao cliente quando voltar; uma requisição presa no pool segura
+# uma thread e ainda termina em timeout. As rotas baratas (uma
+# refeição, escritas) não disputam as vagas das caras.
+#
+# Os contadores (admitidas, enfileiradas, descartadas por motivo)
+# aparecem em GET /metrics e em GET /api/v1/admission/stats.
+# -----------------------------------------------------------------
+
+# Rotas que leem muitas linhas (ou seguram a conexão por muito tempo).
+EXPENSIVE_ENDPOINTS = frozenset({
+    'api.get_meals', 'api.search_meals', 'api.get_meal_changes',
+    'api.export_meals', 'api.get_meal_stats', 'api.import_meals'
+})
+
+# Script do token bucket no Redis: lê, recarrega e consome o balde em
+# uma única operação atômica, com o relógio do próprio Redis (o mesmo
+# para todos os servidores). Retorna {admitida, fichas restantes}.
+REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local admitted = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    admitted = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {admitted, tostring(tokens)}
+"""
+
+
+class RateLimiter(ABC):
+    """
+    Interface comum dos backends de rate limit.
+    """
+    name = 'base'
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+
+    @abstractmethod
+    def consume(self, client):
+        """
+        Tenta gastar uma ficha do cliente. Retorna 0 se a requisição foi
+        admitida, ou os segundos até a próxima ficha.
+        """
+
+    def _wait(self, tokens):
+        return (1 - tokens) / self.rate
+
+
+class NullRateLimiter(RateLimiter):
+    """
+    Backend que admite tudo (RATE_LIMIT_BACKEND='null'): desliga o limite.
+    """
+    name = 'null'
+
+    def consume(self, client):
+        return 0
+
+
+class MemoryRateLimiter(RateLimiter):
+    """
+    Baldes na memória do processo (cada processo limita por conta própria).
+
+    O OrderedDict descarta os clientes menos recentes acima de
+    'max_clients': um cliente descartado volta com o balde cheio, o
+    que é inofensivo (ele já estaria cheio depois de burst/rate segundos).
+    """
+    name = 'memory'
+
+    def __init__(self, rate, burst, max_clients):
+        super().__init__(rate, burst)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, client):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            admitted = tokens >= 1
+            if admitted:
+                tokens -= 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return 0 if admitted else self._wait(tokens)
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    Baldes compartilhados entre processos/servidores, em um Redis.
+
+    O pacote 'redis' é opcional, como no cache. Se o Redis falhar, a
+    requisição é admitida (e o erro registrado): o rate limit protege o
+    banco, mas não deve derrubar a API junto com o Redis.
+    """
+    name = 'redis'
+
+    def __init__(self, rate, burst, url, prefix='daily-diet:rate:', client=None):
+        super().__init__(rate, burst)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND='redis' exige o pacote 'redis' (pip install redis).")
+        self.client = client if client is not None else redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.errors = 0
+        self._script = self.client.register_script(REDIS_TOKEN_BUCKET)
+        self._redis_error = redis.RedisError
+
+    def consume(self, client):
+        try:
+            admitted, tokens = self._script(keys=[self.prefix + client], args=[self.rate, self.burst])
+        except self._redis_error as e:
+            self.errors += 1
+            logger.warning(f'Rate limit indisponível (Redis): {e}')
+            return 0
+        return 0 if admitted else self._wait(float(tokens))
+
+
+class QueueFull(Exception):
+    pass
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    """
+    No máximo 'max_concurrent' requisições ao mesmo tempo; até
+    'max_queue' esperam uma vaga por 'timeout' segundos.
+    """
+
+    def __init__(self, max_concurrent, max_queue, timeout):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Ocupa uma vaga. Retorna True se precisou esperar na fila; levanta
+        QueueFull (fila cheia) ou QueueTimeout (prazo vencido).
+        """
+        with self._condition:
+            if self.active < self.max_concurrent:
+                self.active += 1
+                return False
+            if self.waiting >= self.max_queue:
+                raise QueueFull()
+            deadline = time.monotonic() + self.timeout
+            self.waiting += 1
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise QueueTimeout()
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+class AdmissionControl:
+    """
+    Aplica o rate limit e o limite de concorrência e guarda os contadores.
+    """
+
+    def __init__(self, limiter, concurrency, retry_after_seconds):
+        self.limiter = limiter
+        # None quando ADMISSION_MAX_CONCURRENT = 0 (sem limite).
+        self.concurrency = concurrency
+        self.retry_after_seconds = retry_after_seconds
+        self.admitted = 0
+        self.queued = 0
+        self.rate_limited = 0
+        self.queue_full = 0
+        self.queue_timeouts = 0
+        self._lock = threading.Lock()
+
+    # --- Ciclo da requisição -----------------------------------------
+    def before_request(self):
+        # Só as rotas da API; /metrics e 404s passam direto.
+        if request.blueprint != 'api' or request.endpoint is None:
+            return None
+
+        wait = self.limiter.consume(_client_key())
+        if wait:
+            self._count('rate_limited')
+            return _reject(429, 'Limite de requisições excedido. Tente de novo em instantes.', wait)
+
+        if self.concurrency is not None and request.endpoint in EXPENSIVE_ENDPOINTS:
+            try:
+                if self.concurrency.acquire():
+                    self._count('queued')
+            except QueueFull:
+                self._count('queue_full')
+                return _reject(503, 'Servidor sobrecarregado. Tente de novo em instantes.', self.retry_after_seconds)
+            except QueueTimeout:
+                self._count('queue_timeouts')
+                return _reject(503, 'Servidor sobrecarregado. Tente de novo em instantes.', self.retry_after_seconds)
+            g.admission_slot = True
+        self._count('admitted')
+        return None
+
+    def teardown_request(self, exc=None):
+        # Roda quando o contexto da requisição termina, ou seja, depois
+        # do streaming da exportação (stream_with_context): a vaga fica
+        # ocupada enquanto a conexão com o banco estiver em uso.
+        if g.pop('admission_slot', False):
+            self.concurrency.release()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    # --- Exposição ----------------------------------------------------
+    def stats(self):
+        return {
+            'rate_limit_backend': self.limiter.name,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'rate_limited': self.rate_limited,
+            'queue_full': self.queue_full,
+            'queue_timeouts': self.queue_timeouts,
+            'in_flight': self.concurrency.active if self.concurrency else None,
+            'queue_depth': self.concurrency.waiting if self.concurrency else None,
+            'max_concurrent': self.concurrency.max_concurrent if self.concurrency else None
+        }
+
+
+def _client_key():
+    # O hash do token (o mesmo guardado no banco), sem consultar o
+    # banco: um token inválido também gasta fichas.
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token.strip():
+        return 'token:' + auth.hash_token(token.strip())
+    return f'ip:{request.remote_addr}'
+
+
+def _reject(status_code, message, retry_after):
+    response = jsonify({'message': message})
+    response.status_code = status_code
+    # 'Retry-After' em segundos inteiros (RFC 9110), arredondado para cima.
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_admission_control(app):
+    """
+    Registra o controle de admissão na aplicação.
+    """
+    backend_name = app.config['RATE_LIMIT_BACKEND']
+    rate, burst = app.config['RATE_LIMIT_PER_SECOND'], app.config['RATE_LIMIT_BURST']
+    if backend_name == 'memory':
+        limiter = MemoryRateLimiter(rate, burst, app.config['RATE_LIMIT_MAX_CLIENTS'])
+    elif backend_name == 'redis':
+        limiter = RedisRateLimiter(rate, burst, app.config['RATE_LIMIT_REDIS_URL'])
+    elif backend_name == 'null':
+        limiter = NullRateLimiter(rate, burst)
+    else:
+        raise RuntimeError(f'RATE_LIMIT_BACKEND desconhecido: {backend_name!r}')
+
+    concurrency = None
+    if app.config['ADMISSION_MAX_CONCURRENT'] > 0:
+        concurrency = ConcurrencyLimiter(
+            app.config['ADMISSION_MAX_CONCURRENT'],
+            app.config['ADMISSION_MAX_QUEUE'],
+            app.config['ADMISSION_QUEUE_TIMEOUT_SECONDS']
+        )
+
+    admission = AdmissionControl(limiter, concurrency, app.config['ADMISSION_RETRY_AFTER_SECONDS'])
+    app.before_request(admission.before_request)
+    app.teardown_request(admission.teardown_request)
+    app.extensions['admission'] = admission
+    return admission
@@ -0,0 +1,49 @@
+# app/aggregations.py
+from datetime import datetime, date
+
+from sqlalchemy import func, cast, literal_column, Integer, String
+
+from app.models import Meal
+
+# Granularidades aceitas pelo parâmetro 'bucket' do GET /meals/stats.
+BUCKETS = ('day', 'week', 'month')
+
+
+# -----------------------------------------------------------------
+# Agrupamento por Intervalo de Tempo, Calculado no Banco
+# -----------------------------------------------------------------
+# Cada banco tem sua própria função para "truncar" uma data:
+#   - PostgreSQL: date_trunc('day' | 'week' | 'month', coluna)
+#   - SQLite:     date(...) / strftime(...), com o mesmo resultado
+# A semana começa na segunda-feira nos dois casos (padrão ISO 8601).
+# -----------------------------------------------------------------
+
+def bucket_expression(bucket, dialect_name):
+    """
+    Retorna a expressão SQL que leva 'meal_datetime' ao início do seu
+    intervalo (dia, semana ou mês), de acordo com o dialeto do banco.
+    """
+    column = Meal.meal_datetime
+    if dialect_name == 'postgresql':
+        # O nome do período vai como literal (e não como parâmetro) para
+        # que a expressão do SELECT e a do GROUP BY sejam idênticas.
+        # 'bucket' já foi validado contra BUCKETS.
+        return func.date_trunc(literal_column(f"'{bucket}'"), column)
+
+    if bucket == 'day':
+        return func.date(column)
+    if bucket == 'week':
+        # strftime('%w') vai de 0 (domingo) a 6 (sábado); recuamos até a segunda.
+        days_back = (cast(func.strftime('%w', column), Integer) + 6) % 7
+        return func.date(column, '-' + cast(days_back, String) + ' days')
+    return func.strftime('%Y-%m-01', column)
+
+
+def bucket_start(value):
+    """
+    Normaliza o início do intervalo devolvido pelo banco (datetime no
+    PostgreSQL, texto no SQLite) para uma data ISO 8601 (YYYY-MM-DD).
+    """
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
@@ -0,0 +1,534 @@
+# app/asgi.py
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import Config
+from app import diet_metrics, conditional, queries, search, filters, auth, sync, idempotency
+from app.models import Meal, MEAL_FIELDS
+from app.errors import InvalidAPIUsage
+from app.pagination import decode_cursor, decode_search_cursor, decode_sync_token, parse_limit, parse_fields
+from app.validators import validate_meal_payload, validate_meal_patch, validate_meal_batch, parse_ndjson_items, parse_datetime_arg
+from app.aggregations import BUCKETS
+from app.serializers import compile_meal_encoder, render_meals_page
+from app.json_provider import FastJSONProvider
+from app.pool import build_engine_options, PoolMonitor
+from app.routes import EXPORT_MIMETYPES
+
+# Prática Sênior: O modo ASGI é OPCIONAL. O Quart (a versão assíncrona
+# do Flask, com a mesma API de Blueprint/request/jsonify) e os drivers
+# assíncronos só são exigidos por quem for usá-lo.
+try:
+    from quart import Quart, Blueprint, request, jsonify, current_app, g
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+except ImportError:
+    raise RuntimeError(
+        "O modo ASGI exige os pacotes 'quart' e 'aiosqlite' ou 'asyncpg' "
+        "(pip install -r requirements-asgi.txt)."
+    ) from None
+
+
+# -----------------------------------------------------------------
+# Modo ASGI (Assíncrono)
+# -----------------------------------------------------------------
+# No modo WSGI (run.py), cada consulta ao PostgreSQL prende um worker
+# inteiro até a resposta do banco. Aqui, os handlers são 'async def' e
+# usam o AsyncEngine/AsyncSession do SQLAlchemy: enquanto uma consulta
+# espera o banco, o mesmo processo atende outras requisições. A
+# concorrência passa a ser limitada pelo pool de conexões (DB_POOL_SIZE
+# + DB_MAX_OVERFLOW), e não pelo número de processos.
+#
+# O contrato /api/v1/meals é o mesmo do app/routes.py: as validações
+# (app/validators.py, app/pagination.py), as consultas e escritas
+# (app/queries.py) e a serialização (app/serializers.py) são
+# compartilhadas. As escritas reaproveitam o código síncrono via
+# AsyncSession.run_sync, sem bloquear o event loop.
+#
+# Ainda não disponível neste modo: a importação em massa (POST
+# /meals/import, que usa o COPY do psycopg2; ver app/importer.py), o
+# cache de leitura (app/cache.py) e a instrumentação por requisição
+# (app/instrumentation.py). As dependências estão em requirements-asgi.txt.
+# -----------------------------------------------------------------
+
+# Driver assíncrono de cada banco suportado.
+ASYNC_DRIVERS = {
+    'postgresql': 'asyncpg',
+    'sqlite': 'aiosqlite'
+}
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def create_asgi_app(config_class=Config):
+    """
+    Factory da aplicação ASGI (mesmo padrão do create_app).
+    """
+    app = Quart(__name__)
+    app.config.from_object(config_class)
+    # O mesmo JSON provider (e os mesmos bytes) do modo WSGI.
+    app.json = FastJSONProvider(app)
+
+    engine = build_async_engine(app.config)
+    app.extensions['async_engine'] = engine
+    # expire_on_commit=False: os objetos continuam legíveis depois do
+    # commit sem um novo SELECT (que exigiria um 'await').
+    app.extensions['async_session'] = async_sessionmaker(engine, expire_on_commit=False)
+
+    # Contadores do pool (conexões, checkouts). A espera no checkout só
+    # é medida pelo InstrumentedQueuePool do modo WSGI.
+    monitor = PoolMonitor(app.config['DB_POOL_SLOW_CHECKOUT_MS'])
+    monitor.attach(engine.sync_engine)
+    app.extensions['pool_monitor'] = monitor
+
+    @app.after_serving
+    async def dispose_engine():
+        await engine.dispose()
+
+    app.register_blueprint(bp)
+    return app
+
+
+def build_async_engine(config):
+    """
+    Cria o AsyncEngine a partir das mesmas chaves do Config
+    (SQLALCHEMY_DATABASE_URI e DB_*), trocando o driver pelo assíncrono.
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'] or 'sqlite://')
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f'O modo ASGI não suporta o banco {backend!r}.')
+
+    options = build_engine_options(config)
+    # O AsyncEngine exige um pool compatível com asyncio (o padrão,
+    # AsyncAdaptedQueuePool), com os mesmos tamanhos e timeouts.
+    options.pop('poolclass', None)
+    # No asyncpg, o statement_timeout vai em 'server_settings'.
+    if backend == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}}
+
+    return create_async_engine(url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}'), **options)
+
+
+def _session():
+    return current_app.extensions['async_session']()
+
+
+def _database_error(e, message):
+    current_app.logger.error(f"Erro de banco de dados: {str(e)}")
+    return InvalidAPIUsage(message, status_code=500)
+
+
+def _json_body_response(body, status=200, headers=None):
+    return current_app.response_class(body, status=status, headers=headers, mimetype=current_app.json.mimetype)
+
+
+def _not_modified(etag, last_modified):
+    """
+    Equivalente assíncrono de conditional.not_modified().
+    """
+    if not conditional.request_matches(request, etag, last_modified):
+        return None
+    return conditional.add_validators(current_app.response_class('', status=304), etag, last_modified)
+
+
+# -----------------------------------------------------------------
+# Manipulador de Erro (mesmo formato do app/routes.py)
+# -----------------------------------------------------------------
+@bp.errorhandler(InvalidAPIUsage)
+async def handle_invalid_usage(error):
+    response = jsonify(error.to_dict())
+    response.status_code = error.status_code
+    if error.status_code == 401:
+        response.headers['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+# -----------------------------------------------------------------
+# Autenticação (mesma regra do app/routes.py)
+# -----------------------------------------------------------------
+@bp.before_request
+async def authenticate():
+    """
+    Resolve o usuário autenticado e o guarda em 'g.user_id'.
+    """
+    token = auth.bearer_token(request)
+    async with _session() as session:
+        try:
+            user_id = (await session.execute(auth.user_id_statement(token))).scalar()
+        except SQLAlchemyError as e:
+            raise _database_error(e, "Erro interno ao consultar o banco de dados.")
+    g.user_id = auth.require_user(user_id)
+
+
+# -----------------------------------------------------------------
+# Escritas
+# -----------------------------------------------------------------
+async def _begin_idempotent(session):
+    """
+    Resolve o 'Idempotency-Key' na sessão da criação (ver o @idempotent
+    de app/routes.py). Retorna (replay, record); os dois são None quando
+    a requisição não tem chave.
+    """
+    key = idempotency.request_key(request)
+    if key is None:
+        return None, None
+    fingerprint = idempotency.request_fingerprint(request.method, request.path, await request.get_data())
+    return await session.run_sync(
+        idempotency.begin, g.user_id, key, fingerprint, current_app.config['IDEMPOTENCY_KEY_TTL_SECONDS']
+    )
+
+
+async def _remember_response(record, response):
+    if record is not None:
+        idempotency.record_response(record, response.status_code, await response.get_data(as_text=True), response.headers)
+
+
+def _replay(row):
+    return _json_body_response(row.response_body, row.status_code, idempotency.replay_headers(row))
+
+
+async def _purge_idempotency_keys():
+    # Tarefa em segundo plano do Quart (fora da requisição).
+    try:
+        async with current_app.extensions['async_engine'].begin() as connection:
+            await connection.run_sync(idempotency.purge_expired, current_app.config['IDEMPOTENCY_PURGE_BATCH_SIZE'])
+    except SQLAlchemyError as e:
+        current_app.logger.warning(f"Falha no expurgo das chaves de idempotência: {str(e)}")
+
+
+def _schedule_idempotency_purge(record):
+    if record is not None and idempotency.purge_due(current_app.config['IDEMPOTENCY_PURGE_INTERVAL_SECONDS']):
+        current_app.add_background_task(_purge_idempotency_keys)
+
+
+@bp.route('/meals', methods=['POST'])
+async def create_meal():
+    """
+    Cria uma refeição (ver create_meal em app/routes.py).
+    """
+    async with _session() as session:
+        try:
+            replay, record = await _begin_idempotent(session)
+            if replay is not None:
+                return _replay(replay)
+
+            values = validate_meal_payload(await request.get_json())
+            meal = await session.run_sync(queries.create_meal, g.user_id, values)
+            response = jsonify({
+                'message': 'Refeição criada com sucesso!',
+                'meal': meal.to_dict()
+            })
+            response.status_code = 201
+            conditional.add_validators(response, conditional.meal_etag(meal.id, meal.version), meal.updated_at)
+            await _remember_response(record, response)
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise _database_error(e, "Erro interno ao salvar os dados.")
+
+    _schedule_idempotency_purge(record)
+    return response
+
+
+@bp.route('/meals/batch', methods=['POST'])
+async def create_meals_batch():
+    """
+    Cria várias refeições de uma vez (ver create_meals_batch em app/routes.py).
+    """
+    async with _session() as session:
+        try:
+            replay, record = await _begin_idempotent(session)
+            if replay is not None:
+                return _replay(replay)
+
+            if request.mimetype == 'application/x-ndjson':
+                items = parse_ndjson_items(await request.get_data(as_text=True), current_app.json.loads)
+            else:
+                items = await request.get_json()
+                if not isinstance(items, list):
+                    raise InvalidAPIUsage('O corpo deve ser um array JSON de refeições.', status_code=400)
+
+            results, valid_items = validate_meal_batch(items, current_app.config['MEALS_BATCH_MAX_ITEMS'])
+            await session.run_sync(
+                queries.insert_meals, g.user_id, valid_items, current_app.config['MEALS_BATCH_CHUNK_SIZE'], results
+            )
+            failed = len(items) - len(valid_items)
+            response = jsonify({
+                'message': 'Lote processado.',
+                'created': len(valid_items),
+                'failed': failed,
+                'results': results
+            })
+            response.status_code = 201 if not failed else 207
+            await _remember_response(record, response)
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise _database_error(e, "Erro interno ao salvar os dados.")
+
+    _schedule_idempotency_purge(record)
+    return response
+
+
+@bp.route('/meals/<int:meal_id>', methods=['PUT'])
+async def update_meal(meal_id):
+    """
+    Substitui uma refeição (ver update_meal em app/routes.py).
+    """
+    versions = conditional.if_match_versions(request, meal_id)
+    values = validate_meal_payload(await request.get_json())
+    return await _write_meal(meal_id, versions, values)
+
+
+@bp.route('/meals/<int:meal_id>', methods=['PATCH'])
+async def patch_meal(meal_id):
+    """
+    Atualiza só os campos enviados (ver patch_meal em app/routes.py).
+    """
+    versions = conditional.if_match_versions(request, meal_id)
+    values = validate_meal_patch(await request.get_json())
+    return await _write_meal(meal_id, versions, values)
+
+
+async def _write_meal(meal_id, versions, values):
+    async with _session() as session:
+        try:
+            meal = await session.run_sync(queries.update_meal, g.user_id, meal_id, versions, values)
+            if meal is None:
+                await session.rollback()
+                raise conditional.precondition_failed()
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise _database_error(e, "Erro interno ao atualizar os dados.")
+
+    response = jsonify({
+        'message': 'Refeição atualizada com sucesso!',
+        'meal': Meal.serialize(meal)
+    })
+    return conditional.add_validators(response, conditional.meal_etag(meal_id, meal.version), meal.updated_at), 200
+
+
+@bp.route('/meals/<int:meal_id>', methods=['DELETE'])
+async def delete_meal(meal_id):
+    """
+    Deleta uma refeição (ver delete_meal em app/routes.py).
+    """
+    versions = conditional.if_match_versions(request, meal_id)
+    async with _session() as session:
+        try:
+            deleted = await session.run_sync(queries.delete_meal, g.user_id, meal_id, versions)
+            if not deleted:
+                await session.rollback()
+                raise conditional.precondition_failed()
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            raise _database_error(e, "Erro interno ao deletar os dados.")
+
+    return '', 204
+
+
+# -----------------------------------------------------------------
+# Leituras
+# -----------------------------------------------------------------
+@bp.route('/meals', methods=['GET'])
+async def get_meals():
+    """
+    Retorna uma página de refeições (ver get_meals em app/routes.py).
+    """
+    limit = parse_limit(
+        request.args.get('limit'),
+        current_app.config['MEALS_PAGE_SIZE_DEFAULT'],
+        current_app.config['MEALS_PAGE_SIZE_MAX']
+    )
+    cursor = decode_cursor(request.args.get('cursor'))
+    fields = parse_fields(request.args.get('fields')) or MEAL_FIELDS
+    meal_filters = filters.parse_meal_filters(request.args)
+
+    async with _session() as session:
+        try:
+            conditions = filters.meal_filter_conditions(meal_filters, session.bind.dialect.name)
+            statement, columns = queries.meals_page_statement(g.user_id, fields, cursor, limit, conditions)
+            rows, next_cursor = queries.split_page((await session.execute(statement)).all(), limit)
+        except SQLAlchemyError as e:
+            raise _database_error(e, "Erro interno ao consultar o banco de dados.")
+
+    etag = conditional.page_etag(g.user_id, rows, next_cursor, request.args)
+    not_modified = _not_modified(etag, None)
+    if not_modified:
+        return not_modified
+
+    body = render_meals_page(rows, columns, fields, next_cursor, current_app.json)
+    return conditional.add_validators(_json_body_response(body), etag, None)
+
+
+@bp.route('/meals/search', methods=['GET'])
+async def search_meals():
+    """
+    Busca textual ranqueada (ver search_meals em app/routes.py).
+    """
+    terms = search.parse_search_terms(request.args.get('q'))
+    prefix = request.args.get('prefix', 'true').lower() != 'false'
+    limit = parse_limit(
+        request.args.get('limit'),
+        current_app.config['MEALS_PAGE_SIZE_DEFAULT'],
+        current_app.config['MEALS_PAGE_SIZE_MAX']
+    )
+    cursor = decode_search_cursor(request.args.get('cursor'))
+    fields = parse_fields(request.args.get('fields')) or MEAL_FIELDS
+
+    async with _session() as session:
+        try:
+            statement, columns = search.search_statement(
+                session.bind.dialect.name, g.user_id, terms, prefix, fields, cursor, limit
+            )
+            rows, next_cursor = search.split_search_page((await session.execute(statement)).all(), limit)
+        except SQLAlchemyError as e:
+            raise _database_error(e, "Erro interno ao consultar o banco de dados.")
+
+    body = render_meals_page(rows, columns, fields, next_cursor, current_app.json)
+    return _json_body_response(body)
+
+
+@bp.route('/meals/changes', methods=['GET'])
+async def get_meal_changes():
+    """
+    Sincronização incremental (ver get_meal_changes em app/routes.py).
+    """
+    token = decode_sync_token(request.args.get('since'))
+    sync.check_token_age(token, current_app.config['MEALS_TOMBSTONE_RETENTION_DAYS'])
+    limit = parse_limit(
+        request.args.get('limit'),
+        current_app.config['MEALS_PAGE_SIZE_DEFAULT'],
+        current_app.config['MEALS_PAGE_SIZE_MAX']
+    )
+    fields = parse_fields(request.args.get('fields')) or MEAL_FIELDS
+
+    async with _session() as session:
+        try:
+            barrier_started_at = (await session.execute(sync.barrier_statement(g.user_id))).scalar()
+            horizon = sync.sync_horizon(current_app.config['MEALS_SYNC_SETTLE_SECONDS'], barrier_started_at)
+            meals_statement, tombstones_statement = sync.changes_statements(g.user_id, fields, token, horizon, limit)
+            meal_rows = (await session.execute(meals_statement)).all()
+            tombstone_rows = (await session.execute(tombstones_statement)).all()
+        except SQLAlchemyError as e:
+            raise _database_error(e, "Erro interno ao consultar o banco de dados.")
+
+    changes, next_token, has_more = sync.merge_changes(meal_rows, tombstone_rows, fields, limit, horizon)
+    return jsonify({'changes': changes, 'next_token': next_token, 'has_more': has_more}), 200
+
+
+@bp.route('/meals/export', methods=['GET'])
+async def export_meals():
+    """
+    Exporta todas as refeições em streaming (ver export_meals em app/routes.py).
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_MIMETYPES:
+        raise InvalidAPIUsage('Formato inválido. Use "ndjson" ou "json".', status_code=400)
+    fields = parse_fields(request.args.get('fields')) or MEAL_FIELDS
+
+    # A sessão fica aberta enquanto o corpo é enviado; quem a fecha é o
+    # próprio gerador (também quando o cliente desconecta no meio).
+    session = _session()
+    try:
+        result = await session.stream(
+            queries.export_statement(g.user_id, fields, current_app.config['MEALS_EXPORT_CHUNK_SIZE'])
+        )
+    except SQLAlchemyError as e:
+        await session.close()
+        raise _database_error(e, "Erro interno ao consultar o banco de dados.")
+
+    provider = current_app.json
+    encode = compile_meal_encoder(fields, fields, provider.ensure_ascii, provider.sort_keys)
+
+    async def generate():
+        try:
+            if export_format == 'json':
+                yield '{"meals":['
+            separator = ''
+            async for partition in result.partitions():
+                rows = [encode(row) for row in partition]
+                if export_format == 'ndjson':
+                    yield ''.join(row + '\n' for row in rows)
+                else:
+                    yield separator + ','.join(rows)
+                    separator = ','
+            if export_format == 'json':
+                yield ']}'
+        finally:
+            await session.close()
+
+    response = current_app.response_class(generate(), mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=meals.{export_format}'
+    return response
+
+
+@bp.route('/meals/stats', methods=['GET'])
+async def get_meal_stats():
+    """
+    Estatísticas por período (ver get_meal_stats em app/routes.py).
+    """
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        raise InvalidAPIUsage(f'O parâmetro "bucket" deve ser um de: {", ".join(BUCKETS)}.', status_code=400)
+    date_from = parse_datetime_arg(request.args, 'from')
+    date_to = parse_datetime_arg(request.args, 'to')
+
+    async with _session() as session:
+        try:
+            dialect_name = session.bind.dialect.name
+            rows = (await session.execute(
+                queries.stats_statement(g.user_id, bucket, dialect_name, date_from, date_to)
+            )).all()
+        except SQLAlchemyError as e:
+            raise _database_error(e, "Erro interno ao consultar o banco de dados.")
+
+    return jsonify(queries.stats_payload(bucket, rows)), 200
+
+
+@bp.route('/meals/<int:meal_id>', methods=['GET'])
+async def get_meal(meal_id):
+    """
+    Retorna uma refeição pelo ID (ver get_meal em app/routes.py).
+    """
+    async with _session() as session:
+        try:
+            if conditional.has_conditional_headers(request):
+                current = (await session.execute(queries.meal_validators_statement(g.user_id, meal_id))).first()
+                if current is not None:
+                    not_modified = _not_modified(conditional.meal_etag(meal_id, current.version), current.updated_at)
+                    if not_modified:
+                        return not_modified
+
+            meal = (await session.execute(queries.meal_statement(g.user_id, meal_id))).scalar()
+        except SQLAlchemyError as e:
+            raise _database_error(e, "Erro interno ao consultar o banco de dados.")
+
+    if not meal:
+        raise InvalidAPIUsage("Refeição não encontrada.", status_code=404)
+
+    etag = conditional.meal_etag(meal.id, meal.version)
+    return conditional.add_validators(jsonify({'meal': meal.to_dict()}), etag, meal.updated_at)
+
+
+@bp.route('/metrics', methods=['GET'])
+async def get_metrics():
+    """
+    Métricas da dieta (ver get_metrics em app/routes.py).
+    """
+    async with _session() as session:
+        try:
+            user_id = g.user_id
+            metrics = await session.run_sync(lambda sync_session: diet_metrics.get_metrics(user_id, sync_session))
+        except SQLAlchemyError as e:
+            raise _database_error(e, "Erro interno ao consultar o banco de dados.")
+    return jsonify({'metrics': metrics}), 200
+
+
+@bp.route('/pool/stats', methods=['GET'])
+async def get_pool_stats():
+    """
+    Retorna as métricas do pool de conexões.
+    """
+    return jsonify({'pool': current_app.extensions['pool_monitor'].stats()}), 200
@@ -0,0 +1,99 @@
+# app/auth.py
+import hashlib
+import secrets
+
+from sqlalchemy import select, insert
+
+from app.errors import InvalidAPIUsage
+from app.models import User, DietMetrics
+
+
+# -----------------------------------------------------------------
+# Autenticação por Token (Authorization: Bearer <token>)
+# -----------------------------------------------------------------
+# Cada usuário tem um token de acesso aleatório, gerado pelo comando
+# 'flask users create' (ou 'flask users rotate-token'). O banco guarda
+# só o SHA-256 do token: quem lê o banco não consegue se autenticar.
+# Como o token já é aleatório (256 bits), um hash simples (sem salt
+# nem iterações) basta, e a busca é uma igualdade no índice único.
+#
+# As rotas resolvem o usuário uma vez por requisição (no
+# 'before_request' do blueprint) e guardam o id em 'g.user_id'; toda
+# consulta e escrita de refeições é filtrada por ele.
+#
+# As funções recebem a requisição explicitamente, para servir também
+# ao modo ASGI (Quart).
+# -----------------------------------------------------------------
+
+# Bytes aleatórios de cada token (antes da codificação em base64).
+TOKEN_BYTES = 32
+
+
+def generate_token():
+    """
+    Gera um token de acesso novo (seguro para URLs e cabeçalhos).
+    """
+    return secrets.token_urlsafe(TOKEN_BYTES)
+
+
+def hash_token(token):
+    """
+    Hash guardado no banco no lugar do token.
+    """
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def bearer_token(req):
+    """
+    Extrai o token do cabeçalho 'Authorization: Bearer <token>'.
+    Levanta InvalidAPIUsage (401) se o cabeçalho faltar ou for inválido.
+    """
+    scheme, _, token = req.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        raise InvalidAPIUsage('Autenticação obrigatória: envie "Authorization: Bearer <token>".', status_code=401)
+    return token.strip()
+
+
+def user_id_statement(token):
+    """
+    Consulta do id do usuário dono do token (índice único do hash).
+    """
+    return select(User.id).where(User.api_token_hash == hash_token(token))
+
+
+def require_user(user_id):
+    """
+    Levanta InvalidAPIUsage (401) se o token não pertence a ninguém.
+    """
+    if user_id is None:
+        raise InvalidAPIUsage('Token de acesso inválido.', status_code=401)
+    return user_id
+
+
+def create_user(session, name):
+    """
+    Cria um usuário (com a sua linha de métricas zerada).
+    Retorna (user, token); o token só existe neste momento.
+    O commit fica a cargo de quem chama.
+    """
+    token = generate_token()
+    user = User(name=name, api_token_hash=hash_token(token))
+    session.add(user)
+    session.flush()
+    # Criar a linha de métricas junto com o usuário evita que as duas
+    # primeiras escritas concorrentes tentem criá-la ao mesmo tempo.
+    session.execute(insert(DietMetrics).values(
+        user_id=user.id, total_meals=0, on_diet_meals=0, off_diet_meals=0
+    ))
+    return user, token
+
+
+def rotate_token(session, user):
+    """
+    Troca o token de um usuário; o anterior deixa de valer no commit.
+    Retorna o token novo.
+    """
+    token = generate_token()
+    user.api_token_hash = hash_token(token)
+    session.flush()
+    return token
@@ -0,0 +1,354 @@
+# app/cache.py
+import pickle
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+
+# -----------------------------------------------------------------
+# Cache de Leitura (Read-Through) para as Respostas de Refeições
+# -----------------------------------------------------------------
+# As rotas de leitura consultam o cache antes do banco e guardam o
+# resultado já serializado. A invalidação é feita por eventos da
+# sessão do SQLAlchemy: toda escrita em 'meal' que chega ao commit
+# remove as entradas afetadas, venha ela de qual rota vier.
+#
+# Chaves (sempre com o usuário dono das refeições):
+#   meal:<geração de itens>.<geração de itens do usuário>:<usuário>:<id>
+#       -> uma refeição
+#   meals:<geração de listas>.<geração de listas do usuário>:<usuário>:<query>
+#       -> uma página da listagem
+# Uma escrita incrementa as gerações do usuário dono da refeição, o que
+# invalida todas as entradas DELE de uma vez (sem precisar saber quais
+# existem) e preserva as dos outros usuários. As gerações globais só
+# mudam em escritas em massa de dono desconhecido.
+#
+# Prática Sênior: A chave é calculada UMA vez, antes da leitura no
+# banco, e a mesma chave é usada para guardar o resultado. Se uma
+# escrita confirmar (e incrementar a geração) enquanto a rota lê, a
+# resposta possivelmente velha vai para uma chave que ninguém mais
+# consulta, em vez de ser servida como atual até o TTL.
+# -----------------------------------------------------------------
+
+class CacheBackend(ABC):
+    """
+    Interface comum dos backends, com os contadores de desempenho.
+    """
+    name = 'base'
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key):
+        ...
+
+    @abstractmethod
+    def set(self, key, value):
+        ...
+
+    @abstractmethod
+    def delete(self, key):
+        ...
+
+    @abstractmethod
+    def generation(self, namespace):
+        ...
+
+    @abstractmethod
+    def bump_generation(self, namespace):
+        ...
+
+    def size(self):
+        return None
+
+    def stats(self):
+        return {
+            'backend': self.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': self.size()
+        }
+
+
+class NullCache(CacheBackend):
+    """
+    Backend que não guarda nada (CACHE_BACKEND='null'): desliga o cache.
+    """
+    name = 'null'
+
+    def get(self, key):
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def generation(self, namespace):
+        return 0
+
+    def bump_generation(self, namespace):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """
+    Cache em memória do processo, com descarte LRU e expiração por TTL.
+
+    Prática Sênior: O OrderedDict mantém a ordem de uso; cada leitura
+    move a chave para o fim, e o descarte remove do início (a menos
+    usada). O lock torna o backend seguro para servidores com threads.
+    """
+    name = 'memory'
+
+    def __init__(self, max_entries, ttl_seconds):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        # As gerações ficam fora do LRU: se fossem descartadas, voltariam
+        # a zero e páginas antigas voltariam a ser servidas.
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def generation(self, namespace):
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def bump_generation(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache compartilhado entre processos/servidores, em um Redis.
+
+    O pacote 'redis' é opcional: só é importado quando este backend é
+    escolhido. O próprio Redis aplica o TTL e a política de descarte,
+    então 'evictions' não é contabilizado aqui.
+    """
+    name = 'redis'
+
+    def __init__(self, url, ttl_seconds, prefix='daily-diet:', client=None):
+        super().__init__()
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("CACHE_BACKEND='redis' exige o pacote 'redis' (pip install redis).")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl_seconds)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def generation(self, namespace):
+        return int(self.client.get(f'{self.prefix}generation:{namespace}') or 0)
+
+    def bump_generation(self, namespace):
+        self.client.incr(f'{self.prefix}generation:{namespace}')
+
+
+class ResponseCache:
+    """
+    Extensão Flask (no mesmo padrão do 'db' e do 'migrate'): é criada
+    em app/__init__.py e associada à aplicação em create_app().
+    """
+
+    def init_app(self, app):
+        backend_name = app.config['CACHE_BACKEND']
+        if backend_name == 'memory':
+            backend = MemoryCache(app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_TTL_SECONDS'])
+        elif backend_name == 'redis':
+            backend = RedisCache(app.config['CACHE_REDIS_URL'], app.config['CACHE_TTL_SECONDS'])
+        elif backend_name == 'null':
+            backend = NullCache()
+        else:
+            raise RuntimeError(f'CACHE_BACKEND desconhecido: {backend_name!r}')
+        app.extensions['response_cache'] = backend
+        _register_session_events()
+
+    @property
+    def backend(self):
+        return current_app.extensions['response_cache']
+
+    # --- Leitura e escrita pela chave ----------------------------------
+    def meal_key(self, user_id, meal_id):
+        """
+        Chave de uma refeição, com as gerações atuais.
+        """
+        backend = self.backend
+        return f'meal:{backend.generation("items")}.{backend.generation(f"items:{user_id}")}:{user_id}:{meal_id}'
+
+    def page_key(self, user_id, args):
+        """
+        Chave de uma página da listagem, com as gerações atuais.
+        """
+        backend = self.backend
+        params = '&'.join(f'{key}={value}' for key, value in sorted(args.items(multi=True)))
+        return f'meals:{backend.generation("lists")}.{backend.generation(f"lists:{user_id}")}:{user_id}:{params}'
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, entry):
+        """
+        Guarda 'entry' na chave obtida ANTES da leitura no banco.
+        """
+        self.backend.set(key, entry)
+
+    # --- Invalidação -------------------------------------------------
+    def invalidate(self, meals=(), user_ids=(), all_meals=False):
+        """
+        Invalida as refeições e as páginas da listagem dos usuários
+        afetados: os de 'user_ids' e os donos de 'meals' (pares
+        (user_id, id)).
+        'all_meals' invalida todas as refeições e páginas (usado quando
+        um UPDATE ou DELETE em massa não informa quais linhas mudaram).
+        """
+        backend = self.backend
+        if all_meals:
+            backend.bump_generation('items')
+            backend.bump_generation('lists')
+            return
+        for user_id in {*user_ids, *(user_id for user_id, _ in meals)}:
+            backend.bump_generation(f'items:{user_id}')
+            backend.bump_generation(f'lists:{user_id}')
+
+    def stats(self):
+        return self.backend.stats()
+
+
+# -----------------------------------------------------------------
+# Invalidação por Eventos da Sessão
+# -----------------------------------------------------------------
+# 'after_flush' anota (em session.info) quais refeições mudaram;
+# 'after_commit' invalida o cache só depois que a escrita é durável.
+# Escritas via INSERT/UPDATE/DELETE em massa (ex: o POST /meals/batch)
+# não passam pelo flush e são detectadas no 'do_orm_execute': nos
+# INSERTs, o dono vem dos parâmetros; UPDATEs e DELETEs informam as
+# refeições afetadas na opção de execução 'cached_meals' (pares
+# (user_id, id), ver app/queries.py). Sem ela, não dá para saber
+# quais linhas mudaram e o cache inteiro é invalidado.
+# -----------------------------------------------------------------
+_PENDING_KEY = 'response_cache_pending'
+_events_registered = False
+
+
+def _register_session_events():
+    global _events_registered
+    if _events_registered:
+        return
+    from app import db
+
+    event.listen(db.session, 'after_flush', _collect_flushed_meals)
+    event.listen(db.session, 'do_orm_execute', _collect_bulk_statements)
+    event.listen(db.session, 'after_commit', _invalidate_committed)
+    event.listen(db.session, 'after_rollback', _discard_pending)
+    _events_registered = True
+
+
+def _pending(session):
+    return session.info.setdefault(_PENDING_KEY, {'meals': set(), 'users': set(), 'all': False, 'dirty': False})
+
+
+def _collect_flushed_meals(session, flush_context):
+    from app.models import Meal
+
+    pending = None
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Meal):
+            pending = pending or _pending(session)
+            pending['meals'].add((instance.user_id, instance.id))
+            pending['dirty'] = True
+
+
+def _collect_bulk_statements(orm_execute_state):
+    from app.models import Meal
+
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Meal:
+        return
+    pending = _pending(orm_execute_state.session)
+    pending['dirty'] = True
+    if not orm_execute_state.is_insert:
+        meals = orm_execute_state.execution_options.get('cached_meals')
+        if meals is None:
+            pending['all'] = True
+        else:
+            pending['meals'].update(meals)
+        return
+    parameters = orm_execute_state.parameters
+    for values in parameters if isinstance(parameters, list) else [parameters or {}]:
+        if 'user_id' not in values:
+            pending['all'] = True
+            return
+        pending['users'].add(values['user_id'])
+
+
+def _invalidate_committed(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending and pending['dirty'] and has_app_context():
+        from app import cache
+        cache.invalidate(pending['meals'], pending['users'], all_meals=pending['all'])
+
+
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
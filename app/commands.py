@@ -0,0 +1,321 @@
+# app/commands.py
+import csv
+import json
+import os
+from datetime import date
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app import db, cache, auth, diet_metrics, filters, queries, partitioning, sync, idempotency, importer
+from app.models import User, Meal, MEAL_FIELDS
+
+# -----------------------------------------------------------------
+# Comandos de Linha de Comando (flask <grupo> <comando>)
+# -----------------------------------------------------------------
+# Os grupos são registrados na aplicação em run.py, ao lado do
+# contexto do 'flask shell'.
+# -----------------------------------------------------------------
+
+metrics_cli = AppGroup('metrics', help='Manutenção das métricas agregadas da dieta.')
+
+
+@metrics_cli.command('rebuild')
+@click.option('--check', is_flag=True, help='Apenas compara o estado incremental com uma varredura, sem reconstruir.')
+def rebuild_metrics(check):
+    """
+    Recalcula as métricas da dieta varrendo a tabela 'meal'.
+
+    Antes de reconstruir, compara o estado incremental atual com a
+    varredura e lista as divergências encontradas.
+    """
+    problems = diet_metrics.verify()
+    for problem in problems:
+        click.echo(f'Divergência: {problem}')
+
+    if check:
+        if problems:
+            raise click.ClickException(f'{len(problems)} divergência(s) encontrada(s).')
+        click.echo('Métricas consistentes.')
+        return
+
+    total_meals, total_streaks = diet_metrics.rebuild()
+    db.session.commit()
+    click.echo(
+        f'Métricas reconstruídas: {total_meals} refeições, '
+        f'{total_streaks} sequência(s) dentro da dieta.'
+    )
+
+
+meals_cli = AppGroup('meals', help='Verificações e manutenção da tabela de refeições.')
+
+
+@meals_cli.command('check-plans')
+def check_plans():
+    """
+    Confere, com EXPLAIN, que os filtros mais comuns do GET /meals
+    (data, is_on_diet, nome) usam índices, e não uma varredura
+    completa da tabela 'meal'.
+    """
+    problems = filters.find_sequential_scans(db.session, _listing_statement)
+    for case, plan in problems:
+        click.echo(f'Varredura completa com os filtros {case}:')
+        for line in plan:
+            click.echo(f'    {line}')
+    if problems:
+        raise click.ClickException(f'{len(problems)} combinação(ões) de filtros sem índice.')
+    click.echo(f'{len(filters.PLAN_CHECK_CASES)} combinações de filtros usam índices.')
+
+
+def _listing_statement(conditions):
+    # A mesma consulta de uma página do GET /meals, sem cursor.
+    statement, _ = queries.meals_page_statement(
+        filters.PLAN_CHECK_USER_ID, MEAL_FIELDS, None, current_app.config['MEALS_PAGE_SIZE_DEFAULT'], conditions
+    )
+    return statement
+
+
+@meals_cli.command('partition-by-user')
+@click.option('--strategy', type=click.Choice(partitioning.PARTITION_STRATEGIES), default='hash', show_default=True)
+@click.option('--partitions', type=click.IntRange(min=2), default=16, show_default=True, help='Número de partições (estratégia hash).')
+@click.option('--width', type=click.IntRange(min=1), default=100000, show_default=True, help='Usuários por partição (estratégia range).')
+@click.option('--dry-run', is_flag=True, help='Apenas mostra os comandos SQL, sem executá-los.')
+def partition_by_user(strategy, partitions, width, dry_run):
+    """
+    Converte a tabela 'meal' em uma tabela particionada por 'user_id'
+    (só PostgreSQL; ver app/partitioning.py).
+    """
+    if dry_run:
+        max_user_id = db.session.execute(db.select(db.func.coalesce(db.func.max(User.id), 0))).scalar()
+        for statement in partitioning.partition_statements(strategy, partitions, width, max_user_id):
+            click.echo(f'{statement};')
+        return
+
+    try:
+        with db.engine.begin() as connection:
+            statements = partitioning.partition_meal_by_user(connection, strategy, partitions, width)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Tabela "meal" particionada ({strategy}): {len(statements)} comandos executados.')
+
+
+@meals_cli.command('partition-by-month')
+@click.option('--months-ahead', type=click.IntRange(min=0), help='Meses futuros já criados (padrão: MEAL_PARTITION_MONTHS_AHEAD).')
+@click.option('--dry-run', is_flag=True, help='Apenas mostra os comandos SQL, sem executá-los.')
+def partition_by_month(months_ahead, dry_run):
+    """
+    Converte a tabela 'meal' em uma tabela particionada por mês de
+    'meal_datetime' (só PostgreSQL; ver app/partitioning.py). A migração
+    'e8a1c4f07b92' já faz isso; o comando serve a bancos que a pularam.
+    """
+    if months_ahead is None:
+        months_ahead = current_app.config['MEAL_PARTITION_MONTHS_AHEAD']
+    if dry_run:
+        current = partitioning.month_start(date.today())
+        oldest = db.session.execute(db.select(db.func.min(Meal.meal_datetime))).scalar()
+        first_month = min(partitioning.month_start(oldest), current) if oldest else current
+        for statement in partitioning.monthly_partition_statements(first_month, partitioning.add_months(current, months_ahead)):
+            click.echo(f'{statement};')
+        return
+
+    try:
+        with db.engine.begin() as connection:
+            statements = partitioning.partition_meal_by_month(connection, months_ahead)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Tabela "meal" particionada por mês: {len(statements)} comandos executados.')
+
+
+@meals_cli.command('create-partitions')
+@click.option('--months-ahead', type=click.IntRange(min=0), help='Meses futuros a garantir (padrão: MEAL_PARTITION_MONTHS_AHEAD).')
+def create_partitions(months_ahead):
+    """
+    Cria as partições mensais que faltam até alguns meses à frente.
+
+    Deve rodar periodicamente (ex: cron diário): inserções de meses sem
+    partição caem na DEFAULT, que deve ficar vazia.
+    """
+    if months_ahead is None:
+        months_ahead = current_app.config['MEAL_PARTITION_MONTHS_AHEAD']
+    try:
+        with db.engine.begin() as connection:
+            created = partitioning.create_future_partitions(connection, months_ahead)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'{len(created)} partição(ões) criada(s): {", ".join(created) or "nenhuma"}.')
+
+
+@meals_cli.command('archive-partitions')
+@click.option('--older-than-months', type=click.IntRange(min=1), help='Idade mínima, em meses (padrão: MEAL_ARCHIVE_AFTER_MONTHS).')
+@click.option('--to-dir', type=click.Path(file_okay=False, writable=True), help='Grava .ndjson.gz neste diretório em vez da tabela meal_archive (padrão: MEAL_ARCHIVE_DIR).')
+def archive_partitions(older_than_months, to_dir):
+    """
+    Arquiva e remove as partições mensais antigas (ver
+    app/partitioning.py). As refeições arquivadas saem da API e das
+    métricas, que são recalculadas para os usuários afetados.
+    """
+    if older_than_months is None:
+        older_than_months = current_app.config['MEAL_ARCHIVE_AFTER_MONTHS']
+    directory = to_dir or current_app.config['MEAL_ARCHIVE_DIR'] or None
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Cada mês em transações próprias: a 'meal' só fica travada durante
+    # o DETACH/DROP (ver app/partitioning.py).
+    try:
+        archived, skipped, user_ids = partitioning.archive_partitions(
+            db.engine, older_than_months, directory,
+            current_app.config['MEAL_ARCHIVE_PART_ROWS'],
+            current_app.config['MEAL_ARCHIVE_LOCK_TIMEOUT_MS'],
+            current_app.config['MEALS_SYNC_BARRIER_MAX_SECONDS']
+        )
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    # Métricas depois das partições removidas. Se este passo falhar, as
+    # métricas ficam contando as refeições arquivadas até um
+    # 'flask metrics rebuild'.
+    for user_id in sorted(user_ids):
+        diet_metrics.rebuild_user(user_id, session=db.session)
+    db.session.commit()
+    # As partições saíram por DDL, sem passar pelos eventos do ORM.
+    cache.invalidate(all_meals=True)
+    _warn_process_local_cache()
+
+    for name, count in archived:
+        click.echo(f'{name}: {count} refeição(ões) arquivada(s).')
+    for name, reason in skipped:
+        click.echo(f'{name}: adiada para a próxima rodada ({reason}).', err=True)
+    click.echo(f'{len(archived)} partição(ões) arquivada(s); métricas de {len(user_ids)} usuário(s) recalculadas.')
+
+
+def _warn_process_local_cache():
+    # A invalidação feita aqui só alcança o cache DESTE processo. Com o
+    # backend 'memory', os processos da API não ficam sabendo.
+    if cache.backend.name == 'memory':
+        click.echo(
+            "Aviso: CACHE_BACKEND='memory' é local a cada processo; os servidores da API "
+            f"podem servir respostas antigas por até {current_app.config['CACHE_TTL_SECONDS']}s. "
+            "Use CACHE_BACKEND='redis' para que a invalidação chegue a eles.",
+            err=True
+        )
+
+
+@meals_cli.command('compact-tombstones')
+def compact_tombstones():
+    """
+    Apaga as lápides de remoções mais antigas que
+    MEALS_TOMBSTONE_RETENTION_DAYS.
+
+    Deve rodar periodicamente (ex: cron diário). A retenção é a mesma
+    usada pela API: clientes com um token de sincronização mais antigo
+    que ela recebem 410 e refazem a sincronização completa.
+    """
+    retention_days = current_app.config['MEALS_TOMBSTONE_RETENTION_DAYS']
+    removed = sync.compact_tombstones(db.session, retention_days)
+    db.session.commit()
+    click.echo(f'{removed} lápide(s) com mais de {retention_days} dia(s) removida(s).')
+
+
+@meals_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user', 'user_name', required=True, help='Nome do usuário dono das refeições importadas.')
+@click.option('--format', 'import_format', type=click.Choice(tuple(importer.IMPORT_MIMETYPES)), help='Formato do arquivo (padrão: pela extensão).')
+@click.option('--rejects', type=click.Path(dir_okay=False, writable=True), help='Relatório das linhas rejeitadas (NDJSON). Padrão: <arquivo>.rejects.ndjson')
+@click.option('--chunk-size', type=click.IntRange(min=1), help='Linhas por COPY/INSERT (padrão: MEALS_IMPORT_CHUNK_SIZE).')
+def import_meals(path, user_name, import_format, rejects, chunk_size):
+    """
+    Importa refeições de um arquivo CSV (cabeçalho name, description,
+    meal_datetime, is_on_diet) ou NDJSON, em uma única transação.
+
+    O arquivo é lido em streaming e gravado em blocos (COPY no
+    PostgreSQL; ver app/importer.py). Cada linha rejeitada vai para o
+    relatório, com o número da linha e o motivo.
+    """
+    user_id = db.session.execute(db.select(User.id).where(User.name == user_name)).scalar()
+    if user_id is None:
+        raise click.ClickException(f'Usuário {user_name!r} não encontrado.')
+    if import_format is None:
+        import_format = os.path.splitext(path)[1].lstrip('.').lower()
+        if import_format not in importer.IMPORT_MIMETYPES:
+            raise click.ClickException('Não foi possível deduzir o formato pela extensão: use --format.')
+    rejects = rejects or f'{path}.rejects.ndjson'
+
+    with open(path, encoding='utf-8-sig', newline='') as lines, open(rejects, 'w', encoding='utf-8') as report:
+        def reject(line, message):
+            report.write(json.dumps({'line': line, 'message': message}, ensure_ascii=False) + '\n')
+
+        # A barreira segura a sincronização do usuário até o commit (ver app/sync.py).
+        with sync.sync_barrier(db.engine, current_app.config['MEALS_SYNC_BARRIER_MAX_SECONDS'], user_id) as stamp:
+            try:
+                imported, rejected = importer.import_meals(
+                    db.session, user_id, importer.iter_items(lines, import_format, json.loads),
+                    chunk_size or current_app.config['MEALS_IMPORT_CHUNK_SIZE'], reject, stamp
+                )
+                db.session.commit()
+            except (UnicodeDecodeError, csv.Error) as e:
+                db.session.rollback()
+                raise click.ClickException(f'Arquivo inválido: {e}')
+
+    # O COPY não passa pelos eventos do ORM: invalida o cache do usuário.
+    cache.invalidate(user_ids=[user_id])
+    _warn_process_local_cache()
+    click.echo(f'{imported} refeição(ões) importada(s) para {user_name!r}, {rejected} linha(s) rejeitada(s).')
+    if rejected:
+        click.echo(f'Relatório das linhas rejeitadas: {rejects}')
+
+
+@meals_cli.command('purge-idempotency-keys')
+def purge_idempotency_keys():
+    """
+    Apaga todas as chaves de idempotência vencidas (em lotes de
+    IDEMPOTENCY_PURGE_BATCH_SIZE, um commit por lote).
+
+    A API já expurga um lote periodicamente em segundo plano; o comando
+    serve para quem desligou esse expurgo ou para limpar um acúmulo.
+    """
+    batch_size = current_app.config['IDEMPOTENCY_PURGE_BATCH_SIZE']
+    total = 0
+    while True:
+        removed = idempotency.purge_expired(db.session, batch_size)
+        db.session.commit()
+        total += removed
+        if removed < batch_size:
+            break
+    click.echo(f'{total} chave(s) de idempotência vencida(s) removida(s).')
+
+
+users_cli = AppGroup('users', help='Cadastro de usuários e tokens de acesso.')
+
+
+@users_cli.command('create')
+@click.argument('name')
+def create_user(name):
+    """
+    Cria um usuário e mostra o seu token de acesso.
+
+    O token não fica guardado no banco (só o seu hash): anote-o agora.
+    """
+    if db.session.execute(db.select(User.id).where(User.name == name)).first():
+        raise click.ClickException(f'Já existe um usuário chamado {name!r}.')
+    user, token = auth.create_user(db.session, name)
+    db.session.commit()
+    click.echo(f'Usuário {user.name!r} criado (id={user.id}).')
+    click.echo(f'Token: {token}')
+
+
+@users_cli.command('rotate-token')
+@click.argument('name')
+def rotate_token(name):
+    """
+    Gera um novo token para o usuário; o anterior deixa de valer.
+
+    Também é o jeito de obter um token para o usuário 'default', que a
+    migração cria para as refeições que já existiam.
+    """
+    user = db.session.execute(db.select(User).where(User.name == name)).scalar()
+    if user is None:
+        raise click.ClickException(f'Usuário {name!r} não encontrado.')
+    token = auth.rotate_token(db.session, user)
+    db.session.commit()
+    click.echo(f'Novo token de {user.name!r}: {token}')
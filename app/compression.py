@@ -0,0 +1,203 @@
+# app/compression.py
+import gzip
+import zlib
+
+from flask import request
+
+from app import conditional
+from app.cache import MemoryCache
+
+# Prática Sênior: O brotli é uma dependência OPCIONAL (como o orjson).
+# Sem ele, a negociação oferece só o gzip, da biblioteca padrão.
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+
+# -----------------------------------------------------------------
+# Compressão das Respostas (Accept-Encoding: br / gzip)
+# -----------------------------------------------------------------
+# As páginas do GET /meals e a exportação são JSON muito repetitivo
+# (as mesmas chaves e datas ISO em toda linha) e comprimem bem. Um
+# after_request da aplicação negocia a codificação com o
+# 'Accept-Encoding' do cliente (brotli, se instalado, e gzip, nessa
+# ordem de preferência) e comprime:
+#   - respostas comuns com pelo menos COMPRESSION_MIN_SIZE bytes
+#     (abaixo disso, os cabeçalhos do gzip custam mais do que poupam);
+#   - respostas em streaming (exportação) de forma incremental: cada
+#     pedaço é comprimido e enviado com um flush de sincronização, sem
+#     acumular o corpo, e a memória continua constante.
+#
+# Prática Sênior: Comprimir uma vez só. Respostas de GET com ETag (a
+# listagem e a refeição por id) guardam o corpo comprimido em um LRU
+# próprio, na memória do processo (COMPRESSION_CACHE_ENTRIES), com o
+# ETag na chave: os acertos seguintes reenviam os mesmos bytes sem
+# recomprimir, e uma escrita, que muda o ETag, nunca serve um corpo velho.
+# Por isso o LRU não precisa de invalidação nem ser compartilhado, e
+# funciona com qualquer CACHE_BACKEND (inclusive o 'null', o padrão).
+#
+# Cada codificação é uma representação diferente, com o seu próprio
+# ETag forte (RFC 9110 §8.8.3): o corpo comprimido leva o ETag com o
+# sufixo da codificação ("<etag>-gzip", "<etag>-br"). O app/conditional.py
+# remove o sufixo antes de comparar o 'If-None-Match' e o 'If-Match',
+# e um 304 devolve o mesmo ETag (com sufixo) que o cliente guardou. O
+# 'Vary: Accept-Encoding' impede que caches intermediários misturem as
+# codificações.
+# -----------------------------------------------------------------
+
+# Respostas que não têm corpo (ou cujo corpo é um trecho do original).
+_SKIPPED_STATUS = frozenset({204, 206, 304})
+
+
+class Compression:
+    """
+    Negocia e aplica a compressão das respostas.
+    """
+
+    def __init__(self, encodings, min_size, gzip_level, brotli_quality, mimetypes, bodies):
+        # Em ordem de preferência do servidor (desempate do 'Accept-Encoding').
+        self.encodings = encodings
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = mimetypes
+        # None quando COMPRESSION_CACHE_ENTRIES = 0 (sem reaproveitamento).
+        self.bodies = bodies
+
+    def after_request(self, response):
+        if response.status_code == 304:
+            return self._not_modified(response)
+        if (
+            response.status_code < 200 or response.status_code in _SKIPPED_STATUS
+            or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in self.mimetypes
+        ):
+            return response
+        # Mesmo sem comprimir, a resposta depende do 'Accept-Encoding'.
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            # O Content-Length (se houver) era o do corpo original.
+            response.response = _compress_stream(response.response, self._stream_compressor(encoding))
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            response.set_data(self._compressed_body(encoding, body, response.headers.get('ETag')))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(conditional.encoded_etag(etag, encoding), weak)
+        return response
+
+    def _not_modified(self, response):
+        # O 304 leva o ETag da representação que o cliente tem: se ele
+        # reenviou o ETag de um corpo comprimido, o mesmo sufixo volta.
+        response.vary.add('Accept-Encoding')
+        etag, weak = response.get_etag()
+        if etag and request.if_none_match:
+            for encoding in self.encodings:
+                if request.if_none_match.contains_weak(conditional.encoded_etag(etag, encoding)):
+                    response.set_etag(conditional.encoded_etag(etag, encoding), weak)
+                    break
+        return response
+
+    def _compressed_body(self, encoding, body, etag):
+        # Só GETs com ETag: o ETag (mais a URL, que inclui a query)
+        # determina o corpo, então o comprimido pode ser reaproveitado.
+        key = None
+        if self.bodies is not None and etag and request.method == 'GET':
+            key = f'{encoding}:{request.full_path}:{etag}'
+            compressed = self.bodies.get(key)
+            if compressed is not None:
+                return compressed
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        if key is not None:
+            self.bodies.set(key, compressed)
+        return compressed
+
+    def _stream_compressor(self, encoding):
+        if encoding == 'br':
+            return _BrotliStream(self.brotli_quality)
+        return _GzipStream(self.gzip_level)
+
+
+class _GzipStream:
+    def __init__(self, level):
+        # wbits=31: formato gzip (cabeçalho e CRC), e não zlib puro.
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk):
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _compress_stream(chunks, compressor):
+    # Um pedaço comprimido por pedaço gerado: o cliente recebe (e
+    # descomprime) cada lote da exportação assim que ele sai do banco.
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        # Fecha o gerador original (o stream_with_context encerra o
+        # contexto da requisição e devolve a conexão ao pool).
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def init_compression(app):
+    """
+    Registra a compressão das respostas (se COMPRESSION_ENABLED).
+    """
+    mode = app.config['COMPRESSION_BROTLI']
+    if mode not in ('auto', 'on', 'off'):
+        raise RuntimeError(f'COMPRESSION_BROTLI desconhecido: {mode!r}')
+    if mode == 'on' and brotli is None:
+        raise RuntimeError("COMPRESSION_BROTLI='on' exige o pacote 'brotli' (pip install brotli).")
+    if not app.config['COMPRESSION_ENABLED']:
+        return None
+
+    encodings = ['gzip']
+    if brotli is not None and mode != 'off':
+        encodings.insert(0, 'br')
+    bodies = None
+    if app.config['COMPRESSION_CACHE_ENTRIES'] > 0:
+        bodies = MemoryCache(app.config['COMPRESSION_CACHE_ENTRIES'], app.config['COMPRESSION_CACHE_TTL_SECONDS'])
+    compression = Compression(
+        encodings,
+        app.config['COMPRESSION_MIN_SIZE'],
+        app.config['COMPRESSION_LEVEL'],
+        app.config['COMPRESSION_BROTLI_QUALITY'],
+        frozenset(app.config['COMPRESSION_MIMETYPES']),
+        bodies
+    )
+    app.after_request(compression.after_request)
+    app.extensions['compression'] = compression
+    return compression
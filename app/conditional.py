@@ -0,0 +1,185 @@
+# app/conditional.py
+import hashlib
+from datetime import timezone
+
+from flask import request, current_app
+
+from app.errors import InvalidAPIUsage
+
+
+# -----------------------------------------------------------------
+# Requisições Condicionais (ETag / Last-Modified / 304)
+# -----------------------------------------------------------------
+# O cliente guarda o ETag (ou a data Last-Modified) da última
+# resposta e o reenvia em 'If-None-Match' (ou 'If-Modified-Since').
+# Se nada mudou, respondemos 304 Not Modified, sem corpo. Os
+# validadores são calculados com consultas baratas (só 'updated_at',
+# ou um agregado), sem carregar nem serializar as refeições.
+#
+# As listagens só têm ETag, sem Last-Modified: a data da última edição
+# não muda quando uma refeição é removida, e um 'If-Modified-Since'
+# daria 304 para uma página que perdeu linhas. O ETag de uma página é
+# calculado das próprias linhas (ids e versões) e do cursor seguinte
+# (ver page_etag): custa O(página), como a leitura da página em si.
+#
+# Com a compressão (app/compression.py), cada codificação é uma
+# representação diferente e precisa de um ETag forte próprio (RFC 9110
+# §8.8.3): o corpo em gzip leva "<etag>-gzip" e o em brotli, "<etag>-br".
+# Os validadores da refeição/listagem continuam os mesmos: antes de
+# comparar, o sufixo da codificação é removido (strip_encoding).
+#
+# As funções 'has_conditional_headers' e 'request_matches' recebem a
+# requisição explicitamente, para servir também ao modo ASGI (Quart),
+# cujo objeto 'request' tem os mesmos atributos do Werkzeug.
+#
+# Nas escritas, o caminho inverso: o ETag de uma refeição carrega a
+# sua 'version' (ver Meal.version) e PUT/PATCH/DELETE exigem o
+# cabeçalho 'If-Match' com ele. A versão vai direto para o WHERE da
+# escrita, sem uma leitura antes.
+# -----------------------------------------------------------------
+
+def is_conditional():
+    """
+    Indica se o cliente enviou algum cabeçalho condicional.
+    """
+    return has_conditional_headers(request)
+
+
+def has_conditional_headers(req):
+    """
+    Versão de is_conditional() para uma requisição qualquer.
+    """
+    return bool(req.if_none_match) or req.if_modified_since is not None
+
+
+# Sufixos dos ETags dos corpos comprimidos (ver encoded_etag).
+ENCODING_SUFFIXES = ('-gzip', '-br')
+
+
+def encoded_etag(etag, encoding):
+    """
+    ETag da representação comprimida com 'encoding' ('gzip' ou 'br').
+    """
+    return f'{etag}-{encoding}'
+
+
+def strip_encoding(etag):
+    """
+    ETag da representação sem compressão (remove o sufixo da codificação).
+    """
+    for suffix in ENCODING_SUFFIXES:
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)]
+    return etag
+
+
+def meal_etag(meal_id, version):
+    """
+    ETag forte de uma refeição: muda sempre que ela é editada (a
+    'version' é incrementada a cada escrita).
+    """
+    return f'{meal_id}-{version}'
+
+
+def if_match_versions(req, meal_id):
+    """
+    Versões da refeição aceitas pelo 'If-Match' de uma escrita.
+
+    Retorna None para 'If-Match: *' (qualquer versão). Levanta
+    InvalidAPIUsage 428 se o cabeçalho faltar e 412 se nenhum ETag
+    enviado for desta refeição. ETags fracos nunca casam (comparação
+    forte, RFC 9110).
+    """
+    if_match = req.if_match
+    if not if_match:
+        raise InvalidAPIUsage(
+            'Cabeçalho "If-Match" obrigatório: envie o ETag da refeição (ou "*").', status_code=428
+        )
+    if if_match.star_tag:
+        return None
+    versions = []
+    for etag in if_match.as_set():
+        tag_meal_id, _, version = strip_encoding(etag).partition('-')
+        if tag_meal_id == str(meal_id) and version.isdigit():
+            versions.append(int(version))
+    if not versions:
+        raise precondition_failed()
+    return versions
+
+
+def precondition_failed():
+    """
+    Erro 412 de uma escrita cuja versão não é mais a atual.
+    """
+    return InvalidAPIUsage(
+        'A refeição foi alterada ou removida desde a última leitura. Busque a versão atual e tente de novo.',
+        status_code=412
+    )
+
+
+def page_etag(user_id, rows, next_cursor, args):
+    """
+    ETag forte de uma página da listagem.
+
+    Combina o usuário (cada um tem a sua listagem), o id e a versão de
+    cada linha da página (mudam em criações, edições e remoções dentro
+    dela), o cursor seguinte (muda quando a página passa a ter, ou deixa
+    de ter, uma próxima) e os parâmetros da query (cada página/filtro é
+    um recurso diferente). Alterações fora da página não a invalidam.
+
+    As listagens não enviam 'Last-Modified' (ver o comentário do
+    módulo): passe None como 'last_modified' ao not_modified e ao
+    add_validators, e o 'If-Modified-Since' é ignorado.
+    """
+    versions = ','.join(f'{row.id}.{row.version}' for row in rows)
+    params = '&'.join(f'{key}={value}' for key, value in sorted(args.items(multi=True)))
+    return _digest(f'meals:{user_id}:{versions}:{next_cursor or ""}:{params}')
+
+
+def not_modified(etag, last_modified):
+    """
+    Avalia os cabeçalhos condicionais da requisição.
+
+    Retorna uma resposta 304 pronta quando o cliente já tem a versão
+    atual, ou None quando a resposta completa deve ser enviada.
+    Seguindo a RFC 9110, 'If-None-Match' tem prioridade sobre
+    'If-Modified-Since'.
+    """
+    if not request_matches(request, etag, last_modified):
+        return None
+    response = current_app.response_class(status=304)
+    return add_validators(response, etag, last_modified)
+
+
+def request_matches(req, etag, last_modified):
+    """
+    Indica se o cliente da requisição 'req' já tem a versão atual
+    (ou seja, se cabe um 304).
+    """
+    if req.if_none_match:
+        # Comparação fraca (RFC 9110), em qualquer codificação.
+        if_none_match = req.if_none_match
+        return if_none_match.star_tag or etag in {strip_encoding(tag) for tag in if_none_match.as_set(include_weak=True)}
+    if req.if_modified_since is not None and last_modified is not None:
+        # O cabeçalho HTTP tem precisão de segundos.
+        return _as_utc(last_modified).replace(microsecond=0) <= req.if_modified_since
+    return False
+
+
+def add_validators(response, etag, last_modified):
+    """
+    Adiciona os cabeçalhos 'ETag' e 'Last-Modified' à resposta.
+    """
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    return response
+
+
+def _digest(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+
+def _as_utc(value):
+    # Os timestamps do modelo são gravados em UTC, sem fuso (datetime.utcnow).
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
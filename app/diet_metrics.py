@@ -0,0 +1,316 @@
+# app/diet_metrics.py
+from sqlalchemy import tuple_, and_, or_, func, literal, select, update, delete, insert
+
+from app import db
+from app.models import User, Meal, DietMetrics, DietStreak
+
+
+# -----------------------------------------------------------------
+# Métricas da Dieta com Manutenção Incremental
+# -----------------------------------------------------------------
+# As métricas são por usuário: cada um tem a sua linha em
+# 'diet_metrics' e as suas sequências em 'diet_streak', calculadas só
+# sobre as próprias refeições.
+#
+# Os contadores (total, dentro e fora da dieta) são ajustados com
+# "+1/-1" a cada escrita. A melhor sequência é mais delicada: uma
+# refeição inserida ou editada fora de ordem pode dividir ou unir
+# sequências. Por isso guardamos TODAS as sequências (tabela
+# 'diet_streak') e, a cada escrita, recalculamos apenas a vizinhança
+# da posição alterada: o intervalo entre a refeição fora da dieta
+# anterior e a seguinte. O custo depende do tamanho da sequência
+# afetada, e não do tamanho da tabela 'meal'.
+#
+# Todas as funções 'record_*' devem ser chamadas DEPOIS do flush da
+# alteração na 'meal' e ANTES do commit, na mesma transação.
+# Os argumentos de posição são tuplas (meal_datetime, id, is_on_diet).
+# O argumento 'session' permite usar outra sessão que não a do
+# Flask-SQLAlchemy (ex: o modo ASGI, via AsyncSession.run_sync).
+# -----------------------------------------------------------------
+
+def get_metrics(user_id, session=None):
+    """
+    Retorna as métricas atuais do usuário sem consultar a tabela 'meal'.
+    """
+    session = session or db.session
+    row = session.execute(select(DietMetrics).where(DietMetrics.user_id == user_id)).scalar()
+    best_streak = session.execute(
+        select(func.max(DietStreak.length)).where(DietStreak.user_id == user_id)
+    ).scalar()
+    return {
+        'total_meals': row.total_meals if row else 0,
+        'on_diet_meals': row.on_diet_meals if row else 0,
+        'off_diet_meals': row.off_diet_meals if row else 0,
+        'best_on_diet_streak': best_streak or 0
+    }
+
+
+def record_created(user_id, positions, session=None):
+    """
+    Registra refeições recém-inseridas do usuário.
+    """
+    session = session or db.session
+    positions = list(positions)
+    on_diet = sum(1 for _, _, is_on_diet in positions if is_on_diet)
+    _increment(session, user_id, len(positions), on_diet, len(positions) - on_diet)
+    for meal_datetime, meal_id, _ in positions:
+        _refresh_streaks_around(session, user_id, meal_datetime, meal_id)
+
+
+def record_updated(user_id, old_position, new_position, session=None):
+    """
+    Registra a edição de uma refeição do usuário (posição antiga -> nova).
+    """
+    session = session or db.session
+    delta = int(bool(new_position[2])) - int(bool(old_position[2]))
+    _increment(session, user_id, 0, delta, -delta)
+    _refresh_streaks_around(session, user_id, old_position[0], old_position[1])
+    _refresh_streaks_around(session, user_id, new_position[0], new_position[1])
+
+
+def record_deleted(user_id, position, session=None):
+    """
+    Registra a remoção de uma refeição do usuário.
+    """
+    session = session or db.session
+    on_diet = 1 if position[2] else 0
+    _increment(session, user_id, -1, -on_diet, on_diet - 1)
+    _refresh_streaks_around(session, user_id, position[0], position[1])
+
+
+def _increment(session, user_id, total, on_diet, off_diet):
+    """
+    Ajusta os contadores do usuário com um único UPDATE atômico.
+
+    Prática Sênior: O UPDATE é sempre executado (mesmo com delta zero),
+    pois ele trava a linha de métricas do usuário até o commit. Isso
+    serializa as transações que mantêm as sequências DESTE usuário e
+    evita que duas escritas concorrentes recalculem a mesma vizinhança
+    ao mesmo tempo; escritas de usuários diferentes não se bloqueiam.
+    """
+    result = session.execute(
+        update(DietMetrics)
+        .where(DietMetrics.user_id == user_id)
+        .values(
+            total_meals=DietMetrics.total_meals + total,
+            on_diet_meals=DietMetrics.on_diet_meals + on_diet,
+            off_diet_meals=DietMetrics.off_diet_meals + off_diet
+        )
+    )
+    if result.rowcount == 0:
+        # Usuário criado sem app.auth.create_user (ex: inserido direto no
+        # banco): cria a linha.
+        session.execute(insert(DietMetrics).values(
+            user_id=user_id,
+            total_meals=total,
+            on_diet_meals=on_diet,
+            off_diet_meals=off_diet
+        ))
+
+
+def _refresh_streaks_around(session, user_id, meal_datetime, meal_id):
+    """
+    Recalcula as sequências do usuário entre a refeição fora da dieta
+    anterior e a seguinte à posição (meal_datetime, meal_id).
+    """
+    position = (meal_datetime, meal_id)
+    meal_key = tuple_(Meal.meal_datetime, Meal.id)
+    owned = Meal.user_id == user_id
+    off_diet = Meal.is_on_diet == db.false()
+
+    # 1. Fronteiras: refeições fora da dieta mais próximas de cada lado
+    lower = session.execute(
+        select(Meal.meal_datetime, Meal.id)
+        .where(owned, off_diet, meal_key < position)
+        .order_by(Meal.meal_datetime.desc(), Meal.id.desc())
+        .limit(1)
+    ).first()
+    upper = session.execute(
+        select(Meal.meal_datetime, Meal.id)
+        .where(owned, off_diet, meal_key > position)
+        .order_by(Meal.meal_datetime.asc(), Meal.id.asc())
+        .limit(1)
+    ).first()
+    lower = tuple(lower) if lower else None
+    upper = tuple(upper) if upper else None
+
+    # Se a própria posição hoje é uma refeição fora da dieta, ela divide
+    # o intervalo em dois.
+    is_boundary = session.execute(
+        select(Meal.id).where(owned, off_diet, Meal.id == meal_id, Meal.meal_datetime == meal_datetime)
+    ).first() is not None
+    if is_boundary:
+        segments = [(lower, position), (position, upper)]
+    else:
+        segments = [(lower, upper)]
+
+    # 2. Remove as sequências antigas cuja fronteira esquerda cai no intervalo
+    left_key = tuple_(DietStreak.left_datetime, DietStreak.left_meal_id)
+    conditions = []
+    if lower is not None:
+        conditions.append(left_key >= lower)
+    if upper is not None:
+        conditions.append(left_key < upper)
+    stale = and_(db.true(), *conditions)
+    if lower is None:
+        stale = or_(DietStreak.left_meal_id.is_(None), stale)
+    session.execute(delete(DietStreak).where(DietStreak.user_id == user_id, stale))
+
+    # 3. Conta as refeições na dieta em cada segmento e grava as novas sequências
+    for start, end in segments:
+        conditions = [owned, Meal.is_on_diet == db.true()]
+        if start is not None:
+            conditions.append(meal_key > start)
+        if end is not None:
+            conditions.append(meal_key < end)
+        length = session.execute(select(func.count()).select_from(Meal).where(*conditions)).scalar()
+        if length:
+            session.execute(insert(DietStreak).values(
+                user_id=user_id,
+                left_datetime=start[0] if start else None,
+                left_meal_id=start[1] if start else None,
+                length=length
+            ))
+
+
+# -----------------------------------------------------------------
+# Reconstrução Completa (usada pelo comando 'flask metrics rebuild')
+# -----------------------------------------------------------------
+
+def compute_from_scan(user_id=None, session=None):
+    """
+    Calcula as métricas de todos os usuários (ou só de 'user_id') do
+    zero, varrendo a tabela 'meal' uma única vez, na ordem do índice
+    (user_id, meal_datetime, id).
+
+    Retorna um dict {user_id: (contadores, sequências)}, onde
+    'sequências' é uma lista de tuplas (left_datetime, left_meal_id, length).
+    """
+    session = session or db.session
+    scanned = {}
+    current_user = None
+    counters = streaks = None
+    left = (None, None)
+    length = 0
+
+    statement = (
+        select(Meal.user_id, Meal.meal_datetime, Meal.id, Meal.is_on_diet)
+        .order_by(Meal.user_id.asc(), Meal.meal_datetime.asc(), Meal.id.asc())
+        .execution_options(yield_per=5000)
+    )
+    if user_id is not None:
+        statement = statement.where(Meal.user_id == user_id)
+    rows = session.execute(statement)
+    for owner_id, meal_datetime, meal_id, is_on_diet in rows:
+        if owner_id != current_user:
+            if length:
+                streaks.append((*left, length))
+            current_user = owner_id
+            counters = {'total_meals': 0, 'on_diet_meals': 0, 'off_diet_meals': 0}
+            streaks = []
+            scanned[owner_id] = (counters, streaks)
+            left = (None, None)
+            length = 0
+        counters['total_meals'] += 1
+        if is_on_diet:
+            counters['on_diet_meals'] += 1
+            length += 1
+        else:
+            counters['off_diet_meals'] += 1
+            if length:
+                streaks.append((*left, length))
+            left = (meal_datetime, meal_id)
+            length = 0
+    if length:
+        streaks.append((*left, length))
+    return scanned
+
+
+def verify():
+    """
+    Compara o estado incremental com uma varredura completa.
+
+    Retorna uma lista de mensagens descrevendo as divergências
+    (vazia quando está tudo consistente).
+    """
+    scanned = compute_from_scan()
+    empty = ({'total_meals': 0, 'on_diet_meals': 0, 'off_diet_meals': 0}, [])
+    stored_counters = {
+        row.user_id: row
+        for row in db.session.execute(select(DietMetrics)).scalars()
+    }
+    stored_streaks = {}
+    for user_id, left_datetime, left_meal_id, length in db.session.execute(
+        select(DietStreak.user_id, DietStreak.left_datetime, DietStreak.left_meal_id, DietStreak.length)
+    ):
+        stored_streaks.setdefault(user_id, set()).add((left_datetime, left_meal_id, length))
+
+    problems = []
+    for user_id in sorted(set(scanned) | set(stored_counters) | set(stored_streaks)):
+        counters, streaks = scanned.get(user_id, empty)
+        stored = stored_counters.get(user_id)
+        for name, expected in counters.items():
+            value = getattr(stored, name) if stored else 0
+            if value != expected:
+                problems.append(f'usuário {user_id}: {name}: armazenado={value} esperado={expected}')
+
+        stored_set = stored_streaks.get(user_id, set())
+        expected_set = set(streaks)
+        for left_datetime, left_meal_id, length in sorted(expected_set - stored_set, key=str):
+            problems.append(f'usuário {user_id}: sequência ausente: após refeição {left_meal_id} ({length} refeições)')
+        for left_datetime, left_meal_id, length in sorted(stored_set - expected_set, key=str):
+            problems.append(f'usuário {user_id}: sequência obsoleta: após refeição {left_meal_id} ({length} refeições)')
+    return problems
+
+
+def rebuild():
+    """
+    Substitui o estado incremental pelo resultado de uma varredura completa.
+    O commit fica a cargo de quem chama.
+
+    Retorna (total de refeições, total de sequências), somando todos os
+    usuários. Usuários sem refeições ficam com os contadores zerados.
+    """
+    scanned = compute_from_scan()
+    db.session.execute(delete(DietStreak))
+    db.session.execute(delete(DietMetrics))
+    db.session.execute(
+        insert(DietMetrics).from_select(
+            ['user_id', 'total_meals', 'on_diet_meals', 'off_diet_meals'],
+            select(User.id, literal(0), literal(0), literal(0))
+        )
+    )
+    for user_id, (counters, streaks) in scanned.items():
+        db.session.execute(update(DietMetrics).where(DietMetrics.user_id == user_id).values(**counters))
+        if streaks:
+            db.session.execute(insert(DietStreak), [
+                {'user_id': user_id, 'left_datetime': left_datetime, 'left_meal_id': left_meal_id, 'length': length}
+                for left_datetime, left_meal_id, length in streaks
+            ])
+    total_meals = sum(counters['total_meals'] for counters, _ in scanned.values())
+    total_streaks = sum(len(streaks) for _, streaks in scanned.values())
+    return total_meals, total_streaks
+
+
+def rebuild_user(user_id, session=None):
+    """
+    Recalcula só as métricas de um usuário, com uma varredura das
+    refeições DELE. Usada depois de cargas em massa (ver
+    app/importer.py), em que manter as sequências linha a linha sairia
+    mais caro que varrer o histórico uma vez. O commit fica a cargo de
+    quem chama.
+    """
+    session = session or db.session
+    # Trava a linha de métricas do usuário antes da varredura (mesma
+    # regra do _increment): escritas concorrentes dele esperam o commit.
+    _increment(session, user_id, 0, 0, 0)
+    counters, streaks = compute_from_scan(user_id, session).get(
+        user_id, ({'total_meals': 0, 'on_diet_meals': 0, 'off_diet_meals': 0}, [])
+    )
+    session.execute(update(DietMetrics).where(DietMetrics.user_id == user_id).values(**counters))
+    session.execute(delete(DietStreak).where(DietStreak.user_id == user_id))
+    if streaks:
+        session.execute(insert(DietStreak), [
+            {'user_id': user_id, 'left_datetime': left_datetime, 'left_meal_id': left_meal_id, 'length': length}
+            for left_datetime, left_meal_id, length in streaks
+        ])
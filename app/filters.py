@@ -0,0 +1,174 @@
+# app/filters.py
+import re
+
+from sqlalchemy import DDL, event, func, literal, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.errors import InvalidAPIUsage
+from app.models import Meal
+from app.validators import parse_datetime_arg
+
+# Tamanho máximo do prefixo aceito no filtro 'name' (o mesmo da coluna).
+NAME_FILTER_MAX_LENGTH = 100
+
+# Maior caractere Unicode: "prefixo + ele" fica depois de qualquer texto
+# que comece com o prefixo (limite superior do intervalo no SQLite).
+_MAX_CHAR = '\U0010ffff'
+
+_LIKE_SPECIAL = re.compile(r'([\\%_])')
+
+
+# -----------------------------------------------------------------
+# Filtros da Listagem (GET /meals?from=&to=&is_on_diet=&name=)
+# -----------------------------------------------------------------
+# Prática Sênior: Cada filtro vira um predicado "sargable", ou seja,
+# que o banco consegue resolver com um índice, sem aplicar funções
+# sobre cada linha da tabela. A listagem sempre filtra por 'user_id'
+# (igualdade), que é a primeira coluna de todos os índices abaixo:
+#   - from/to:    intervalo [from, to) em 'meal_datetime', resolvido
+#                 pelo índice (user_id, meal_datetime, id).
+#   - is_on_diet: igualdade resolvida pelo índice
+#                 (user_id, is_on_diet, meal_datetime, id), que ainda
+#                 entrega as linhas na ordem da listagem.
+#   - name:       prefixo do nome, sem diferenciar maiúsculas. Usa um
+#                 índice sobre (user_id, lower(name)): com
+#                 'text_pattern_ops' no PostgreSQL (para o LIKE 'abc%'
+#                 virar um intervalo) e um intervalo explícito no SQLite.
+#
+# O índice de (user_id, lower(name)) é criado pela migração e, em
+# bancos criados com db.create_all(), pelos eventos DDL abaixo.
+# -----------------------------------------------------------------
+
+PG_CREATE_NAME_INDEX = 'CREATE INDEX IF NOT EXISTS ix_meal_user_id_lower_name ON meal (user_id, lower(name) text_pattern_ops)'
+SQLITE_CREATE_NAME_INDEX = 'CREATE INDEX IF NOT EXISTS ix_meal_user_id_lower_name ON meal (user_id, lower(name))'
+
+event.listen(Meal.__table__, 'after_create', DDL(PG_CREATE_NAME_INDEX).execute_if(dialect='postgresql'))
+event.listen(Meal.__table__, 'after_create', DDL(SQLITE_CREATE_NAME_INDEX).execute_if(dialect='sqlite'))
+
+
+def parse_meal_filters(args):
+    """
+    Valida os parâmetros de filtro da listagem.
+
+    Retorna um dict com as chaves 'from', 'to', 'is_on_diet' e 'name'
+    (None quando o filtro não foi enviado). Levanta InvalidAPIUsage (400)
+    se algum valor for inválido.
+    """
+    filters = {
+        'from': parse_datetime_arg(args, 'from'),
+        'to': parse_datetime_arg(args, 'to'),
+        'is_on_diet': None,
+        'name': None
+    }
+
+    is_on_diet = args.get('is_on_diet')
+    if is_on_diet:
+        if is_on_diet.lower() not in ('true', 'false'):
+            raise InvalidAPIUsage('O parâmetro "is_on_diet" deve ser "true" ou "false".', status_code=400)
+        filters['is_on_diet'] = is_on_diet.lower() == 'true'
+
+    name = args.get('name')
+    if name:
+        if len(name) > NAME_FILTER_MAX_LENGTH:
+            raise InvalidAPIUsage(f'O parâmetro "name" pode ter no máximo {NAME_FILTER_MAX_LENGTH} caracteres.', status_code=400)
+        filters['name'] = name
+    return filters
+
+
+def meal_filter_conditions(filters, dialect_name):
+    """
+    Converte os filtros validados em condições do WHERE.
+    """
+    conditions = []
+    # Intervalo semiaberto [from, to), como no GET /meals/stats.
+    if filters['from'] is not None:
+        conditions.append(Meal.meal_datetime >= filters['from'])
+    if filters['to'] is not None:
+        conditions.append(Meal.meal_datetime < filters['to'])
+    if filters['is_on_diet'] is not None:
+        conditions.append(Meal.is_on_diet == filters['is_on_diet'])
+    if filters['name'] is not None:
+        # O lower() do próprio banco é aplicado dos dois lados, para que o
+        # prefixo seja normalizado exatamente como o índice.
+        lower_name = func.lower(Meal.name)
+        prefix = func.lower(literal(filters['name']))
+        if dialect_name == 'postgresql':
+            escaped = func.lower(literal(_LIKE_SPECIAL.sub(r'\\\1', filters['name'])))
+            conditions.append(lower_name.like(escaped + '%', escape='\\'))
+        else:
+            conditions.append(lower_name >= prefix)
+            conditions.append(lower_name < prefix + _MAX_CHAR)
+    return conditions
+
+
+# -----------------------------------------------------------------
+# Verificação dos Planos de Execução (EXPLAIN)
+# -----------------------------------------------------------------
+# Combinações de filtros mais comuns da listagem. Nenhuma delas pode
+# virar uma varredura completa da tabela 'meal'.
+# -----------------------------------------------------------------
+
+# Usuário das consultas verificadas (o plano não depende do valor).
+PLAN_CHECK_USER_ID = 1
+
+PLAN_CHECK_CASES = (
+    {'from': '2024-01-01T00:00:00', 'to': '2024-01-08T00:00:00'},
+    {'is_on_diet': 'false'},
+    {'is_on_diet': 'false', 'from': '2024-01-01T00:00:00', 'to': '2024-01-08T00:00:00'},
+    {'name': 'fran'},
+    {'name': 'fran', 'is_on_diet': 'true'},
+)
+
+
+class Explain(Executable, ClauseElement):
+    """
+    "EXPLAIN <consulta>", com os parâmetros da consulta original.
+    No SQLite, vira "EXPLAIN QUERY PLAN" (o plano em alto nível).
+    """
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = 'EXPLAIN QUERY PLAN' if compiler.dialect.name == 'sqlite' else 'EXPLAIN'
+    return f'{prefix} {compiler.process(element.statement, **kw)}'
+
+
+def find_sequential_scans(session, statement_for_filters):
+    """
+    Roda o EXPLAIN da listagem para cada caso de PLAN_CHECK_CASES.
+
+    'statement_for_filters' recebe as condições do WHERE dos filtros e
+    devolve a consulta a verificar (já filtrada por PLAN_CHECK_USER_ID).
+    Retorna a lista de (caso, plano) cujo plano lê a tabela 'meal' inteira.
+
+    No PostgreSQL, o teste desliga o 'enable_seqscan' (só nesta
+    transação): em tabelas pequenas o planner prefere, com razão, a
+    varredura sequencial; com ela desligada, só sobra "Seq Scan" quando
+    não existe nenhum índice que atenda ao filtro. A transação é
+    desfeita ao final.
+    """
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == 'postgresql':
+        session.execute(select(func.set_config('enable_seqscan', 'off', True)))
+
+    problems = []
+    for case in PLAN_CHECK_CASES:
+        statement = statement_for_filters(meal_filter_conditions(parse_meal_filters(case), dialect_name))
+        rows = session.execute(Explain(statement)).all()
+        if dialect_name == 'postgresql':
+            plan = [row[0] for row in rows]
+            full_scan = any('Seq Scan on meal' in line for line in plan)
+        else:
+            plan = [row[3] for row in rows]
+            # 'SEARCH meal USING INDEX ...' é uma busca pelo índice;
+            # 'SCAN meal' (com ou sem índice) percorre a tabela toda.
+            full_scan = any(re.match(r'SCAN meal\b', line) for line in plan)
+        if full_scan:
+            problems.append((case, plan))
+    session.rollback()
+    return problems
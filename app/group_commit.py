@@ -0,0 +1,270 @@
+# app/group_commit.py
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.errors import InvalidAPIUsage
+from app.instrumentation import Histogram, LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+# Limites dos "buckets" do histograma de tamanho dos lotes.
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+# -----------------------------------------------------------------
+# Group Commit: Várias Escritas, Um Commit
+# -----------------------------------------------------------------
+# Cada POST /meals e PUT/PATCH /meals/<id> confirma a sua própria
+# transação, e cada commit espera o fsync do WAL. Sob muitas escritas
+# simultâneas (todo mundo registrando o almoço ao meio-dia), o banco
+# fica limitado pela latência do fsync, e não pelo trabalho em si.
+#
+# Com GROUP_COMMIT_ENABLED, as rotas validam a requisição como sempre
+# e entregam a escrita a um único escritor por processo (uma thread
+# com a sua própria sessão). O escritor junta as escritas que chegam
+# em até GROUP_COMMIT_WINDOW_MS, ou até GROUP_COMMIT_MAX_BATCH delas,
+# executa todas em UMA transação e faz um commit só. Cada requisição
+# espera o resultado da SUA escrita, entregue só depois do commit
+# durável (ou o seu erro).
+#
+# Prática Sênior: Isolamento das falhas. Uma precondição que falha
+# (412) não grava nada e não atrapalha o lote. Se o banco recusar uma
+# escrita (ou o commit), o lote inteiro é desfeito e cada escrita é
+# refeita sozinha, na sua própria transação: só a culpada recebe o
+# erro. As escritas do lote são ordenadas por usuário, de modo que as
+# linhas de métricas (travadas até o commit, ver app/diet_metrics.py)
+# são sempre travadas na mesma ordem.
+#
+# Criações com 'Idempotency-Key' seguem pelo caminho normal: a chave
+# é gravada na transação da própria requisição (ver app/idempotency.py).
+#
+# Prática Sênior: Nenhuma espera sem prazo. Se o escritor travar (ou
+# morrer), a requisição desiste depois de GROUP_COMMIT_TIMEOUT_SECONDS
+# e responde 503, em vez de prender o worker para sempre. Uma escrita
+# que o escritor ainda não começou é cancelada (ele a pula); a próxima
+# escrita reinicia uma thread que tenha morrido.
+# -----------------------------------------------------------------
+
+class WriterStopped(Exception):
+    """
+    O escritor parou no meio do lote (um erro inesperado derrubou a thread).
+    """
+
+
+class _Write:
+    """
+    Uma escrita na fila: 'operation(session, user_id, *args)' e o
+    Future em que a requisição espera o resultado.
+    """
+    __slots__ = ('user_id', 'operation', 'args', 'future')
+
+    def __init__(self, user_id, operation, args):
+        self.user_id = user_id
+        self.operation = operation
+        self.args = args
+        self.future = Future()
+
+
+class GroupCommitWriter:
+    """
+    Fila de escritas e a thread que as confirma em lotes.
+    """
+
+    def __init__(self, app, db, max_batch, window_seconds, timeout_seconds):
+        self.app = app
+        self.db = db
+        self.max_batch = max_batch
+        self.window_seconds = window_seconds
+        self.timeout_seconds = timeout_seconds
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.commit_latency = Histogram(LATENCY_BUCKETS)
+        self.batches = 0
+        self.writes = 0
+        self.retried_batches = 0
+        self.timeouts = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, operation, *args):
+        """
+        Enfileira a escrita e espera o commit do lote. Retorna o
+        resultado de 'operation' ou levanta o erro dela (InvalidAPIUsage
+        ou SQLAlchemyError), como se ela tivesse rodado na requisição.
+        Levanta InvalidAPIUsage 503 se o lote não terminar em
+        'timeout_seconds'.
+        """
+        self._ensure_started()
+        # A requisição devolve a sua conexão (aberta pela autenticação)
+        # ao pool antes de esperar: com muitas requisições na fila, o
+        # escritor ficaria sem conexão para o próprio lote.
+        self.db.session.close()
+        write = _Write(user_id, operation, args)
+        self._queue.put(write)
+        try:
+            return write.future.result(timeout=self.timeout_seconds)
+        except FutureTimeoutError:
+            # Só dá para cancelar o que o escritor ainda não pegou; uma
+            # escrita já em andamento pode ainda chegar ao commit.
+            started = not write.future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            logger.error(
+                f'Group commit sem resposta em {self.timeout_seconds}s '
+                f'(escrita {"em andamento" if started else "cancelada"}).'
+            )
+            raise InvalidAPIUsage('Servidor sobrecarregado. Tente de novo em instantes.', status_code=503)
+
+    def _ensure_started(self):
+        # A thread nasce na primeira escrita (e não no create_app), para
+        # que cada processo de um servidor com fork tenha a sua.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+
+    # --- Thread do escritor --------------------------------------------
+    def _run(self):
+        # Um contexto de aplicação próprio: 'db.session' é uma sessão só
+        # desta thread, e os eventos do cache (app/cache.py) invalidam as
+        # respostas depois de cada commit, como nas rotas.
+        with self.app.app_context():
+            session = self.db.session
+            while True:
+                batch = self._next_batch()
+                try:
+                    self._flush(session, batch)
+                except SQLAlchemyError as e:
+                    # O banco falhou fora de uma escrita (ex: a conexão
+                    # caiu e nem o rollback passou). O close descarta a
+                    # conexão; o próximo lote pega outra do pool.
+                    logger.exception('Falha do banco no group commit.')
+                    session.close()
+                    _fail_pending(batch, e)
+                finally:
+                    # Qualquer outro erro é um bug: ele derruba a thread
+                    # (o threading registra o traceback) e a próxima
+                    # escrita inicia outra. As requisições deste lote
+                    # recebem o erro na hora, sem esperar o prazo.
+                    _fail_pending(batch, WriterStopped('O escritor do group commit parou.'))
+
+    def _next_batch(self):
+        # Espera a primeira escrita; depois junta as que chegarem dentro
+        # da janela, até o tamanho máximo do lote.
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, session, batch):
+        # Pula as escritas que a requisição já cancelou (prazo vencido).
+        batch[:] = [write for write in batch if write.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        batch.sort(key=lambda write: write.user_id)
+        start = time.perf_counter()
+        outcomes = []
+        try:
+            for write in batch:
+                outcomes.append((write, *_apply(session, write)))
+            session.commit()
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.warning(f'Lote do group commit desfeito ({len(batch)} escritas), refazendo uma a uma: {e}')
+            self._retry_individually(session, batch)
+            self._observe('retried', len(batch), time.perf_counter() - start)
+            return
+        self._observe('committed', len(batch), time.perf_counter() - start)
+
+        # Só agora, com o commit durável, as requisições são liberadas.
+        for write, result, error in outcomes:
+            if error is None:
+                write.future.set_result(result)
+            else:
+                write.future.set_exception(error)
+
+    def _retry_individually(self, session, batch):
+        for write in batch:
+            try:
+                result, error = _apply(session, write)
+                session.commit()
+            except SQLAlchemyError as e:
+                session.rollback()
+                write.future.set_exception(e)
+                continue
+            if error is None:
+                write.future.set_result(result)
+            else:
+                write.future.set_exception(error)
+
+    def _observe(self, outcome, size, elapsed):
+        self.batch_sizes.observe((outcome,), size)
+        self.commit_latency.observe((outcome,), elapsed)
+        with self._lock:
+            self.batches += 1
+            self.writes += size
+            if outcome == 'retried':
+                self.retried_batches += 1
+
+    # --- Exposição ----------------------------------------------------
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'writes': self.writes,
+            'retried_batches': self.retried_batches,
+            'timeouts': self.timeouts,
+            'average_batch_size': round(self.writes / self.batches, 2) if self.batches else None,
+            'queue_depth': self._queue.qsize()
+        }
+
+    def render_prometheus(self):
+        lines = self.batch_sizes.render('group_commit_batch_size', ('outcome',))
+        lines += self.commit_latency.render('group_commit_duration_seconds', ('outcome',))
+        lines += ['# TYPE group_commit_queue_depth gauge', f'group_commit_queue_depth {self._queue.qsize()}']
+        return lines
+
+
+def _fail_pending(batch, error):
+    for write in batch:
+        try:
+            if not write.future.done():
+                write.future.set_exception(error)
+        except InvalidStateError:
+            # Cancelada pela requisição entre o done() e o set_exception().
+            pass
+
+
+def _apply(session, write):
+    # Retorna (resultado, erro). Um InvalidAPIUsage (ex: 412) vem de
+    # uma escrita que não gravou nada, então o lote segue.
+    try:
+        return write.operation(session, write.user_id, *write.args), None
+    except InvalidAPIUsage as e:
+        return None, e
+
+
+def init_group_commit(app, db):
+    """
+    Cria o escritor do group commit (se GROUP_COMMIT_ENABLED). Sem ele,
+    cada requisição confirma a sua própria transação.
+    """
+    if not app.config['GROUP_COMMIT_ENABLED']:
+        return None
+    writer = GroupCommitWriter(
+        app, db, app.config['GROUP_COMMIT_MAX_BATCH'], app.config['GROUP_COMMIT_WINDOW_MS'] / 1000,
+        app.config['GROUP_COMMIT_TIMEOUT_SECONDS']
+    )
+    app.extensions['group_commit'] = writer
+    return writer
@@ -0,0 +1,212 @@
+# app/idempotency.py
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+
+from app.errors import InvalidAPIUsage
+from app.models import IdempotencyKey
+
+
+# -----------------------------------------------------------------
+# Chaves de Idempotência (cabeçalho 'Idempotency-Key')
+# -----------------------------------------------------------------
+# Clientes móveis reenviam o POST /meals (e o /meals/batch) quando a
+# rede falha, e cada reenvio criaria uma refeição duplicada. Com o
+# cabeçalho 'Idempotency-Key', a primeira requisição grava a chave, uma
+# impressão digital da requisição e a resposta enviada na tabela
+# 'idempotency_key'; um retry com a mesma chave recebe a MESMA
+# resposta, lida pelo índice único (user_id, key), sem tocar na 'meal'.
+#
+# Prática Sênior: Sem locks. A chave é reservada com um INSERT no
+# início da transação da criação e a resposta é gravada antes do
+# commit. Duas requisições simultâneas com a mesma chave batem na
+# restrição única: a segunda espera a primeira terminar e falha com
+# IntegrityError; então desfaz a sua transação (a refeição nem chegou
+# a ser inserida) e devolve a resposta que a primeira gravou.
+#
+# As chaves valem por IDEMPOTENCY_KEY_TTL_SECONDS. Chaves vencidas são
+# ignoradas (a chave pode ser reutilizada) e apagadas em segundo plano,
+# em lotes, no máximo a cada IDEMPOTENCY_PURGE_INTERVAL_SECONDS, ou
+# pelo comando 'flask meals purge-idempotency-keys'.
+#
+# As funções recebem a requisição e a sessão explicitamente, para
+# servir também ao modo ASGI (via AsyncSession.run_sync).
+# -----------------------------------------------------------------
+
+HEADER = 'Idempotency-Key'
+
+# Tamanho máximo da chave (o da coluna). UUIDs e hashes cabem folgados.
+MAX_KEY_LENGTH = 255
+
+# Cabeçalhos da resposta original que voltam no retry.
+REPLAYED_HEADERS = ('ETag', 'Last-Modified')
+
+# Cabeçalho que marca uma resposta reenviada a partir da chave.
+REPLAYED_MARKER = 'Idempotent-Replayed'
+
+
+def request_key(req):
+    """
+    Chave enviada no cabeçalho 'Idempotency-Key' (None se não houver).
+    Levanta InvalidAPIUsage (400) se ela for vazia, longa demais ou
+    tiver caracteres fora do ASCII imprimível.
+    """
+    key = req.headers.get(HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH or not (key.isascii() and key.isprintable()):
+        raise InvalidAPIUsage(
+            f'O cabeçalho "{HEADER}" deve ter de 1 a {MAX_KEY_LENGTH} caracteres ASCII imprimíveis.',
+            status_code=400
+        )
+    return key
+
+
+def request_fingerprint(method, path, body):
+    """
+    Impressão digital da requisição (SHA-256 do método, da rota e do
+    corpo em bytes).
+    """
+    digest = hashlib.sha256(f'{method} {path}\n'.encode('utf-8'))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def lookup_statement(user_id, key):
+    """
+    A chave do usuário, com a resposta gravada (índice único).
+    """
+    return select(
+        IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.response_body,
+        IdempotencyKey.response_headers, IdempotencyKey.expires_at
+    ).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+
+
+def begin(session, user_id, key, fingerprint, ttl_seconds):
+    """
+    Verifica a chave e, se ela for nova, reserva-a na transação atual.
+
+    Retorna (replay, record): 'replay' é a linha com a resposta a
+    reenviar (e 'record' é None), ou 'record' é a chave reservada, que
+    recebe a resposta em record_response() antes do commit.
+
+    Levanta InvalidAPIUsage 422 se a chave já foi usada com outra
+    requisição, e 409 se ela estiver reservada por uma requisição que
+    ainda não terminou (só acontece em bancos que não esperam o INSERT
+    concorrente).
+    """
+    row = session.execute(lookup_statement(user_id, key)).first()
+    if _replayable(row, fingerprint):
+        return row, None
+    try:
+        return None, claim(session, user_id, key, fingerprint, ttl_seconds, expired=row is not None)
+    except IntegrityError:
+        # Outra requisição com a mesma chave confirmou antes: a dela vale.
+        session.rollback()
+    row = session.execute(lookup_statement(user_id, key)).first()
+    if _replayable(row, fingerprint):
+        return row, None
+    raise InvalidAPIUsage(
+        f'Outra requisição com esta "{HEADER}" ainda está em andamento. Tente de novo em instantes.',
+        status_code=409
+    )
+
+
+def claim(session, user_id, key, fingerprint, ttl_seconds, expired=False):
+    """
+    Reserva a chave com um INSERT (o flush é imediato, para que uma
+    duplicata concorrente esbarre na restrição única o quanto antes).
+    Com 'expired', apaga antes a linha vencida da mesma chave.
+    """
+    now = datetime.utcnow()
+    if expired:
+        session.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id, IdempotencyKey.key == key, IdempotencyKey.expires_at <= now
+        ))
+    record = IdempotencyKey(
+        user_id=user_id, key=key, fingerprint=fingerprint,
+        created_at=now, expires_at=now + timedelta(seconds=ttl_seconds)
+    )
+    session.add(record)
+    session.flush()
+    return record
+
+
+def record_response(record, status_code, body, headers):
+    """
+    Guarda a resposta da criação na chave reservada (gravada no commit,
+    junto com as refeições).
+    """
+    record.status_code = status_code
+    record.response_body = body
+    record.response_headers = json.dumps({name: headers[name] for name in REPLAYED_HEADERS if name in headers})
+
+
+def replay_headers(row):
+    """
+    Cabeçalhos da resposta reenviada: os originais mais o marcador.
+    """
+    headers = json.loads(row.response_headers or '{}')
+    headers[REPLAYED_MARKER] = 'true'
+    return headers
+
+
+def _replayable(row, fingerprint):
+    # Nenhuma chave (ou uma chave vencida): a requisição é nova.
+    if row is None or row.expires_at <= datetime.utcnow():
+        return False
+    if row.fingerprint != fingerprint:
+        raise InvalidAPIUsage(
+            f'A "{HEADER}" já foi usada com outra requisição. Use uma chave nova para cada criação.',
+            status_code=422
+        )
+    return row.status_code is not None
+
+
+# -----------------------------------------------------------------
+# Expurgo das Chaves Vencidas
+# -----------------------------------------------------------------
+
+_purge_lock = threading.Lock()
+_purged_at = None
+
+
+def purge_due(interval_seconds):
+    """
+    Indica se este processo deve expurgar agora. Só uma chamada por
+    intervalo recebe True; as outras seguem sem esperar.
+    """
+    global _purged_at
+    if interval_seconds <= 0:
+        return False
+    now = time.monotonic()
+    with _purge_lock:
+        if _purged_at is not None and now - _purged_at < interval_seconds:
+            return False
+        _purged_at = now
+        return True
+
+
+def purge_expired(connection, batch_size):
+    """
+    Apaga até 'batch_size' chaves vencidas (pelo índice de
+    'expires_at'). Recebe uma Connection ou uma Session; o commit fica
+    a cargo de quem chama. Retorna quantas foram apagadas.
+    """
+    expired = (
+        select(IdempotencyKey.id)
+        .where(IdempotencyKey.expires_at <= datetime.utcnow())
+        .limit(batch_size)
+    )
+    statement = (
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.id.in_(expired))
+        .execution_options(synchronize_session=False)
+    )
+    return connection.execute(statement).rowcount
@@ -0,0 +1,157 @@
+# app/importer.py
+import csv
+import io
+
+from sqlalchemy import insert
+
+from app import diet_metrics
+from app.errors import InvalidAPIUsage
+from app.models import Meal
+from app.validators import validate_meal_payload
+
+
+# -----------------------------------------------------------------
+# Importação em Massa (CSV / NDJSON)
+# -----------------------------------------------------------------
+# Usada pelo comando 'flask meals import' e pelo POST /meals/import,
+# para trazer anos de histórico de outros apps de dieta.
+#
+# Prática Sênior: Memória constante. O arquivo é lido linha a linha
+# (csv.DictReader / uma linha NDJSON por vez), cada linha passa pelas
+# MESMAS regras do create_meal (validate_meal_payload) e só um bloco
+# de MEALS_IMPORT_CHUNK_SIZE linhas válidas fica em memória antes de
+# ir para o banco:
+#   - PostgreSQL: 'COPY meal (...) FROM STDIN' (formato CSV), o
+#     caminho mais rápido de carga, sem um INSERT por linha.
+#   - Outros bancos (SQLite): INSERT em lote (executemany).
+# As linhas rejeitadas vão para o relatório ('reject'), com o número
+# da linha no arquivo e o motivo.
+#
+# Tudo roda em uma única transação (o commit fica a cargo de quem
+# chama). No fim, as métricas do usuário são recalculadas com UMA
+# varredura (diet_metrics.rebuild_user), em vez de serem mantidas
+# linha a linha. O COPY não passa pelos eventos do ORM: quem chama
+# também invalida o cache do usuário depois do commit.
+#
+# Prática Sênior: Um instante só, gravado uma vez. Uma importação
+# grande leva bem mais que a janela de acomodação da sincronização
+# (MEALS_SYNC_SETTLE_SECONDS, ver app/sync.py). Quem chama abre uma
+# barreira (sync.sync_barrier) e passa o instante dela como 'stamp':
+# todas as linhas já saem do COPY/INSERT com ele em 'created_at' e
+# 'updated_at', e a barreira impede que algum token passe desse
+# instante antes do commit. Nenhuma linha é regravada no fim.
+# -----------------------------------------------------------------
+
+# Formatos aceitos e o Content-Type de cada um no POST /meals/import.
+IMPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+# Colunas gravadas pelo COPY, na ordem do CSV gerado. A 'version'
+# fica com o DEFAULT do banco (1).
+COPY_COLUMNS = ('user_id', 'name', 'description', 'meal_datetime', 'is_on_diet', 'created_at', 'updated_at')
+
+# Valores aceitos para 'is_on_diet' no CSV (sem diferenciar maiúsculas).
+CSV_TRUE = frozenset({'true', '1', 'yes', 'sim'})
+CSV_FALSE = frozenset({'false', '0', 'no', 'nao', 'não'})
+
+
+def iter_items(lines, import_format, loads):
+    """
+    Lê o arquivo sob demanda e gera (número da linha, item). Um item é
+    o dict de uma refeição ou um InvalidAPIUsage com o motivo de a
+    linha nem ter virado uma refeição.
+    """
+    if import_format == 'csv':
+        return _iter_csv_items(lines)
+    return _iter_ndjson_items(lines, loads)
+
+
+def _iter_csv_items(lines):
+    # Cabeçalho obrigatório: name, description, meal_datetime, is_on_diet.
+    reader = csv.DictReader(lines)
+    for row in reader:
+        line = reader.line_num
+        is_on_diet = (row.get('is_on_diet') or '').strip().lower()
+        if 'is_on_diet' in row and is_on_diet not in CSV_TRUE | CSV_FALSE:
+            yield line, InvalidAPIUsage('Valor de "is_on_diet" inválido. Use true ou false.')
+            continue
+        item = {key: value for key, value in row.items() if key is not None}
+        if 'is_on_diet' in item:
+            item['is_on_diet'] = is_on_diet in CSV_TRUE
+        if not item.get('description'):
+            item['description'] = None
+        yield line, item
+
+
+def _iter_ndjson_items(lines, loads):
+    for line, text in enumerate(lines, start=1):
+        if not text.strip():
+            continue
+        try:
+            yield line, loads(text)
+        except ValueError:
+            yield line, InvalidAPIUsage('Linha NDJSON não é um JSON válido.')
+
+
+def import_meals(session, user_id, items, chunk_size, reject, stamp):
+    """
+    Valida e grava as refeições de 'items' (ver iter_items) em nome do
+    usuário, em blocos de 'chunk_size', todas com o instante 'stamp'
+    (o da barreira da sincronização; ver o comentário acima).
+
+    'reject(line, message)' é chamada para cada linha rejeitada.
+    Retorna (importadas, rejeitadas).
+    """
+    load = _copy_chunk if session.get_bind().dialect.name == 'postgresql' else _insert_chunk
+    imported = rejected = 0
+    chunk = []
+    for line, item in items:
+        try:
+            if isinstance(item, InvalidAPIUsage):
+                raise item
+            values = validate_meal_payload(item)
+        except InvalidAPIUsage as error:
+            rejected += 1
+            reject(line, error.message)
+            continue
+        chunk.append(values)
+        if len(chunk) >= chunk_size:
+            load(session, user_id, chunk, stamp)
+            imported += len(chunk)
+            chunk = []
+    if chunk:
+        load(session, user_id, chunk, stamp)
+        imported += len(chunk)
+
+    if imported:
+        diet_metrics.rebuild_user(user_id, session=session)
+    return imported, rejected
+
+
+def _insert_chunk(session, user_id, chunk, stamp):
+    # INSERT em lote; os timestamps vão explícitos, como no COPY.
+    session.execute(insert(Meal), [
+        {**values, 'user_id': user_id, 'created_at': stamp, 'updated_at': stamp} for values in chunk
+    ])
+
+
+def _copy_chunk(session, user_id, chunk, stamp):
+    # O bloco vira um CSV em memória e segue por 'COPY ... FROM STDIN'
+    # na conexão da sessão (mesma transação). QUOTE_NONNUMERIC distingue
+    # NULL (campo vazio, sem aspas) de texto vazio ("").
+    stamp = stamp.isoformat(' ')
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+    for values in chunk:
+        writer.writerow((
+            user_id, values['name'], values['description'], values['meal_datetime'].isoformat(' '),
+            values['is_on_diet'], stamp, stamp
+        ))
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY meal ({", ".join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
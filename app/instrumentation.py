@@ -0,0 +1,192 @@
+# app/instrumentation.py
+import json
+import logging
+import threading
+import time
+
+from flask import g, request, has_request_context, current_app
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Limites (em segundos) dos "buckets" do histograma de latência.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# -----------------------------------------------------------------
+# Instrumentação de Desempenho por Requisição
+# -----------------------------------------------------------------
+# - before_request/after_request medem o tempo total da requisição;
+# - os eventos before/after_cursor_execute do engine contam as
+#   consultas SQL e somam o tempo gasto no banco;
+# - consultas acima de SLOW_QUERY_MS geram um log estruturado (JSON);
+# - o cabeçalho 'Server-Timing' mostra o detalhamento no navegador;
+# - GET /metrics expõe tudo no formato texto do Prometheus.
+# -----------------------------------------------------------------
+
+class Histogram:
+    """
+    Histograma cumulativo no estilo Prometheus, seguro para threads.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self, name, label_names):
+        """
+        Gera as linhas do formato texto do Prometheus.
+        """
+        lines = [f'# TYPE {name} histogram']
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                base = ','.join(f'{key}="{_escape(value)}"' for key, value in zip(label_names, labels))
+                for bound, count in zip(self.buckets, series['counts']):
+                    lines.append(f'{name}_bucket{{{base},le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{base},le="+Inf"}} {series["count"]}')
+                lines.append(f'{name}_sum{{{base}}} {series["sum"]:.6f}')
+                lines.append(f'{name}_count{{{base}}} {series["count"]}')
+        return lines
+
+
+class Instrumentation:
+    """
+    Guarda os histogramas e contadores da aplicação.
+    """
+
+    def __init__(self, slow_query_ms):
+        self.slow_query_ms = slow_query_ms
+        self.request_latency = Histogram()
+        self.db_latency = Histogram()
+        self.slow_queries = 0
+        self._lock = threading.Lock()
+
+    # --- Ciclo da requisição -----------------------------------------
+    def before_request(self):
+        g.request_start = time.perf_counter()
+        g.db_queries = 0
+        g.db_time = 0.0
+
+    def after_request(self, response):
+        start = g.pop('request_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+
+        # 'url_rule' é o padrão da rota (ex: /api/v1/meals/<int:meal_id>),
+        # o que mantém a cardinalidade dos rótulos sob controle.
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = str(response.status_code)
+        self.request_latency.observe((route, request.method, status), elapsed)
+        self.db_latency.observe((route, request.method), g.get('db_time', 0.0))
+
+        if current_app.config['SERVER_TIMING_ENABLED']:
+            timings = [
+                f'app;dur={elapsed * 1000:.2f}',
+                f'db;dur={g.get("db_time", 0.0) * 1000:.2f};desc="{g.get("db_queries", 0)} queries"'
+            ]
+            if 'pool_wait' in g:
+                timings.append(f'pool;dur={g.pool_wait * 1000:.2f}')
+            response.headers.add('Server-Timing', ', '.join(timings))
+        return response
+
+    # --- Eventos do engine -------------------------------------------
+    def attach(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        if has_request_context():
+            g.db_queries = g.get('db_queries', 0) + 1
+            g.db_time = g.get('db_time', 0.0) + elapsed
+
+        if elapsed * 1000 >= self.slow_query_ms:
+            with self._lock:
+                self.slow_queries += 1
+            # Prática Sênior: Log estruturado (JSON), fácil de filtrar e
+            # agregar em ferramentas de observabilidade.
+            logger.warning(json.dumps({
+                'event': 'slow_query',
+                'duration_ms': round(elapsed * 1000, 2),
+                'route': request.path if has_request_context() else None,
+                'method': request.method if has_request_context() else None,
+                'executemany': executemany,
+                'statement': ' '.join(statement.split())[:1000]
+            }))
+
+    # --- Exposição ----------------------------------------------------
+    def render_prometheus(self, cache_stats=None, pool_stats=None, admission_stats=None, group_commit=None):
+        lines = self.request_latency.render('http_request_duration_seconds', ('route', 'method', 'status'))
+        lines += self.db_latency.render('http_request_db_duration_seconds', ('route', 'method'))
+        lines += ['# TYPE db_slow_queries_total counter', f'db_slow_queries_total {self.slow_queries}']
+
+        if cache_stats:
+            for key in ('hits', 'misses', 'evictions'):
+                lines += [f'# TYPE response_cache_{key}_total counter', f'response_cache_{key}_total {cache_stats[key]}']
+        if pool_stats:
+            for key in ('checked_out', 'overflow', 'size'):
+                if pool_stats[key] is not None:
+                    lines += [f'# TYPE db_pool_{key} gauge', f'db_pool_{key} {pool_stats[key]}']
+            for key in ('checkouts', 'timeouts', 'slow_checkouts'):
+                lines += [f'# TYPE db_pool_{key}_total counter', f'db_pool_{key}_total {pool_stats[key]}']
+        if admission_stats:
+            lines.append('# TYPE admission_requests_total counter')
+            for key in ('admitted', 'rate_limited', 'queue_full', 'queue_timeouts'):
+                lines.append(f'admission_requests_total{{outcome="{key}"}} {admission_stats[key]}')
+            lines += ['# TYPE admission_queued_total counter', f'admission_queued_total {admission_stats["queued"]}']
+            for key in ('in_flight', 'queue_depth'):
+                if admission_stats[key] is not None:
+                    lines += [f'# TYPE admission_{key} gauge', f'admission_{key} {admission_stats[key]}']
+        if group_commit is not None:
+            lines += group_commit.render_prometheus()
+        return '\n'.join(lines) + '\n'
+
+
+def init_instrumentation(app, db):
+    """
+    Registra os ganchos de instrumentação e a rota GET /metrics.
+    """
+    instrumentation = Instrumentation(app.config['SLOW_QUERY_MS'])
+    app.before_request(instrumentation.before_request)
+    app.after_request(instrumentation.after_request)
+    with app.app_context():
+        for engine in db.engines.values():
+            instrumentation.attach(engine)
+    app.extensions['instrumentation'] = instrumentation
+
+    if app.config['METRICS_ENDPOINT_ENABLED']:
+        def metrics():
+            """
+            Métricas no formato texto do Prometheus.
+            """
+            from app import cache
+            body = instrumentation.render_prometheus(
+                cache_stats=cache.stats(),
+                pool_stats=app.extensions['pool_monitor'].stats(),
+                admission_stats=app.extensions['admission'].stats(),
+                group_commit=app.extensions.get('group_commit')
+            )
+            return current_app.response_class(body, mimetype='text/plain; version=0.0.4')
+
+        app.add_url_rule('/metrics', 'metrics', metrics)
+    return instrumentation
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
@@ -0,0 +1,86 @@
+# app/json_provider.py
+import re
+
+from flask.json.provider import DefaultJSONProvider
+
+# Prática Sênior: O orjson é uma dependência OPCIONAL. Se não estiver
+# instalado, o provider usa o módulo json da biblioteca padrão.
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+# Caracteres que o json da biblioteca padrão escapa com ensure_ascii=True
+# e o orjson não: tudo a partir do DEL (0x7f).
+_NON_ASCII = re.compile('[\x7f-\U0010ffff]')
+
+
+def _escape_non_ascii(match):
+    code = ord(match.group())
+    if code < 0x10000:
+        return '\\u%04x' % code
+    # Fora do plano básico: par de surrogates, como o json.dumps faz.
+    code -= 0x10000
+    return '\\u%04x\\u%04x' % (0xd800 | (code >> 10), 0xdc00 | (code & 0x3ff))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider com codificação rápida opcional via orjson.
+
+    Gera exatamente os mesmos bytes do DefaultJSONProvider do Flask no
+    modo compacto (chaves ordenadas, separadores sem espaço e, com
+    ensure_ascii, os mesmos escapes \\uXXXX). Datetimes, dataclasses e
+    outros tipos especiais continuam passando pelo 'default' do Flask.
+    No modo de depuração (JSON indentado), ou se o orjson recusar o
+    objeto (ex: inteiros maiores que 64 bits), cai para a biblioteca
+    padrão. Números float não são usados pela API; o orjson pode
+    formatá-los de modo diferente (ex: 1e16 em vez de 1e+16).
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        mode = app.config['JSON_FAST_ENCODER']
+        if mode not in ('auto', 'orjson', 'stdlib'):
+            raise RuntimeError(f'JSON_FAST_ENCODER desconhecido: {mode!r}')
+        if mode == 'orjson' and orjson is None:
+            raise RuntimeError("JSON_FAST_ENCODER='orjson' exige o pacote 'orjson' (pip install orjson).")
+        self.use_orjson = orjson is not None and mode in ('auto', 'orjson')
+
+    def is_compact(self):
+        """
+        Mesma regra do Flask: compacto, a menos que esteja em modo debug
+        (ou que 'compact' tenha sido definido explicitamente).
+        """
+        return self.compact or (self.compact is None and not self._app.debug)
+
+    def dumps_compact(self, obj):
+        """
+        Serializa no formato compacto das respostas (sem o '\\n' final).
+        """
+        if self.use_orjson:
+            try:
+                raw = orjson.dumps(
+                    obj,
+                    default=self.default,
+                    option=orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                ).decode('utf-8')
+            except TypeError:
+                # orjson.JSONEncodeError é subclasse de TypeError.
+                pass
+            else:
+                return _NON_ASCII.sub(_escape_non_ascii, raw) if self.ensure_ascii else raw
+        return self.dumps(obj, separators=(',', ':'))
+
+    def dumps_body(self, obj):
+        """
+        Serializa o objeto exatamente como o corpo gerado por response()
+        (compacto ou indentado, com o '\\n' final).
+        """
+        if self.is_compact():
+            return f'{self.dumps_compact(obj)}\n'
+        return f'{self.dumps(obj, indent=2)}\n'
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_body(obj), mimetype=self.mimetype)
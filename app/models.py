@@ -2,6 +2,36 @@
 from app import db
 from datetime import datetime
 
+# Campos expostos pela API, na ordem em que aparecem na serialização.
+# Usado para validar o parâmetro 'fields=' (projeção) do GET /meals.
+MEAL_FIELDS = (
+    'id', 'name', 'description', 'meal_datetime',
+    'is_on_diet', 'created_at', 'updated_at'
+)
+
+# Campos do tipo datetime, que precisam de .isoformat() no JSON.
+MEAL_DATETIME_FIELDS = frozenset({'meal_datetime', 'created_at', 'updated_at'})
+
+
+class User(db.Model):
+    """
+    Um usuário da API. Cada refeição pertence a um usuário, e todas as
+    rotas enxergam apenas as refeições do usuário autenticado.
+
+    O token de acesso nunca é guardado: só o seu SHA-256 (ver
+    app/auth.py), que é o que a autenticação procura no índice único.
+    """
+    __tablename__ = 'users'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    api_token_hash = db.Column(db.String(64), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<User {self.id}: {self.name}>'
+
+
 class Meal(db.Model):
     """
     Representa uma refeição registrada no banco de dados.
@@ -11,12 +41,36 @@ class Meal(db.Model):
     # Define o nome da tabela no banco (boa prática, embora opcional)
     __tablename__ = 'meal'
 
+    # Prática Sênior: Índice composto para a paginação por cursor (keyset).
+    # A listagem ordena por (meal_datetime DESC, id DESC) e o cursor
+    # filtra por "(meal_datetime, id) < (valor, valor)". Com este índice,
+    # cada página é uma varredura de intervalo no índice, com custo
+    # proporcional ao tamanho da página, e não ao total de linhas.
+    # O segundo índice atende às consultas de vizinhança das métricas de
+    # sequência (ver app/diet_metrics.py): "última refeição fora da dieta antes
+    # de X" e "quantas refeições na dieta entre X e Y".
+    # Toda consulta filtra por 'user_id', então ele é a PRIMEIRA coluna
+    # dos dois índices: cada usuário lê só o seu trecho do índice, e o
+    # custo não cresce com o número de usuários. O primeiro índice
+    # também atende à chave estrangeira.
+    # O terceiro índice atende à sincronização incremental
+    # (GET /meals/changes, ver app/sync.py): "o que mudou depois de X".
+    __table_args__ = (
+        db.Index('ix_meal_user_id_meal_datetime_id', 'user_id', 'meal_datetime', 'id'),
+        db.Index('ix_meal_user_id_is_on_diet_meal_datetime_id', 'user_id', 'is_on_diet', 'meal_datetime', 'id'),
+        db.Index('ix_meal_user_id_updated_at_id', 'user_id', 'updated_at', 'id'),
+    )
+
     # -----------------------------------------------------------------
     # Colunas da Tabela
     # -----------------------------------------------------------------
     
     # Chave primária: Identificador único para cada refeição.
     id = db.Column(db.Integer, primary_key=True)
+
+    # Dono da refeição. Não faz parte de MEAL_FIELDS: o cliente só
+    # enxerga as próprias refeições, então o campo nunca é serializado.
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     # Nome da refeição (ex: "Almoço", "Lanche da Tarde")
     # nullable=False: Este campo não pode ser nulo (obrigatório).
@@ -50,6 +104,19 @@ class Meal(db.Model):
     #                           registro for modificado.
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # -----------------------------------------------------------------
+    # Prática Sênior: Controle de Concorrência Otimista
+    # -----------------------------------------------------------------
+    # Contador incrementado a cada edição e exposto como ETag. PUT,
+    # PATCH e DELETE exigem 'If-Match' com a versão lida pelo cliente
+    # e a gravam no WHERE ("... AND version = ?"): se outra requisição
+    # editou a refeição no meio do caminho, nenhuma linha é afetada e
+    # a escrita responde 412, sem travar a linha. O 'version_id_col'
+    # faz o ORM aplicar a mesma regra a qualquer flush da entidade.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+
 
     # -----------------------------------------------------------------
     # Prática Sênior: Método de Representação (Debuggabilidade)
@@ -65,19 +132,198 @@ class Meal(db.Model):
     # -----------------------------------------------------------------
     # Prática Sênior: Método de Serialização (Princípio DRY)
     # -----------------------------------------------------------------
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """
         Converte o objeto Meal em um dicionário serializável para
         respostas de API (JSON).
+
+        Argumentos:
+            fields (iterable, opcional): Subconjunto de MEAL_FIELDS a
+                                         incluir. Se None, inclui todos.
         """
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
+        return Meal.serialize(self, fields)
+
+    @staticmethod
+    def serialize(source, fields=None):
+        """
+        Serializa qualquer objeto que exponha os campos como atributos:
+        tanto uma instância de Meal quanto uma linha (Row) de um
+        'select(Meal.id, Meal.name, ...)'. Isso permite que caminhos de
+        leitura em massa (ex: exportação) evitem o custo do ORM.
+        """
+        rv = {}
+        for field in fields or MEAL_FIELDS:
+            value = getattr(source, field)
             # .isoformat(): Converte o objeto datetime em uma string
             #                no padrão ISO 8601, que é o padrão para JSON.
-            'meal_datetime': self.meal_datetime.isoformat(),
-            'is_on_diet': self.is_on_diet,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
\ No newline at end of file
+            if field in MEAL_DATETIME_FIELDS:
+                value = value.isoformat()
+            rv[field] = value
+        return rv
+
+
+class MealTombstone(db.Model):
+    """
+    Registro de uma refeição removida (uma "lápide"). A remoção continua
+    apagando a linha da 'meal'; a lápide existe só para que a
+    sincronização incremental (GET /meals/changes) avise os clientes.
+    Lápides mais antigas que MEALS_TOMBSTONE_RETENTION_DAYS são apagadas
+    pelo comando 'flask meals compact-tombstones'.
+    """
+    __tablename__ = 'meal_tombstone'
+
+    # Prática Sênior: O primeiro índice é o da sincronização (mesmo
+    # formato do índice de 'updated_at' da 'meal'); o segundo atende à
+    # compactação, que apaga por data sem olhar o usuário.
+    __table_args__ = (
+        db.Index('ix_meal_tombstone_user_id_deleted_at_id', 'user_id', 'deleted_at', 'id'),
+        db.Index('ix_meal_tombstone_deleted_at', 'deleted_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Sem chave estrangeira: a refeição não existe mais.
+    meal_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MealTombstone meal={self.meal_id} at={self.deleted_at}>'
+
+
+class SyncBarrier(db.Model):
+    """
+    Uma escrita em massa em andamento (importação ou arquivamento; ver
+    sync.sync_barrier). Enquanto a linha existe, a sincronização não
+    entrega nada a partir de 'started_at': nem para o usuário dela, nem
+    para ninguém quando 'user_id' é nulo. Uma barreira abandonada (o
+    processo morreu) deixa de valer em 'expires_at'.
+    """
+    __tablename__ = 'sync_barrier'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<SyncBarrier user={self.user_id} since={self.started_at}>'
+
+
+class MealArchive(db.Model):
+    """
+    Uma parte de um mês de refeições arquivado (ver app/partitioning.py):
+    até MEAL_ARCHIVE_PART_ROWS linhas da partição mensal, de todos os
+    usuários, em NDJSON comprimido com gzip. Refeições arquivadas saem
+    da API (e das métricas).
+
+    Cada parte é um membro gzip completo: o 'data' das partes de um
+    mês, concatenado na ordem de 'part', é um único .ndjson.gz válido.
+    """
+    __tablename__ = 'meal_archive'
+
+    __table_args__ = (
+        db.UniqueConstraint('partition_name', 'part', name='uq_meal_archive_partition_name_part'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Nome da partição de origem (ex: meal_y2020m01).
+    partition_name = db.Column(db.String(63), nullable=False)
+    # Ordem da parte dentro do mês (0, 1, ...).
+    part = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Intervalo [range_start, range_end) de 'meal_datetime' do mês.
+    range_start = db.Column(db.DateTime, nullable=False)
+    range_end = db.Column(db.DateTime, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MealArchive {self.partition_name} rows={self.row_count}>'
+
+
+class IdempotencyKey(db.Model):
+    """
+    Uma chave 'Idempotency-Key' já usada em uma criação de refeições,
+    com a resposta que foi enviada (ver app/idempotency.py). Um retry
+    com a mesma chave recebe essa resposta de novo, sem tocar na 'meal'.
+
+    A linha é gravada na MESMA transação da criação: ou existem as duas,
+    ou nenhuma. Chaves vencidas (expires_at) são ignoradas e apagadas
+    pelo expurgo periódico ou por 'flask meals purge-idempotency-keys'.
+    """
+    __tablename__ = 'idempotency_key'
+
+    # Prática Sênior: A restrição única em (user_id, key) é a busca do
+    # retry (uma igualdade no índice) E a serialização de duplicatas
+    # concorrentes: o segundo INSERT da mesma chave espera o primeiro
+    # terminar e falha, sem nenhum lock explícito. O índice em
+    # 'expires_at' atende ao expurgo.
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_key_user_id_key'),
+        db.Index('ix_idempotency_key_expires_at', 'expires_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    # SHA-256 do método, da rota e do corpo: a mesma chave com outra
+    # requisição é um erro do cliente (422), e não um retry.
+    fingerprint = db.Column(db.String(64), nullable=False)
+    # A resposta original. Ficam nulas só dentro da transação que
+    # reservou a chave, antes da criação terminar.
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    # Cabeçalhos da resposta que precisam voltar no retry (ETag,
+    # Last-Modified), em JSON.
+    response_headers = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key!r} user={self.user_id} status={self.status_code}>'
+
+
+class DietMetrics(db.Model):
+    """
+    Contadores agregados da dieta, mantidos de forma incremental pelas
+    rotas de escrita (ver app/diet_metrics.py). Uma linha por usuário, o que
+    permite responder o GET /metrics sem varrer a tabela 'meal'.
+    """
+    __tablename__ = 'diet_metrics'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
+    total_meals = db.Column(db.Integer, nullable=False, default=0)
+    on_diet_meals = db.Column(db.Integer, nullable=False, default=0)
+    off_diet_meals = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DietMetrics total={self.total_meals} on_diet={self.on_diet_meals}>'
+
+
+class DietStreak(db.Model):
+    """
+    Uma sequência máxima de refeições dentro da dieta de um usuário, na
+    ordem de (meal_datetime, id).
+
+    Cada sequência é identificada pela refeição FORA da dieta que vem
+    imediatamente antes dela (a "fronteira esquerda"). Sequências no
+    início do histórico têm a fronteira nula.
+    """
+    __tablename__ = 'diet_streak'
+
+    # Prática Sênior: Índice em (user_id, length) para que a melhor
+    # sequência de um usuário seja um MAX() resolvido direto no índice.
+    __table_args__ = (
+        db.Index('ix_diet_streak_user_id_left_datetime_left_meal_id', 'user_id', 'left_datetime', 'left_meal_id'),
+        db.Index('ix_diet_streak_user_id_length', 'user_id', 'length'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    left_datetime = db.Column(db.DateTime, nullable=True)
+    left_meal_id = db.Column(db.Integer, nullable=True)
+    length = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<DietStreak after={self.left_meal_id} length={self.length}>'
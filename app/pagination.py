@@ -0,0 +1,137 @@
+# app/pagination.py
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from app.errors import InvalidAPIUsage
+from app.models import MEAL_FIELDS
+
+
+# -----------------------------------------------------------------
+# Paginação por Cursor (Keyset Pagination)
+# -----------------------------------------------------------------
+# Em vez de OFFSET (que obriga o banco a ler e descartar todas as
+# linhas anteriores), o cliente recebe um "cursor" opaco que aponta
+# para a última linha da página. A próxima página começa logo depois
+# dela, usando o índice (meal_datetime, id).
+# -----------------------------------------------------------------
+
+def encode_cursor(meal_datetime, meal_id):
+    """
+    Gera o token opaco que representa a posição (meal_datetime, id).
+    """
+    return _encode_token([meal_datetime.isoformat(), meal_id])
+
+
+def decode_cursor(token):
+    """
+    Decodifica o token gerado por encode_cursor().
+
+    Retorna a tupla (meal_datetime, id), ou None se o token for vazio.
+    Levanta InvalidAPIUsage (400) se o token estiver corrompido.
+    """
+    if not token:
+        return None
+    try:
+        raw_datetime, meal_id = _decode_token(token)
+        if not isinstance(meal_id, int):
+            raise ValueError('id inválido')
+        return datetime.fromisoformat(raw_datetime), meal_id
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidAPIUsage('Cursor de paginação inválido.', status_code=400)
+
+
+def encode_search_cursor(score, meal_id):
+    """
+    Gera o token que representa a posição (relevância, id) na busca.
+    """
+    return _encode_token([score, meal_id])
+
+
+def decode_search_cursor(token):
+    """
+    Decodifica o token gerado por encode_search_cursor().
+
+    Retorna a tupla (score, id), ou None se o token for vazio.
+    Levanta InvalidAPIUsage (400) se o token estiver corrompido.
+    """
+    if not token:
+        return None
+    try:
+        score, meal_id = _decode_token(token)
+        if not isinstance(meal_id, int) or isinstance(score, bool) or not isinstance(score, (int, float)):
+            raise ValueError('cursor inválido')
+        return float(score), meal_id
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidAPIUsage('Cursor de paginação inválido.', status_code=400)
+
+
+def encode_sync_token(timestamp, kind, key):
+    """
+    Gera o token da sincronização incremental: a posição (instante,
+    tipo, id) da última alteração entregue (ver app/sync.py).
+    """
+    return _encode_token([timestamp.isoformat(), kind, key])
+
+
+def decode_sync_token(token):
+    """
+    Decodifica o token gerado por encode_sync_token().
+
+    Retorna a tupla (instante, tipo, id), ou None se o token for vazio.
+    Levanta InvalidAPIUsage (400) se o token estiver corrompido.
+    """
+    if not token:
+        return None
+    try:
+        raw_timestamp, kind, key = _decode_token(token)
+        if isinstance(kind, bool) or kind not in (0, 1) or not isinstance(key, int):
+            raise ValueError('token inválido')
+        return datetime.fromisoformat(raw_timestamp), kind, key
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidAPIUsage('Token de sincronização inválido.', status_code=400)
+
+
+def _encode_token(values):
+    raw = json.dumps(values, separators=(',', ':'))
+    # Base64 "urlsafe" e sem o padding '=', para trafegar bem em query strings.
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_token(token):
+    padded = token + '=' * (-len(token) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded))
+
+
+def parse_limit(value, default, maximum):
+    """
+    Valida o parâmetro 'limit' (tamanho da página).
+    """
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise InvalidAPIUsage('O parâmetro "limit" deve ser um número inteiro.', status_code=400)
+    if limit < 1 or limit > maximum:
+        raise InvalidAPIUsage(f'O parâmetro "limit" deve estar entre 1 e {maximum}.', status_code=400)
+    return limit
+
+
+def parse_fields(value):
+    """
+    Valida o parâmetro 'fields' (projeção), ex: "fields=id,name".
+
+    Retorna uma tupla com os campos pedidos (na ordem de MEAL_FIELDS),
+    ou None quando o cliente quer todos os campos.
+    """
+    if not value:
+        return None
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested.difference(MEAL_FIELDS)
+    if unknown:
+        raise InvalidAPIUsage(f'Campos desconhecidos em "fields": {", ".join(sorted(unknown))}', status_code=400)
+    if not requested:
+        return None
+    return tuple(field for field in MEAL_FIELDS if field in requested)
@@ -0,0 +1,468 @@
+# app/partitioning.py
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import re
+from datetime import date, datetime
+
+from sqlalchemy import text, delete
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from app.models import Meal, MealArchive
+from app import search, filters, sync
+
+logger = logging.getLogger(__name__)
+
+# Estratégias aceitas pelo comando 'flask meals partition-by-user'.
+PARTITION_STRATEGIES = ('hash', 'range')
+
+
+# -----------------------------------------------------------------
+# Particionamento da Tabela 'meal' por Usuário (só PostgreSQL)
+# -----------------------------------------------------------------
+# Opcional: com muitos usuários, dividir a 'meal' em partições por
+# 'user_id' mantém cada índice pequeno (cabe em memória) e permite
+# manutenção (VACUUM, REINDEX) por partição. Como toda consulta
+# filtra por 'user_id', o planner lê só UMA partição ("partition
+# pruning").
+#   - hash:  N partições de tamanho parecido (MODULUS/REMAINDER);
+#            bom quando os ids de usuário são densos e sem ordem útil.
+#   - range: partições de 'width' usuários consecutivos, mais uma
+#            partição DEFAULT para os usuários criados depois.
+#
+# A conversão recria a tabela: cria a tabela particionada, copia as
+# linhas, troca os nomes e recria os índices (os mesmos do modelo e
+# dos eventos DDL de app/search.py e app/filters.py). Tudo roda em
+# uma transação, com a 'meal' travada durante a cópia.
+#
+# Restrição do PostgreSQL: a chave primária de uma tabela
+# particionada precisa conter a chave de partição, então ela passa a
+# ser (user_id, id). O 'id' continua vindo da mesma sequência e,
+# portanto, continua único; o ORM segue usando só o 'id'.
+# -----------------------------------------------------------------
+
+def partition_statements(strategy, partitions=None, width=None, max_user_id=0):
+    """
+    Lista dos comandos SQL que convertem a 'meal' em uma tabela
+    particionada por 'user_id'.
+
+    Argumentos:
+        strategy (str): 'hash' ou 'range'.
+        partitions (int): Número de partições (estratégia 'hash').
+        width (int): Usuários por partição (estratégia 'range').
+        max_user_id (int): Maior id de usuário atual (estratégia 'range').
+    """
+    if strategy == 'hash':
+        method = 'HASH'
+        bounds = [
+            (f'meal_p{remainder}', f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})')
+            for remainder in range(partitions)
+        ]
+    elif strategy == 'range':
+        method = 'RANGE'
+        bounds = [
+            (f'meal_p{start // width}', f'FOR VALUES FROM ({start}) TO ({start + width})')
+            for start in range(0, max_user_id + 1, width)
+        ]
+        bounds.append(('meal_pdefault', 'DEFAULT'))
+    else:
+        raise ValueError(f'Estratégia de particionamento desconhecida: {strategy!r}')
+
+    # A chave primária de uma tabela particionada precisa conter a
+    # chave de partição.
+    return _conversion_statements(f'{method} (user_id)', '(user_id, id)', bounds)
+
+
+def _conversion_statements(partition_by, primary_key, bounds):
+    """
+    Comandos comuns às estratégias: cria a tabela particionada com as
+    partições 'bounds' [(nome, limites)], copia as linhas, troca os
+    nomes e recria a chave estrangeira e os índices.
+    """
+    dialect = postgresql.dialect()
+    return [
+        'LOCK TABLE meal IN ACCESS EXCLUSIVE MODE',
+        f'CREATE TABLE meal_partitioned (LIKE meal INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY {partition_by}',
+        f'ALTER TABLE meal_partitioned ADD PRIMARY KEY {primary_key}',
+        *(f'CREATE TABLE {name} PARTITION OF meal_partitioned {bound}' for name, bound in bounds),
+        'INSERT INTO meal_partitioned SELECT * FROM meal',
+        # A sequência do 'id' passa a pertencer à nova tabela (senão o
+        # DROP da antiga a levaria junto).
+        "ALTER SEQUENCE meal_id_seq OWNED BY meal_partitioned.id",
+        'DROP TABLE meal',
+        'ALTER TABLE meal_partitioned RENAME TO meal',
+        'ALTER TABLE meal ADD CONSTRAINT meal_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)',
+        *(str(CreateIndex(index).compile(dialect=dialect)) for index in sorted(Meal.__table__.indexes, key=lambda index: index.name)),
+        search.PG_CREATE_INDEX,
+        filters.PG_CREATE_NAME_INDEX,
+    ]
+
+
+def is_partitioned(connection):
+    """
+    Indica se a tabela 'meal' já é particionada.
+    """
+    return connection.execute(text(
+        "SELECT c.relkind = 'p' FROM pg_class c "
+        "WHERE c.oid = to_regclass('meal')"
+    )).scalar() is True
+
+
+def partition_meal_by_user(connection, strategy, partitions=None, width=None):
+    """
+    Converte a 'meal' em uma tabela particionada por 'user_id', na
+    transação da conexão recebida. Retorna os comandos executados.
+    """
+    if connection.dialect.name != 'postgresql':
+        raise RuntimeError('O particionamento por usuário só está disponível no PostgreSQL.')
+    if is_partitioned(connection):
+        raise RuntimeError('A tabela "meal" já é particionada.')
+
+    max_user_id = connection.execute(text('SELECT coalesce(max(id), 0) FROM users')).scalar()
+    statements = partition_statements(strategy, partitions, width, max_user_id)
+    for statement in statements:
+        connection.execute(text(statement))
+    return statements
+
+
+# -----------------------------------------------------------------
+# Particionamento Mensal por 'meal_datetime' e Arquivamento (só PostgreSQL)
+# -----------------------------------------------------------------
+# Alternativa ao particionamento por usuário (só um dos dois pode ser
+# aplicado): uma partição por mês de 'meal_datetime' (meal_y2025m10),
+# mais a partição DEFAULT (meal_pdefault) para datas fora dos meses
+# criados, de modo que nenhuma inserção falhe.
+#
+# Quase toda leitura toca os meses recentes: cada partição tem os seus
+# próprios índices (pequenos) e o VACUUM de um mês antigo, que não
+# muda mais, não custa nada. Consultas com intervalo de datas (e as
+# páginas do GET /meals, cujo cursor limita 'meal_datetime'; ver
+# queries.meals_page_statement) leem só as partições do intervalo
+# ("partition pruning").
+#
+# A conversão é feita pela migração 'e8a1c4f07b92' (ou pelo comando
+# 'flask meals partition-by-month'), no mesmo molde do particionamento
+# por usuário; a chave primária passa a ser (id, meal_datetime).
+#
+# Manutenção (comandos 'flask meals create-partitions' e
+# 'flask meals archive-partitions', para rodar no cron):
+#   - create: cria as partições dos próximos MEAL_PARTITION_MONTHS_AHEAD
+#     meses. Linhas desses meses que já caíram na DEFAULT são movidas
+#     para a partição nova antes do ATTACH.
+#   - archive: arquiva as partições com mais de MEAL_ARCHIVE_AFTER_MONTHS
+#     meses em NDJSON comprimido com gzip (na tabela 'meal_archive', em
+#     partes de MEAL_ARCHIVE_PART_ROWS linhas, ou em um arquivo
+#     .ndjson.gz por mês, sempre em streaming), deixa uma lápide por
+#     refeição para a sincronização incremental (ver app/sync.py) e
+#     apaga a partição.
+#
+# Prática Sênior: Travar a 'meal' o mínimo possível. O DETACH pega um
+# ACCESS EXCLUSIVE na tabela-mãe, que bloqueia TODAS as leituras e
+# escritas da API até o fim da transação. (O DETACH ... CONCURRENTLY
+# não serve: o PostgreSQL o recusa em tabelas com partição DEFAULT.)
+# Por isso cada mês é arquivado em duas transações:
+#   1. Cópia: lê a partição ainda anexada (sem travar a mãe), grava o
+#      arquivo e confirma. Durante a leitura, calcula uma impressão
+#      digital das linhas (ids e versões).
+#   2. Troca, curta: DETACH (com lock_timeout, para não enfileirar a
+#      API atrás dele), confere a impressão digital, grava as lápides,
+#      DROP e commit. Se o mês mudou durante a cópia (uma edição ou
+#      remoção tardia) ou o lock não veio a tempo, a transação é
+#      desfeita, a cópia é apagada e o mês fica para a próxima rodada.
+# -----------------------------------------------------------------
+
+# Nome das partições mensais: meal_y2025m10.
+MONTHLY_PARTITION_NAME = re.compile(r'^meal_y(\d{4})m(\d{2})$')
+
+DEFAULT_PARTITION = 'meal_pdefault'
+
+
+def month_start(value):
+    """
+    Primeiro dia do mês de uma data (ou datetime).
+    """
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    """
+    Soma (ou subtrai) meses ao primeiro dia de um mês.
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def monthly_partition_name(month):
+    return f'meal_y{month.year:04d}m{month.month:02d}'
+
+
+def _monthly_bound(month):
+    return f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+
+
+def monthly_partition_statements(first_month, last_month):
+    """
+    Lista dos comandos SQL que convertem a 'meal' em uma tabela
+    particionada por mês, com partições de 'first_month' a 'last_month'
+    (inclusive) e a partição DEFAULT.
+    """
+    bounds = []
+    month = first_month
+    while month <= last_month:
+        bounds.append((monthly_partition_name(month), _monthly_bound(month)))
+        month = add_months(month, 1)
+    bounds.append((DEFAULT_PARTITION, 'DEFAULT'))
+    return _conversion_statements('RANGE (meal_datetime)', '(id, meal_datetime)', bounds)
+
+
+def partition_key(connection):
+    """
+    Coluna da chave de partição da 'meal' (None se ela não for particionada).
+    """
+    return connection.execute(text(
+        "SELECT a.attname FROM pg_partitioned_table p "
+        "JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0] "
+        "WHERE p.partrelid = to_regclass('meal')"
+    )).scalar()
+
+
+def monthly_partitions(connection):
+    """
+    Meses que já têm partição, em ordem: lista de (mês, nome).
+    """
+    names = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('meal')"
+    )).scalars()
+    months = []
+    for name in names:
+        match = MONTHLY_PARTITION_NAME.match(name)
+        if match:
+            months.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(months)
+
+
+def _require_monthly(connection):
+    if connection.dialect.name != 'postgresql':
+        raise RuntimeError('O particionamento mensal só está disponível no PostgreSQL.')
+    if partition_key(connection) != 'meal_datetime':
+        raise RuntimeError(
+            'A tabela "meal" não é particionada por mês. Rode antes "flask meals partition-by-month".'
+        )
+
+
+def partition_meal_by_month(connection, months_ahead, today=None):
+    """
+    Converte a 'meal' em uma tabela particionada por mês, com partições
+    do mês da refeição mais antiga até 'months_ahead' meses à frente.
+    Retorna os comandos executados.
+    """
+    if connection.dialect.name != 'postgresql':
+        raise RuntimeError('O particionamento mensal só está disponível no PostgreSQL.')
+    if is_partitioned(connection):
+        raise RuntimeError('A tabela "meal" já é particionada.')
+
+    current = month_start(today or date.today())
+    oldest = connection.execute(text('SELECT min(meal_datetime) FROM meal')).scalar()
+    first_month = min(month_start(oldest), current) if oldest else current
+    statements = monthly_partition_statements(first_month, add_months(current, months_ahead))
+    for statement in statements:
+        connection.execute(text(statement))
+    return statements
+
+
+def create_future_partitions(connection, months_ahead, today=None):
+    """
+    Cria as partições que faltam do mês atual até 'months_ahead' meses
+    à frente. Retorna os nomes das partições criadas.
+
+    Uma partição não pode ser criada enquanto a DEFAULT tiver linhas do
+    seu intervalo: elas são movidas para a tabela nova, que só então é
+    anexada (o ATTACH confere que a DEFAULT não tem mais nenhuma).
+    """
+    _require_monthly(connection)
+    existing = {month for month, _ in monthly_partitions(connection)}
+    current = month_start(today or date.today())
+
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month in existing:
+            continue
+        name = monthly_partition_name(month)
+        start, end = month.isoformat(), add_months(month, 1).isoformat()
+        connection.execute(text(f'CREATE TABLE {name} (LIKE meal INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+        connection.execute(text(
+            f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+            f"WHERE meal_datetime >= '{start}' AND meal_datetime < '{end}' RETURNING *) "
+            f'INSERT INTO {name} SELECT * FROM moved'
+        ))
+        connection.execute(text(f'ALTER TABLE meal ATTACH PARTITION {name} {_monthly_bound(month)}'))
+        created.append(name)
+    return created
+
+
+def archive_partitions(engine, older_than_months, directory=None, part_rows=50000,
+                       lock_timeout_ms=5000, barrier_seconds=3600, today=None):
+    """
+    Arquiva as partições mensais anteriores a 'older_than_months' meses
+    atrás (cópia em NDJSON com gzip na tabela 'meal_archive', em partes
+    de até 'part_rows' linhas, ou, com 'directory', em
+    <directory>/<partição>.ndjson.gz; lápides; DROP), em transações
+    próprias no 'engine' (ver o comentário acima).
+
+    Retorna (arquivadas, puladas, user_ids): a lista de (nome, linhas),
+    a lista de (nome, motivo) dos meses deixados para a próxima rodada e
+    os usuários que tinham refeições nos meses arquivados (cujas
+    métricas precisam ser recalculadas).
+    """
+    with engine.connect() as connection:
+        _require_monthly(connection)
+        partitions = monthly_partitions(connection)
+    cutoff = add_months(month_start(today or date.today()), -older_than_months)
+
+    archived, skipped = [], []
+    user_ids = set()
+    for month, name in partitions:
+        if month >= cutoff:
+            break
+        path = os.path.join(directory, f'{name}.ndjson.gz') if directory else None
+
+        # 1. Cópia, com a partição ainda anexada.
+        month_users = set()
+        with engine.begin() as connection:
+            fingerprint = _copy_partition(connection, name, month, path, month_users, part_rows)
+
+        # 2. Troca, curta. A barreira impede que a sincronização passe do
+        # instante das lápides antes do commit (ver sync.sync_barrier).
+        try:
+            with sync.sync_barrier(engine, barrier_seconds) as deleted_at, engine.begin() as connection:
+                _detach(connection, name, lock_timeout_ms)
+                if _fingerprint(connection.execute(text(f'SELECT id, version FROM {name}'))) != fingerprint:
+                    raise PartitionChanged()
+                sync.record_archived_tombstones(connection, name, deleted_at)
+                connection.execute(text(f'DROP TABLE {name}'))
+        except (PartitionChanged, SQLAlchemyError) as e:
+            reason = 'alterada durante a cópia' if isinstance(e, PartitionChanged) else f'erro no DETACH: {e}'
+            logger.warning(f'Arquivamento de {name} adiado ({reason}).')
+            _discard_copy(engine, name, path)
+            skipped.append((name, reason))
+            continue
+        archived.append((name, fingerprint[0]))
+        user_ids |= month_users
+    return archived, skipped, user_ids
+
+
+class PartitionChanged(Exception):
+    """
+    A partição mudou entre a cópia e o DETACH.
+    """
+
+
+def _copy_partition(connection, name, month, path, user_ids, part_rows):
+    # Uma rodada anterior interrompida pode ter deixado uma cópia.
+    connection.execute(delete(MealArchive).where(MealArchive.partition_name == name))
+    rows = connection.execute(
+        text(f'SELECT * FROM {name} ORDER BY user_id, meal_datetime, id').execution_options(yield_per=5000)
+    ).mappings()
+    fingerprint = _Fingerprint(rows)
+    if path:
+        with gzip.open(path, 'wt', encoding='utf-8') as archive:
+            _write_archive(archive, fingerprint, user_ids)
+    else:
+        _archive_to_table(connection, name, month, fingerprint, user_ids, part_rows)
+    return fingerprint.value
+
+
+def _detach(connection, name, lock_timeout_ms):
+    # Sem o lock em 'lock_timeout_ms', o DETACH falha em vez de deixar
+    # as consultas da API enfileiradas atrás dele.
+    connection.execute(text(f"SET LOCAL lock_timeout = '{int(lock_timeout_ms)}ms'"))
+    connection.execute(text(f'ALTER TABLE meal DETACH PARTITION {name}'))
+
+
+def _discard_copy(engine, name, path):
+    with engine.begin() as connection:
+        connection.execute(delete(MealArchive).where(MealArchive.partition_name == name))
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+class _Fingerprint:
+    """
+    Impressão digital de um conjunto de (id, version), independente da
+    ordem (soma de hashes): confere a partição desanexada contra a cópia.
+    Como iterador, repassa as linhas de 'rows' e as acumula.
+    """
+
+    def __init__(self, rows=()):
+        self._rows = iter(rows)
+        self.count = 0
+        self.total = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self._rows)
+        self.add(row['id'], row['version'])
+        return row
+
+    def add(self, meal_id, version):
+        self.count += 1
+        digest = hashlib.blake2b(f'{meal_id}:{version}'.encode(), digest_size=8).digest()
+        self.total = (self.total + int.from_bytes(digest, 'big')) % 2 ** 64
+
+    @property
+    def value(self):
+        return self.count, self.total
+
+
+def _fingerprint(rows):
+    fingerprint = _Fingerprint()
+    for meal_id, version in rows:
+        fingerprint.add(meal_id, version)
+    return fingerprint.value
+
+
+def _archive_to_table(connection, name, month, rows, user_ids, part_rows):
+    # Prática Sênior: Memória limitada. Em vez de comprimir o mês inteiro
+    # em um só buffer, cada bloco de 'part_rows' linhas vira um membro
+    # gzip e uma linha da 'meal_archive'; só um bloco fica em memória.
+    range_start = datetime(month.year, month.month, 1)
+    range_end = datetime.combine(add_months(month, 1), datetime.min.time())
+    total = part = 0
+    while True:
+        buffer = io.BytesIO()
+        with gzip.open(buffer, 'wt', encoding='utf-8') as archive:
+            count = _write_archive(archive, itertools.islice(rows, part_rows), user_ids)
+        # Um mês vazio ainda ganha a parte 0, que registra o arquivamento.
+        if count or not part:
+            connection.execute(MealArchive.__table__.insert().values(
+                partition_name=name, part=part, range_start=range_start, range_end=range_end,
+                row_count=count, data=buffer.getvalue(), archived_at=datetime.utcnow()
+            ))
+        total += count
+        part += 1
+        if count < part_rows:
+            return total
+
+
+def _write_archive(archive, rows, user_ids):
+    # Uma refeição por linha, com todas as colunas (inclusive user_id
+    # e version), para que o mês possa ser restaurado.
+    count = 0
+    for row in rows:
+        archive.write(json.dumps(
+            {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()},
+            ensure_ascii=False
+        ) + '\n')
+        user_ids.add(row['user_id'])
+        count += 1
+    return count
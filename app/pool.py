@@ -0,0 +1,168 @@
+# app/pool.py
+import logging
+import threading
+import time
+
+from flask import g, has_request_context
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------------------------------------------
+# Configuração do Pool de Conexões
+# -----------------------------------------------------------------
+# Monta o SQLALCHEMY_ENGINE_OPTIONS a partir das chaves DB_* do
+# Config. Opções definidas explicitamente em SQLALCHEMY_ENGINE_OPTIONS
+# têm prioridade sobre as calculadas aqui.
+# -----------------------------------------------------------------
+
+def build_engine_options(config):
+    """
+    Calcula as opções do engine (pool, pre-ping, statement timeout)
+    adequadas ao banco configurado.
+    """
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'] or 'sqlite://')
+    backend = url.get_backend_name()
+
+    # SQLite em memória usa um pool de conexão única (StaticPool), em que
+    # tamanho, overflow e timeout não se aplicam.
+    in_memory = backend == 'sqlite' and url.database in (None, '', ':memory:')
+    if not in_memory:
+        options.update({
+            'poolclass': InstrumentedQueuePool,
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE']
+        })
+
+    # No PostgreSQL, o statement_timeout é definido por conexão: uma
+    # consulta que passar do limite é cancelada pelo próprio servidor.
+    if backend == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f'-c statement_timeout={config["DB_STATEMENT_TIMEOUT_MS"]}'}
+
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+# -----------------------------------------------------------------
+# Instrumentação do Pool
+# -----------------------------------------------------------------
+# O SQLAlchemy não tem um evento "antes do checkout", então o tempo
+# de espera por uma conexão é medido em uma subclasse do QueuePool.
+# Os eventos do pool ('connect', 'checkout', 'checkin') completam o
+# quadro. Tudo é agregado em um PoolMonitor por aplicação.
+# -----------------------------------------------------------------
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool que mede a espera no checkout e conta os timeouts.
+    """
+    monitor = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            if self.monitor is not None:
+                self.monitor.record_timeout()
+            raise
+        finally:
+            if self.monitor is not None:
+                self.monitor.record_checkout_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        # engine.dispose() cria um pool novo: o monitor precisa acompanhar.
+        pool = super().recreate()
+        pool.monitor = self.monitor
+        return pool
+
+
+class PoolMonitor:
+    """
+    Agrega as métricas de um pool de conexões.
+    """
+
+    def __init__(self, slow_checkout_ms):
+        self.slow_checkout_ms = slow_checkout_ms
+        self.pool = None
+        self.connections_opened = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.slow_checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        """
+        Passa a monitorar o pool do engine informado.
+        """
+        self.pool = engine.pool
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.monitor = self
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+
+    def record_checkout_wait(self, seconds):
+        with self._lock:
+            self.checkout_wait_total += seconds
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+            slow = seconds * 1000 >= self.slow_checkout_ms
+            if slow:
+                self.slow_checkouts += 1
+        # O tempo de espera fica disponível para a instrumentação da
+        # requisição (ex: para separar "espera pelo pool" de "tempo de SQL").
+        if has_request_context():
+            g.pool_wait = g.get('pool_wait', 0.0) + seconds
+        if slow:
+            logger.warning('Checkout lento no pool de conexões: %.1f ms', seconds * 1000)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+        logger.error('Timeout ao obter conexão do pool (pool esgotado).')
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connections_opened += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def stats(self):
+        """
+        Retorna um retrato do pool e os contadores acumulados.
+        """
+        pool = self.pool
+        is_queue_pool = isinstance(pool, QueuePool)
+        with self._lock:
+            return {
+                'pool_class': type(pool).__name__ if pool is not None else None,
+                'size': pool.size() if is_queue_pool else None,
+                'checked_out': pool.checkedout() if is_queue_pool else None,
+                'overflow': pool.overflow() if is_queue_pool else None,
+                'connections_opened': self.connections_opened,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'slow_checkouts': self.slow_checkouts,
+                'checkout_wait_avg_ms': round(self.checkout_wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'checkout_wait_max_ms': round(self.checkout_wait_max * 1000, 3)
+            }
+
+
+def init_pool_monitor(app, db):
+    """
+    Cria o PoolMonitor da aplicação e o associa ao engine principal.
+    """
+    monitor = PoolMonitor(app.config['DB_POOL_SLOW_CHECKOUT_MS'])
+    with app.app_context():
+        monitor.attach(db.engine)
+    app.extensions['pool_monitor'] = monitor
+    return monitor
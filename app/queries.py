@@ -0,0 +1,256 @@
+# app/queries.py
+from sqlalchemy import tuple_, func, case, select, insert, update, delete, true
+
+from app import diet_metrics, sync
+from app.models import Meal, MEAL_FIELDS
+from app.pagination import encode_cursor
+from app.aggregations import bucket_expression, bucket_start
+
+
+# -----------------------------------------------------------------
+# Consultas Compartilhadas (WSGI e ASGI)
+# -----------------------------------------------------------------
+# As rotas síncronas (app/routes.py) e as assíncronas (app/asgi.py)
+# montam as MESMAS consultas a partir daqui; cada uma só muda a forma
+# de executá-las (db.session ou AsyncSession). As funções de escrita
+# recebem uma sessão síncrona: no modo ASGI, são chamadas via
+# AsyncSession.run_sync.
+#
+# Toda consulta recebe o 'user_id' do usuário autenticado e filtra por
+# ele (os índices da 'meal' começam por 'user_id'); as escritas gravam
+# a refeição em nome dele. Uma refeição de outro usuário é tratada
+# como inexistente (404), sem revelar que o id existe.
+# -----------------------------------------------------------------
+
+def meal_statement(user_id, meal_id):
+    """
+    Uma refeição do usuário pela chave primária (None se for de outro).
+    """
+    return select(Meal).where(Meal.id == meal_id, Meal.user_id == user_id)
+
+
+def meal_validators_statement(user_id, meal_id):
+    """
+    Só a 'version' e o 'updated_at' de uma refeição do usuário
+    (requisições condicionais).
+    """
+    return select(Meal.version, Meal.updated_at).where(Meal.id == meal_id, Meal.user_id == user_id)
+
+
+def meals_page_statement(user_id, fields, cursor, limit, conditions=()):
+    """
+    Consulta de uma página do GET /meals do usuário, com as condições
+    dos filtros (ver app/filters.py).
+
+    Retorna (statement, columns), em que 'columns' é a ordem das colunas
+    nas linhas: os campos pedidos mais a chave do cursor (meal_datetime,
+    id) e a 'version', que entra no ETag da página (ver page_etag).
+
+    Prática Sênior: Selecionamos colunas (e não a entidade Meal): o
+    resultado são tuplas simples, sem o custo do "identity map" do ORM.
+    Ordenamos por (meal_datetime, id) para ter uma ordem TOTAL (o id
+    desempata refeições no mesmo horário), o que é obrigatório para a
+    paginação por cursor não pular nem repetir linhas.
+    """
+    columns = fields + tuple(key for key in ('meal_datetime', 'id', 'version') if key not in fields)
+    statement = (
+        select(*[getattr(Meal, column) for column in columns])
+        .where(Meal.user_id == user_id, *conditions)
+        .order_by(Meal.meal_datetime.desc(), Meal.id.desc())
+    )
+    if cursor is not None:
+        # Keyset: continua exatamente depois da última linha da página anterior.
+        # O limite redundante em 'meal_datetime' permite ao PostgreSQL
+        # descartar as partições mensais mais novas que o cursor (o
+        # "partition pruning" não enxerga a comparação de tuplas).
+        statement = statement.where(tuple_(Meal.meal_datetime, Meal.id) < cursor, Meal.meal_datetime <= cursor[0])
+    # Buscamos uma linha a mais só para saber se existe próxima página.
+    return statement.limit(limit + 1), columns
+
+
+def split_page(rows, limit):
+    """
+    Separa a linha extra buscada por meals_page_statement.
+    Retorna (rows, next_cursor).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].meal_datetime, rows[-1].id)
+
+
+def export_statement(user_id, fields, chunk_size):
+    """
+    Consulta da exportação das refeições do usuário, lida do banco em
+    lotes de 'chunk_size'.
+
+    'yield_per' ativa o cursor do lado do servidor (stream_results) e
+    busca as linhas em lotes de tamanho fixo.
+    """
+    return (
+        select(*[getattr(Meal, field) for field in fields])
+        .where(Meal.user_id == user_id)
+        .order_by(Meal.meal_datetime.desc(), Meal.id.desc())
+        .execution_options(yield_per=chunk_size)
+    )
+
+
+def stats_statement(user_id, bucket, dialect_name, date_from, date_to):
+    """
+    Consulta do GET /meals/stats: uma linha (período, total, na dieta)
+    por período, agrupada no banco, só com as refeições do usuário.
+    """
+    period = bucket_expression(bucket, dialect_name).label('period')
+    on_diet = func.sum(case((Meal.is_on_diet == true(), 1), else_=0))
+
+    statement = (
+        select(period, func.count(Meal.id), on_diet)
+        .where(Meal.user_id == user_id)
+        .group_by(period)
+        .order_by(period)
+    )
+    # Intervalo semiaberto [from, to): facilita pedir "o mês de outubro"
+    # como from=2025-10-01&to=2025-11-01.
+    if date_from is not None:
+        statement = statement.where(Meal.meal_datetime >= date_from)
+    if date_to is not None:
+        statement = statement.where(Meal.meal_datetime < date_to)
+    return statement
+
+
+def stats_payload(bucket, rows):
+    """
+    Monta a resposta "colunar" do GET /meals/stats.
+    """
+    return {
+        'bucket': bucket,
+        'starts': [bucket_start(row[0]) for row in rows],
+        'counts': [row[1] for row in rows],
+        'on_diet': [int(row[2] or 0) for row in rows]
+    }
+
+
+# -----------------------------------------------------------------
+# Escritas (sessão síncrona)
+# -----------------------------------------------------------------
+
+def create_meal(session, user_id, values):
+    """
+    Insere uma refeição do usuário e ajusta as métricas na mesma transação.
+    """
+    meal = Meal(user_id=user_id, **values)
+    session.add(meal)
+    # O flush gera o 'id' e grava a linha, para que as métricas
+    # sejam ajustadas na MESMA transação, antes do commit.
+    session.flush()
+    diet_metrics.record_created(user_id, [(meal.meal_datetime, meal.id, meal.is_on_diet)], session=session)
+    return meal
+
+
+def insert_meals(session, user_id, valid_items, chunk_size, results):
+    """
+    Insere as refeições validadas de um lote do usuário em blocos
+    (executemany).
+
+    'valid_items' é uma lista de (índice, valores); o resultado de cada
+    item inserido é gravado em 'results[índice]'.
+    """
+    # 'sort_by_parameter_order=True' garante que os ids do RETURNING
+    # voltam na mesma ordem dos parâmetros enviados.
+    statement = insert(Meal).returning(Meal.id, sort_by_parameter_order=True)
+    positions = []
+    for start in range(0, len(valid_items), chunk_size):
+        chunk = valid_items[start:start + chunk_size]
+        new_ids = session.execute(statement, [{**values, 'user_id': user_id} for _, values in chunk]).scalars().all()
+        for (index, values), new_id in zip(chunk, new_ids):
+            results[index] = {'index': index, 'status': 'created', 'id': new_id}
+            positions.append((values['meal_datetime'], new_id, values['is_on_diet']))
+    diet_metrics.record_created(user_id, positions, session=session)
+
+
+# Colunas que mudam a posição da refeição nas métricas da dieta.
+POSITION_FIELDS = frozenset({'meal_datetime', 'is_on_diet'})
+
+
+def update_meal(session, user_id, meal_id, versions, values):
+    """
+    Grava só as colunas de 'values' em uma refeição do usuário, desde
+    que a versão atual esteja em 'versions' (None aceita qualquer uma,
+    como o 'If-Match: *'), e ajusta as métricas na mesma transação.
+
+    Retorna a linha atualizada (campos da API mais a 'version') ou None
+    se a precondição falhou: a refeição não existe, é de outro usuário
+    ou foi editada por outra requisição.
+
+    Prática Sênior: A escrita é um único "UPDATE ... WHERE id = ? AND
+    version = ? RETURNING ...", sem carregar a entidade antes e sem
+    travar a linha. Quando a edição pode mover a refeição nas métricas
+    (data ou dieta), a posição antiga vem do próprio UPDATE: no
+    PostgreSQL, "UPDATE meal ... FROM (SELECT ...) old RETURNING old.*"
+    devolve os valores de antes e de depois em um só comando. O SQLite
+    não aceita colunas do FROM no RETURNING; lá, a posição antiga é lida
+    antes. Nos dois casos a versão lida entra no WHERE, então o UPDATE
+    só passa se essa posição ainda for a atual.
+    """
+    conditions = [Meal.id == meal_id, Meal.user_id == user_id]
+    if versions is not None:
+        conditions.append(Meal.version.in_(versions))
+    returning = [*[getattr(Meal, field) for field in MEAL_FIELDS], Meal.version]
+
+    moves = bool(POSITION_FIELDS & values.keys())
+    old_position = None
+    if moves and session.get_bind().dialect.name == 'postgresql':
+        old = select(Meal.id, Meal.meal_datetime, Meal.is_on_diet, Meal.version).where(*conditions).subquery('old')
+        conditions = [Meal.id == old.c.id, Meal.user_id == user_id, Meal.version == old.c.version]
+        returning += [old.c.meal_datetime.label('old_meal_datetime'), old.c.is_on_diet.label('old_is_on_diet')]
+    elif moves:
+        current = session.execute(
+            select(Meal.meal_datetime, Meal.is_on_diet, Meal.version).where(*conditions)
+        ).first()
+        if current is None:
+            return None
+        old_position = (current.meal_datetime, meal_id, current.is_on_diet)
+        conditions = [Meal.id == meal_id, Meal.user_id == user_id, Meal.version == current.version]
+
+    # O 'updated_at' é atualizado pelo 'onupdate' do modelo.
+    statement = (
+        update(Meal)
+        .where(*conditions)
+        .values(**values, version=Meal.version + 1)
+        .returning(*returning)
+        .execution_options(synchronize_session=False, cached_meals=[(user_id, meal_id)])
+    )
+    row = session.execute(statement).first()
+    if row is not None and moves:
+        if old_position is None:
+            old_position = (row.old_meal_datetime, meal_id, row.old_is_on_diet)
+        diet_metrics.record_updated(
+            user_id, old_position, (row.meal_datetime, row.id, row.is_on_diet), session=session
+        )
+    return row
+
+
+def delete_meal(session, user_id, meal_id, versions):
+    """
+    Remove uma refeição do usuário (com a mesma precondição de versão
+    do update_meal), deixando uma lápide para a sincronização
+    incremental (ver app/sync.py).
+
+    Retorna True se a refeição foi removida. Um único "DELETE ...
+    RETURNING" devolve a posição usada pelas métricas.
+    """
+    conditions = [Meal.id == meal_id, Meal.user_id == user_id]
+    if versions is not None:
+        conditions.append(Meal.version.in_(versions))
+    statement = (
+        delete(Meal)
+        .where(*conditions)
+        .returning(Meal.meal_datetime, Meal.is_on_diet)
+        .execution_options(synchronize_session=False, cached_meals=[(user_id, meal_id)])
+    )
+    row = session.execute(statement).first()
+    if row is None:
+        return False
+    sync.record_tombstone(session, user_id, meal_id)
+    diet_metrics.record_deleted(user_id, (row.meal_datetime, meal_id, row.is_on_diet), session=session)
+    return True
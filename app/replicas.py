@@ -0,0 +1,263 @@
+# app/replicas.py
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, text, Insert, Update, Delete
+from sqlalchemy.engine import make_url
+
+from app.pool import build_engine_options, PoolMonitor
+
+logger = logging.getLogger(__name__)
+
+# Nome do cookie (e do cabeçalho) que mantém o cliente no primário
+# logo depois de uma escrita.
+PRIMARY_PIN_COOKIE = 'primary_until'
+PRIMARY_PIN_HEADER = 'X-Primary-Until'
+
+# Atraso da réplica em relação ao primário, em segundos (PostgreSQL).
+# Sem nada pendente para aplicar, o atraso é zero, mesmo que a última
+# transação aplicada seja antiga (primário ocioso).
+PG_REPLICATION_LAG_SQL = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE coalesce(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+# -----------------------------------------------------------------
+# Réplicas de Leitura
+# -----------------------------------------------------------------
+# Por padrão, todo o tráfego vai para o primário (DATABASE_URL). Com
+# DATABASE_REPLICA_URLS configurada, as rotas de leitura (listagem,
+# refeição por id, busca, exportação, estatísticas e métricas) passam
+# a consultar uma réplica, escolhida em rodízio; as escritas continuam
+# no primário.
+#
+# O roteamento fica na sessão (RoutingSession): a rota marca a sessão
+# com o engine da réplica e o get_bind() devolve esse engine para as
+# consultas. INSERT/UPDATE/DELETE e o flush do ORM sempre vão para o
+# primário, mesmo em uma sessão marcada.
+#
+# Prática Sênior: "Read-your-writes". A réplica pode estar alguns
+# segundos atrasada; um cliente que acabou de criar ou editar uma
+# refeição e lê em seguida não pode recebê-la "velha". Toda escrita
+# bem-sucedida devolve o cookie 'primary_until' (e o cabeçalho
+# 'X-Primary-Until', para clientes sem cookies) com o instante até o
+# qual as leituras desse cliente ficam no primário.
+#
+# Saúde das réplicas: a cada DB_REPLICA_CHECK_INTERVAL_SECONDS, uma
+# requisição (só uma, as outras não esperam) mede o atraso de cada
+# réplica. Réplicas inacessíveis ou com atraso acima de
+# DB_REPLICA_MAX_LAG_SECONDS saem do rodízio até a próxima verificação
+# que as encontre em dia. Sem réplica saudável, a leitura vai para o
+# primário. Fora do PostgreSQL, uma réplica acessível conta como em dia.
+# -----------------------------------------------------------------
+
+class RoutingSession(Session):
+    """
+    Sessão do Flask-SQLAlchemy que envia as consultas para a réplica
+    escolhida pela rota (em 'session.info["replica_engine"]').
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica_engine')
+        if (
+            replica is not None and bind is None and not self._flushing
+            and not isinstance(clause, (Insert, Update, Delete))
+        ):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class Replica:
+    """
+    Um engine de réplica e o resultado da última verificação.
+    """
+
+    def __init__(self, url, engine, monitor):
+        self.url = url
+        self.engine = engine
+        self.monitor = monitor
+        self.healthy = True
+        self.lag_seconds = None
+        self.last_error = None
+        self.checked_at = None
+
+    def check(self, max_lag_seconds):
+        try:
+            with self.engine.connect() as connection:
+                if connection.dialect.name == 'postgresql':
+                    lag = float(connection.execute(text(PG_REPLICATION_LAG_SQL)).scalar())
+                else:
+                    connection.execute(text('SELECT 1'))
+                    lag = 0.0
+        except Exception as e:  # qualquer falha tira a réplica do rodízio
+            self.healthy, self.lag_seconds, self.last_error = False, None, str(e)
+            logger.warning('Réplica %s inacessível: %s', self.url, e)
+        else:
+            self.healthy, self.lag_seconds, self.last_error = lag <= max_lag_seconds, lag, None
+            if not self.healthy:
+                logger.warning('Réplica %s atrasada (%.1f s): fora do rodízio.', self.url, lag)
+        self.checked_at = datetime.now(timezone.utc)
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'lag_seconds': self.lag_seconds,
+            'last_error': self.last_error,
+            'checked_at': self.checked_at.isoformat() if self.checked_at else None,
+            'pool': self.monitor.stats()
+        }
+
+
+class ReplicaSet:
+    """
+    Réplicas de uma aplicação: rodízio entre as saudáveis e verificação
+    periódica do atraso.
+    """
+
+    def __init__(self, replicas, max_lag_seconds, check_interval_seconds):
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.reads_on_replica = 0
+        self.reads_on_primary = 0
+        self._next = 0
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+
+    def check(self):
+        """
+        Verifica todas as réplicas agora.
+        """
+        for replica in self.replicas:
+            replica.check(self.max_lag_seconds)
+        self._checked_at = time.monotonic()
+
+    def _maybe_check(self):
+        due = self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval_seconds
+        # Só uma requisição faz a verificação; as outras seguem com o
+        # resultado anterior em vez de esperar.
+        if due and self._check_lock.acquire(blocking=False):
+            try:
+                self.check()
+            finally:
+                self._check_lock.release()
+
+    def choose(self):
+        """
+        Próxima réplica saudável (rodízio) ou None (usar o primário).
+        """
+        self._maybe_check()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        with self._lock:
+            if not healthy:
+                self.reads_on_primary += 1
+                return None
+            self.reads_on_replica += 1
+            self._next += 1
+            return healthy[self._next % len(healthy)]
+
+    def record_primary_read(self):
+        with self._lock:
+            self.reads_on_primary += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'reads_on_replica': self.reads_on_replica,
+                'reads_on_primary': self.reads_on_primary,
+                'replicas': [replica.stats() for replica in self.replicas]
+            }
+
+
+class ReplicaRouter:
+    """
+    Extensão Flask (no mesmo padrão do 'cache'): é criada em
+    app/__init__.py e associada à aplicação em create_app().
+    """
+
+    def init_app(self, app):
+        replicas = []
+        instrumentation = app.extensions.get('instrumentation')
+        for uri in app.config['SQLALCHEMY_REPLICA_URIS']:
+            # Mesmas opções de pool do primário, calculadas para a URL da réplica.
+            options = build_engine_options({**app.config, 'SQLALCHEMY_DATABASE_URI': uri})
+            engine = create_engine(uri, **options)
+            monitor = PoolMonitor(app.config['DB_POOL_SLOW_CHECKOUT_MS'])
+            monitor.attach(engine)
+            if instrumentation is not None:
+                instrumentation.attach(engine)
+            replicas.append(Replica(make_url(uri).render_as_string(hide_password=True), engine, monitor))
+        app.extensions['replicas'] = ReplicaSet(
+            replicas,
+            app.config['DB_REPLICA_MAX_LAG_SECONDS'],
+            app.config['DB_REPLICA_CHECK_INTERVAL_SECONDS']
+        )
+
+    @property
+    def replica_set(self):
+        return current_app.extensions['replicas']
+
+    @property
+    def enabled(self):
+        return bool(self.replica_set.replicas)
+
+    # --- Roteamento da requisição ------------------------------------
+    def route_reads(self, session, pinned):
+        """
+        Envia as consultas da sessão para uma réplica saudável, a menos
+        que o cliente esteja fixado no primário ('pinned').
+        Retorna a réplica escolhida (ou None).
+        """
+        replica_set = self.replica_set
+        if pinned:
+            replica_set.record_primary_read()
+            return None
+        replica = replica_set.choose()
+        if replica is not None:
+            session.info['replica_engine'] = replica.engine
+        return replica
+
+    def use_primary(self, session):
+        """
+        Volta as consultas da sessão para o primário.
+        """
+        session.info.pop('replica_engine', None)
+
+    def is_routed(self, session):
+        return 'replica_engine' in session.info
+
+    # --- Read-your-writes --------------------------------------------
+    def is_pinned(self, req):
+        """
+        Indica se o cliente escreveu há pouco (cookie ou cabeçalho com
+        um instante futuro). O valor é limitado à janela configurada,
+        então um cliente não consegue se fixar no primário para sempre.
+        """
+        value = req.cookies.get(PRIMARY_PIN_COOKIE) or req.headers.get(PRIMARY_PIN_HEADER)
+        try:
+            until = float(value)
+        except (TypeError, ValueError):
+            return False
+        now = time.time()
+        return now < until <= now + current_app.config['READ_YOUR_WRITES_SECONDS']
+
+    def pin_to_primary(self, response):
+        """
+        Marca a resposta de uma escrita: as próximas leituras do cliente
+        ficam no primário durante READ_YOUR_WRITES_SECONDS.
+        """
+        window = current_app.config['READ_YOUR_WRITES_SECONDS']
+        until = f'{time.time() + window:.3f}'
+        response.set_cookie(PRIMARY_PIN_COOKIE, until, max_age=window, httponly=True, samesite='Lax')
+        response.headers[PRIMARY_PIN_HEADER] = until
+        return response
+
+    def stats(self):
+        return self.replica_set.stats()
@@ -1,8 +1,16 @@
 # app/routes.py
-from flask import Blueprint, request, jsonify
-from app import db
-from app.models import Meal
-from datetime import datetime
+import csv
+import functools
+import io
+import threading
+
+from flask import Blueprint, request, jsonify, current_app, stream_with_context, g
+from app import db, cache, replicas, diet_metrics, conditional, queries, search, filters, auth, sync, idempotency, importer
+from app.models import Meal, MEAL_FIELDS
+from app.pagination import decode_cursor, decode_search_cursor, decode_sync_token, parse_limit, parse_fields
+from app.validators import validate_meal_payload, validate_meal_patch, validate_meal_batch, parse_ndjson_items, parse_datetime_arg
+from app.aggregations import BUCKETS
+from app.serializers import compile_meal_encoder, render_meals_page
 from sqlalchemy.exc import SQLAlchemyError # Prática Sênior: Importa o erro específico do DB
 
 # Prática Sênior: Importa nosso erro personalizado
@@ -26,50 +34,161 @@ def handle_invalid_usage(error):
     response = jsonify(error.to_dict())
     # Definimos o status code da resposta com base no erro
     response.status_code = error.status_code
+    if error.status_code == 401:
+        # Um 401 precisa dizer ao cliente como se autenticar (RFC 9110).
+        response.headers['WWW-Authenticate'] = 'Bearer'
+    return response
+
+# -----------------------------------------------------------------
+# Prática Sênior: Autenticação CENTRALIZADA
+# -----------------------------------------------------------------
+# Antes de qualquer rota do blueprint, o token do cabeçalho
+# 'Authorization: Bearer' é resolvido para o usuário (ver app/auth.py).
+# As rotas usam 'g.user_id' para filtrar consultas e gravar refeições:
+# cada usuário só enxerga (e só altera) as próprias refeições.
+#
+# Prática Sênior: Roteamento de leitura. As rotas de READ_ENDPOINTS
+# consultam uma réplica (ver app/replicas.py), a menos que o cliente
+# tenha escrito há pouco (cookie/cabeçalho 'primary_until'). O
+# GET /meals/changes fica no primário: o token avança até o horizonte
+# da chamada, e uma réplica atrasada faria o cliente pular alterações.
+READ_ENDPOINTS = frozenset({
+    'api.get_meals', 'api.get_meal', 'api.search_meals',
+    'api.export_meals', 'api.get_meal_stats', 'api.get_metrics'
+})
+
+@bp.before_request
+def authenticate():
+    """
+    Escolhe o banco das consultas e resolve o usuário autenticado,
+    guardando-o em 'g.user_id'.
+    """
+    token = auth.bearer_token(request)
+    if request.endpoint in READ_ENDPOINTS and replicas.enabled:
+        replicas.route_reads(db.session, replicas.is_pinned(request))
+    try:
+        user_id = db.session.execute(auth.user_id_statement(token)).scalar()
+        if user_id is None and replicas.is_routed(db.session):
+            # Usuário (ou token) criado há pouco pode ainda não ter
+            # chegado à réplica: confirma no primário antes do 401.
+            replicas.use_primary(db.session)
+            user_id = db.session.execute(auth.user_id_statement(token)).scalar()
+        g.user_id = auth.require_user(user_id)
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}")
+        raise InvalidAPIUsage("Erro interno ao consultar o banco de dados.", status_code=500)
+
+@bp.after_request
+def pin_writes_to_primary(response):
+    """
+    Depois de uma escrita bem-sucedida, fixa as leituras do cliente no
+    primário pela janela de read-your-writes.
+    """
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and response.status_code < 400 and replicas.enabled:
+        replicas.pin_to_primary(response)
     return response
 
+# -----------------------------------------------------------------
+# Prática Sênior: Criações Idempotentes ('Idempotency-Key')
+# -----------------------------------------------------------------
+# As rotas de criação aceitam o cabeçalho 'Idempotency-Key' (ver
+# app/idempotency.py). Este decorador resolve a chave ANTES da rota:
+# um retry recebe a resposta gravada, sem ler nem escrever na 'meal';
+# uma chave nova é reservada na transação da rota, que grava a
+# resposta nela (_remember_response) antes do commit.
+# -----------------------------------------------------------------
+def idempotent(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = idempotency.request_key(request)
+        if key is None:
+            return view(*args, **kwargs)
+
+        fingerprint = idempotency.request_fingerprint(request.method, request.path, request.get_data())
+        try:
+            replay, g.idempotency_record = idempotency.begin(
+                db.session, g.user_id, key, fingerprint, current_app.config['IDEMPOTENCY_KEY_TTL_SECONDS']
+            )
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(f"Erro de banco de dados: {str(e)}")
+            raise InvalidAPIUsage("Erro interno ao salvar os dados.", status_code=500)
+
+        if replay is not None:
+            return _json_body_response(replay.response_body, replay.status_code, idempotency.replay_headers(replay))
+
+        response = view(*args, **kwargs)
+        _schedule_idempotency_purge()
+        return response
+    return wrapper
+
+
+def _remember_response(response):
+    """
+    Grava a resposta na chave reservada pelo @idempotent (se houver).
+    Deve ser chamada antes do commit, na transação da criação.
+    """
+    record = g.pop('idempotency_record', None)
+    if record is not None:
+        idempotency.record_response(record, response.status_code, response.get_data(as_text=True), response.headers)
+    return response
+
+
+def _schedule_idempotency_purge():
+    """
+    Apaga um lote de chaves vencidas em uma thread, fora da requisição,
+    no máximo uma vez a cada IDEMPOTENCY_PURGE_INTERVAL_SECONDS.
+    """
+    if idempotency.purge_due(current_app.config['IDEMPOTENCY_PURGE_INTERVAL_SECONDS']):
+        app = current_app._get_current_object()
+        threading.Thread(target=_purge_idempotency_keys, args=(app,), daemon=True).start()
+
+
+def _purge_idempotency_keys(app):
+    with app.app_context():
+        try:
+            # Uma conexão própria com o primário (fora da sessão da requisição).
+            with db.engine.begin() as connection:
+                idempotency.purge_expired(connection, app.config['IDEMPOTENCY_PURGE_BATCH_SIZE'])
+        except SQLAlchemyError as e:
+            app.logger.warning(f"Falha no expurgo das chaves de idempotência: {str(e)}")
+
 # -----------------------------------------------------------------
 # Endpoint: Criar uma Nova Refeição (Create)
 # (Refatorado para usar 'raise')
 # -----------------------------------------------------------------
 @bp.route('/meals', methods=['POST'])
+@idempotent
 def create_meal():
     """
     Cria um novo registro de refeição com base nos dados JSON 
     fornecidos no corpo da requisição.
-    """
-    data = request.get_json()
-
-    # 1. Validação de Entrada (agora usando 'raise')
-    if not data:
-        # Em vez de 'return jsonify...', nós "levantamos" nosso erro.
-        # O manipulador @bp.errorhandler(InvalidAPIUsage) vai pegá-lo.
-        raise InvalidAPIUsage('Corpo da requisição não pode ser vazio.', status_code=400)
 
-    required_fields = ['name', 'meal_datetime', 'is_on_diet']
-    missing_fields = [field for field in required_fields if field not in data]
+    Com o cabeçalho 'Idempotency-Key', um retry devolve a resposta da
+    primeira requisição em vez de criar outra refeição.
+    """
+    # 1. Validação de Entrada e Conversão de Tipos
+    # Prática Sênior: As regras ficam em app/validators.py e levantam
+    # InvalidAPIUsage, que o @bp.errorhandler transforma em JSON.
+    values = validate_meal_payload(request.get_json())
 
-    if missing_fields:
-        # Levantamos o erro com uma mensagem clara.
-        raise InvalidAPIUsage(f'Campos obrigatórios ausentes: {", ".join(missing_fields)}', status_code=400)
-    
-    # 2. Tratamento e Conversão de Tipos (agora usando 'raise')
+    # 2. Persistência no Banco de Dados (agora com try/except específico)
+    # A inserção (e o ajuste das métricas na mesma transação) fica em
+    # app/queries.py, compartilhada com o modo ASGI.
     try:
-        meal_datetime_obj = datetime.fromisoformat(data['meal_datetime'])
-    except (ValueError, TypeError):
-        raise InvalidAPIUsage('Formato de "meal_datetime" inválido. Use o padrão ISO 8601 (YYYY-MM-DDTHH:MM:SS).', status_code=400)
-
-    # 3. Criação da Instância do Modelo
-    new_meal = Meal(
-        name=data['name'],
-        description=data.get('description'), 
-        meal_datetime=meal_datetime_obj,
-        is_on_diet=bool(data['is_on_diet'])
-    )
+        # Com o group commit, a inserção entra no próximo lote do
+        # escritor (ver app/group_commit.py); a chave de idempotência
+        # precisa da transação da requisição, então fica de fora.
+        writer = current_app.extensions.get('group_commit')
+        if writer is not None and g.get('idempotency_record') is None:
+            return _created_response(*writer.submit(g.user_id, _create_meal_write, values))
 
-    # 4. Persistência no Banco de Dados (agora com try/except específico)
-    try:
-        db.session.add(new_meal)
+        # 3. Resposta de Sucesso
+        # O ETag (versão 1) já permite editar a refeição com 'If-Match'.
+        # A resposta é montada antes do commit para ficar gravada na
+        # chave de idempotência, na mesma transação.
+        response = _created_response(*_create_meal_write(db.session, g.user_id, values))
+        _remember_response(response)
         db.session.commit()
     
     # Prática Sênior: NUNCA use 'except Exception'.
@@ -80,14 +199,158 @@ def create_meal():
         # Levantamos um erro 500 (Erro Interno do Servidor)
         # O 'str(e)' dá detalhes sobre o erro do banco no log,
         # mas retornamos uma mensagem genérica para o usuário.
-        print(f"Erro de banco de dados: {str(e)}") # Log para o dev
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}") # Log para o dev
         raise InvalidAPIUsage("Erro interno ao salvar os dados.", status_code=500)
 
-    # 5. Resposta de Sucesso
-    return jsonify({
+    return response
+
+
+def _create_meal_write(session, user_id, values):
+    """
+    Insere a refeição e retorna o que a resposta precisa (o payload, a
+    versão e o 'updated_at'), lido antes do commit.
+    """
+    meal = queries.create_meal(session, user_id, values)
+    return meal.to_dict(), meal.id, meal.version, meal.updated_at
+
+
+def _created_response(payload, meal_id, version, updated_at):
+    response = jsonify({
         'message': 'Refeição criada com sucesso!',
-        'meal': new_meal.to_dict()
-    }), 201
+        'meal': payload
+    })
+    response.status_code = 201
+    return conditional.add_validators(response, conditional.meal_etag(meal_id, version), updated_at)
+
+# -----------------------------------------------------------------
+# Endpoint: Criar Refeições em Lote (Create - Batch)
+# -----------------------------------------------------------------
+# Rota: POST /api/v1/meals/batch
+# Prática Sênior: Clientes offline sincronizam centenas de refeições
+# de uma vez. Em vez de uma requisição (e um commit) por refeição,
+# validamos item a item e inserimos os válidos com INSERTs em lote
+# (executemany), em blocos, dentro de UMA única transação.
+# -----------------------------------------------------------------
+@bp.route('/meals/batch', methods=['POST'])
+@idempotent
+def create_meals_batch():
+    """
+    Cria várias refeições de uma vez.
+
+    O corpo pode ser um array JSON de refeições ou, com o Content-Type
+    'application/x-ndjson', uma refeição JSON por linha. A resposta traz
+    o resultado de cada item (na mesma ordem do envio): o id gerado ou
+    a mensagem de erro de validação. Aceita 'Idempotency-Key' como o
+    create_meal.
+    """
+    items = _read_batch_items()
+
+    # 1. Validação item a item (mesmas regras do create_meal)
+    results, valid_items = validate_meal_batch(items, current_app.config['MEALS_BATCH_MAX_ITEMS'])
+
+    # 2. Inserção em blocos, em uma única transação
+    try:
+        queries.insert_meals(db.session, g.user_id, valid_items, current_app.config['MEALS_BATCH_CHUNK_SIZE'], results)
+
+        # 3. Resposta
+        # 201 quando tudo foi criado; 207 (Multi-Status) quando algum item falhou.
+        failed = len(items) - len(valid_items)
+        response = jsonify({
+            'message': 'Lote processado.',
+            'created': len(valid_items),
+            'failed': failed,
+            'results': results
+        })
+        response.status_code = 201 if not failed else 207
+        _remember_response(response)
+        db.session.commit()
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}")
+        raise InvalidAPIUsage("Erro interno ao salvar os dados.", status_code=500)
+
+    return response
+
+
+def _read_batch_items():
+    """
+    Lê os itens do lote a partir do corpo da requisição.
+
+    Para NDJSON, uma linha com JSON inválido vira um InvalidAPIUsage na
+    lista, para ser reportada como erro daquele item (e não do lote todo).
+    """
+    if request.mimetype == 'application/x-ndjson':
+        return parse_ndjson_items(request.get_data(as_text=True), current_app.json.loads)
+
+    data = request.get_json()
+    if not isinstance(data, list):
+        raise InvalidAPIUsage('O corpo deve ser um array JSON de refeições.', status_code=400)
+    return data
+
+# -----------------------------------------------------------------
+# Endpoint: Importar Histórico (Create - Import)
+# -----------------------------------------------------------------
+# Rota: POST /api/v1/meals/import
+# Prática Sênior: Para migrar anos de histórico de outro app. O corpo
+# (CSV ou NDJSON) é lido em streaming, linha a linha, e gravado em
+# blocos por COPY no PostgreSQL (ver app/importer.py): a memória não
+# cresce com o tamanho do arquivo. Mesmo núcleo do 'flask meals import'.
+# -----------------------------------------------------------------
+@bp.route('/meals/import', methods=['POST'])
+def import_meals():
+    """
+    Importa refeições de um arquivo CSV ('Content-Type: text/csv', com
+    cabeçalho name,description,meal_datetime,is_on_diet) ou NDJSON
+    ('application/x-ndjson'), em uma única transação.
+
+    Linhas inválidas não impedem a importação das outras: a resposta
+    traz o total de rejeitadas e o motivo das primeiras
+    MEALS_IMPORT_REPORT_LIMIT.
+    """
+    import_format = next(
+        (name for name, mimetype in importer.IMPORT_MIMETYPES.items() if mimetype == request.mimetype), None
+    )
+    if import_format is None:
+        raise InvalidAPIUsage('Envie o arquivo como "text/csv" ou "application/x-ndjson".', status_code=415)
+
+    report_limit = current_app.config['MEALS_IMPORT_REPORT_LIMIT']
+    rejected_rows = []
+
+    def reject(line, message):
+        if len(rejected_rows) < report_limit:
+            rejected_rows.append({'line': line, 'message': message})
+
+    # O corpo é decodificado sob demanda, sem ser carregado inteiro.
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    # A barreira segura a sincronização do usuário até o commit (ver app/sync.py).
+    with sync.sync_barrier(db.engine, current_app.config['MEALS_SYNC_BARRIER_MAX_SECONDS'], g.user_id) as stamp:
+        try:
+            imported, rejected = importer.import_meals(
+                db.session, g.user_id, importer.iter_items(lines, import_format, current_app.json.loads),
+                current_app.config['MEALS_IMPORT_CHUNK_SIZE'], reject, stamp
+            )
+            db.session.commit()
+
+        except UnicodeDecodeError:
+            db.session.rollback()
+            raise InvalidAPIUsage('O arquivo deve estar em UTF-8.', status_code=400)
+        except csv.Error as e:
+            db.session.rollback()
+            raise InvalidAPIUsage(f'CSV malformado: {str(e)}', status_code=400)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(f"Erro de banco de dados: {str(e)}")
+            raise InvalidAPIUsage("Erro interno ao salvar os dados.", status_code=500)
+
+    # O COPY não passa pelos eventos do ORM: invalida o cache do usuário.
+    cache.invalidate(user_ids=[g.user_id])
+    return jsonify({
+        'message': 'Importação concluída.',
+        'imported': imported,
+        'rejected': rejected,
+        'rejected_rows': rejected_rows
+    }), 201 if not rejected else 207
 
     # -----------------------------------------------------------------
 # Endpoint: Listar Todas as Refeições (Read - All)
@@ -97,27 +360,267 @@ def create_meal():
 @bp.route('/meals', methods=['GET'])
 def get_meals():
     """
-    Retorna uma lista de todas as refeições registradas.
+    Retorna uma página de refeições do usuário, da mais recente para a
+    mais antiga.
+
+    Parâmetros de query (todos opcionais):
+        limit:  Tamanho da página (padrão MEALS_PAGE_SIZE_DEFAULT).
+        cursor: Token 'next_cursor' devolvido pela página anterior.
+        fields: Lista de campos separados por vírgula (ex: "id,name").
+        from, to: Intervalo [from, to) de 'meal_datetime' (ISO 8601).
+        is_on_diet: 'true' ou 'false'.
+        name: Prefixo do nome, sem diferenciar maiúsculas.
     """
+    # 1. Validação dos parâmetros de paginação, projeção e filtros
+    limit = parse_limit(
+        request.args.get('limit'),
+        current_app.config['MEALS_PAGE_SIZE_DEFAULT'],
+        current_app.config['MEALS_PAGE_SIZE_MAX']
+    )
+    cursor = decode_cursor(request.args.get('cursor'))
+    fields = parse_fields(request.args.get('fields'))
+    meal_filters = filters.parse_meal_filters(request.args)
+
+    # 2. Cache de leitura
+    # O corpo da página já codificado (com seu ETag) fica no cache até
+    # a próxima escrita em 'meal' (ver app/cache.py). A chave é tirada
+    # antes da leitura no banco e reusada para guardar a página.
+    cache_key = cache.page_key(g.user_id, request.args)
+    entry = cache.get(cache_key)
+    if entry is not None:
+        body, etag = entry
+        return conditional.not_modified(etag, None) or (
+            conditional.add_validators(_json_body_response(body), etag, None), 200
+        )
+
     try:
-        # 1. Consulta o banco de dados
-        # Prática Sênior: Usamos .order_by() para garantir uma
-        # ordem consistente, o que é bom para paginação no futuro.
-        # Aqui, ordenamos pela data da refeição, da mais recente para a mais antiga.
-        all_meals = Meal.query.order_by(Meal.meal_datetime.desc()).all()
-        
-        # 2. Serialização
-        # Prática Sênior: Usamos uma "List Comprehension" para aplicar
-        # nosso método .to_dict() em cada objeto 'meal' na lista.
-        # Isso é limpo e muito eficiente em Python.
-        meals_list = [meal.to_dict() for meal in all_meals]
-        
-        # 3. Resposta
-        return jsonify({'meals': meals_list}), 200
+        # 3. Consulta (keyset, só as colunas pedidas; ver app/queries.py)
+        conditions = filters.meal_filter_conditions(meal_filters, db.session.get_bind().dialect.name)
+        fields = fields or MEAL_FIELDS
+        statement, columns = queries.meals_page_statement(g.user_id, fields, cursor, limit, conditions)
+        rows, next_cursor = queries.split_page(db.session.execute(statement).all(), limit)
+
+        # 4. Requisição condicional
+        # Prática Sênior: O ETag sai das linhas da própria página (ids e
+        # versões), e não de um agregado sobre todas as refeições do
+        # usuário: cada página continua custando O(página), com ou sem
+        # 'If-None-Match'. Clientes que fazem "polling" recebem um 304
+        # vazio, sem serializar nem enviar o corpo.
+        etag = conditional.page_etag(g.user_id, rows, next_cursor, request.args)
+        # Só o ETag: o 'If-Modified-Since' não enxerga remoções.
+        not_modified = conditional.not_modified(etag, None)
+        if not_modified:
+            return not_modified
+
+        # 5. Serialização e Resposta
+        # Prática Sênior: No modo compacto (produção), o codificador
+        # compilado (app/serializers.py) escreve o JSON direto das tuplas.
+        # No modo debug, sai o JSON indentado de sempre.
+        body = render_meals_page(rows, columns, fields, next_cursor, current_app.json)
+        # Prática Sênior: Só leituras do primário vão para o cache. Uma
+        # réplica atrasada devolveria uma página velha, que ficaria
+        # guardada sob a geração atual (servida até o TTL).
+        if not replicas.is_routed(db.session):
+            cache.set(cache_key, (body, etag))
+        return conditional.add_validators(_json_body_response(body), etag, None), 200
 
     except SQLAlchemyError as e:
         # Se a consulta ao banco falhar por algum motivo.
-        print(f"Erro de banco de dados: {str(e)}")
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}")
+        raise InvalidAPIUsage("Erro interno ao consultar o banco de dados.", status_code=500)
+
+
+def _json_body_response(body, status=200, headers=None):
+    """
+    Monta uma resposta JSON a partir de um corpo já codificado.
+    """
+    return current_app.response_class(body, status=status, headers=headers, mimetype=current_app.json.mimetype)
+
+# -----------------------------------------------------------------
+# Endpoint: Buscar Refeições por Texto (Read - Search)
+# -----------------------------------------------------------------
+# Rota: GET /api/v1/meals/search?q=
+# Prática Sênior: A busca usa o índice invertido de cada banco (GIN
+# no PostgreSQL, FTS5 no SQLite; ver app/search.py), então o custo
+# depende de quantas refeições casam, e não do tamanho da tabela.
+# -----------------------------------------------------------------
+@bp.route('/meals/search', methods=['GET'])
+def search_meals():
+    """
+    Busca refeições do usuário pelo nome e pela descrição, das mais
+    relevantes para as menos relevantes.
+
+    Parâmetros de query:
+        q:      Texto buscado (obrigatório). Todas as palavras precisam casar.
+        prefix: 'true' (padrão) faz a última palavra casar por prefixo
+                (type-ahead); 'false' exige a palavra inteira.
+        limit, cursor, fields: Como no GET /meals.
+    """
+    terms = search.parse_search_terms(request.args.get('q'))
+    prefix = request.args.get('prefix', 'true').lower() != 'false'
+    limit = parse_limit(
+        request.args.get('limit'),
+        current_app.config['MEALS_PAGE_SIZE_DEFAULT'],
+        current_app.config['MEALS_PAGE_SIZE_MAX']
+    )
+    cursor = decode_search_cursor(request.args.get('cursor'))
+    fields = parse_fields(request.args.get('fields')) or MEAL_FIELDS
+
+    try:
+        statement, columns = search.search_statement(
+            db.session.get_bind().dialect.name, g.user_id, terms, prefix, fields, cursor, limit
+        )
+        rows, next_cursor = search.split_search_page(db.session.execute(statement).all(), limit)
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}")
+        raise InvalidAPIUsage("Erro interno ao consultar o banco de dados.", status_code=500)
+
+    body = render_meals_page(rows, columns, fields, next_cursor, current_app.json)
+    return _json_body_response(body), 200
+
+# -----------------------------------------------------------------
+# Endpoint: Sincronização Incremental (Read - Changes)
+# -----------------------------------------------------------------
+# Rota: GET /api/v1/meals/changes?since=<token>
+# Prática Sênior: Clientes offline não precisam baixar o histórico
+# inteiro a cada sincronização. Cada chamada devolve só as refeições
+# criadas/editadas e as removidas (lápides) depois do token, lidas por
+# índices (ver app/sync.py): o custo é proporcional às alterações.
+# -----------------------------------------------------------------
+@bp.route('/meals/changes', methods=['GET'])
+def get_meal_changes():
+    """
+    Retorna as alterações nas refeições do usuário depois de 'since',
+    da mais antiga para a mais recente.
+
+    Parâmetros de query (todos opcionais):
+        since:  O 'next_token' da chamada anterior. Sem ele, a resposta
+                começa do início do histórico (sincronização completa).
+        limit, fields: Como no GET /meals.
+    """
+    token = decode_sync_token(request.args.get('since'))
+    sync.check_token_age(token, current_app.config['MEALS_TOMBSTONE_RETENTION_DAYS'])
+    limit = parse_limit(
+        request.args.get('limit'),
+        current_app.config['MEALS_PAGE_SIZE_DEFAULT'],
+        current_app.config['MEALS_PAGE_SIZE_MAX']
+    )
+    fields = parse_fields(request.args.get('fields')) or MEAL_FIELDS
+
+    try:
+        barrier_started_at = db.session.execute(sync.barrier_statement(g.user_id)).scalar()
+        horizon = sync.sync_horizon(current_app.config['MEALS_SYNC_SETTLE_SECONDS'], barrier_started_at)
+        meals_statement, tombstones_statement = sync.changes_statements(g.user_id, fields, token, horizon, limit)
+        meal_rows = db.session.execute(meals_statement).all()
+        tombstone_rows = db.session.execute(tombstones_statement).all()
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}")
+        raise InvalidAPIUsage("Erro interno ao consultar o banco de dados.", status_code=500)
+
+    changes, next_token, has_more = sync.merge_changes(meal_rows, tombstone_rows, fields, limit, horizon)
+    return jsonify({'changes': changes, 'next_token': next_token, 'has_more': has_more}), 200
+
+# -----------------------------------------------------------------
+# Endpoint: Exportar Todo o Histórico (Read - Export)
+# -----------------------------------------------------------------
+# Rota: GET /api/v1/meals/export?format=ndjson|json
+# Prática Sênior: A resposta é gerada em "streaming". As linhas são
+# lidas do banco em lotes (cursor do lado do servidor) e serializadas
+# à medida que chegam, então o uso de memória fica constante mesmo
+# com milhões de refeições.
+# -----------------------------------------------------------------
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json'
+}
+
+@bp.route('/meals/export', methods=['GET'])
+def export_meals():
+    """
+    Exporta todas as refeições do usuário, da mais recente para a mais antiga.
+
+    Parâmetros de query (opcionais):
+        format: 'ndjson' (padrão, um objeto JSON por linha) ou 'json'
+                (um único documento no formato {"meals": [...]}).
+        fields: Lista de campos separados por vírgula (ex: "id,name").
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_MIMETYPES:
+        raise InvalidAPIUsage('Formato inválido. Use "ndjson" ou "json".', status_code=400)
+    fields = parse_fields(request.args.get('fields')) or MEAL_FIELDS
+
+    # Selecionamos colunas (e não a entidade Meal): o resultado são
+    # tuplas simples, sem o custo do "identity map" do ORM, lidas em
+    # lotes por um cursor do lado do servidor.
+    statement = queries.export_statement(g.user_id, fields, current_app.config['MEALS_EXPORT_CHUNK_SIZE'])
+
+    try:
+        # Executamos antes de começar o streaming: assim, uma falha do
+        # banco ainda pode virar uma resposta 500 padronizada.
+        result = db.session.execute(statement)
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}")
+        raise InvalidAPIUsage("Erro interno ao consultar o banco de dados.", status_code=500)
+
+    # O mesmo codificador compilado do GET /meals (ver app/serializers.py).
+    provider = current_app.json
+    encode = compile_meal_encoder(fields, fields, provider.ensure_ascii, provider.sort_keys)
+
+    def generate():
+        # Prática Sênior: Um 'yield' por lote (e não por linha) reduz o
+        # número de escritas no socket sem acumular o resultado inteiro.
+        if export_format == 'json':
+            yield '{"meals":['
+        separator = ''
+        for partition in result.partitions():
+            rows = [encode(row) for row in partition]
+            if export_format == 'ndjson':
+                yield ''.join(row + '\n' for row in rows)
+            else:
+                yield separator + ','.join(rows)
+                separator = ','
+        if export_format == 'json':
+            yield ']}'
+
+    # stream_with_context mantém o contexto da requisição (e a sessão do
+    # banco) vivo enquanto o gerador estiver sendo consumido.
+    response = current_app.response_class(
+        stream_with_context(generate()),
+        mimetype=EXPORT_MIMETYPES[export_format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=meals.{export_format}'
+    return response
+
+# -----------------------------------------------------------------
+# Endpoint: Estatísticas por Período (Read - Stats)
+# -----------------------------------------------------------------
+# Rota: GET /api/v1/meals/stats?bucket=day|week|month&from=&to=
+# Prática Sênior: O agrupamento acontece no banco (GROUP BY sobre o
+# início do período), e o filtro de datas usa o índice de
+# 'meal_datetime'. Nenhuma refeição é carregada no Python.
+# -----------------------------------------------------------------
+@bp.route('/meals/stats', methods=['GET'])
+def get_meal_stats():
+    """
+    Retorna, para cada período, o total de refeições e quantas estavam
+    dentro da dieta.
+
+    A resposta é "colunar": listas paralelas (starts, counts, on_diet)
+    em vez de um objeto por período, o que deixa o JSON bem menor.
+    """
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        raise InvalidAPIUsage(f'O parâmetro "bucket" deve ser um de: {", ".join(BUCKETS)}.', status_code=400)
+    date_from = parse_datetime_arg(request.args, 'from')
+    date_to = parse_datetime_arg(request.args, 'to')
+
+    try:
+        statement = queries.stats_statement(g.user_id, bucket, db.session.get_bind().dialect.name, date_from, date_to)
+        rows = db.session.execute(statement).all()
+        return jsonify(queries.stats_payload(bucket, rows)), 200
+
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}")
         raise InvalidAPIUsage("Erro interno ao consultar o banco de dados.", status_code=500)
 
 # -----------------------------------------------------------------
@@ -132,13 +635,35 @@ def get_meals():
 def get_meal(meal_id):
     """
     Retorna os detalhes de uma refeição específica pelo seu ID.
+    Refeições de outros usuários respondem 404, como se não existissem.
     """
+    # 1. Cache de leitura
+    # Prática Sênior: Em um acerto, nem o banco é consultado; o ETag
+    # guardado junto com a refeição também resolve o 304.
+    cache_key = cache.meal_key(g.user_id, meal_id)
+    entry = cache.get(cache_key)
+    if entry is not None:
+        payload, etag, updated_at = entry
+        return conditional.not_modified(etag, updated_at) or (
+            conditional.add_validators(jsonify({'meal': payload}), etag, updated_at), 200
+        )
+
     try:
-        # 1. Consulta o banco de dados
-        # .get() é a forma mais simples de buscar por chave primária (ID).
-        meal = Meal.query.get(meal_id)
+        # 2. Requisição condicional
+        # Se o cliente enviou If-None-Match/If-Modified-Since, lemos só o
+        # 'updated_at' (pela chave primária) para decidir se cabe um 304.
+        if conditional.is_conditional():
+            current = db.session.execute(queries.meal_validators_statement(g.user_id, meal_id)).first()
+            if current is not None:
+                not_modified = conditional.not_modified(conditional.meal_etag(meal_id, current.version), current.updated_at)
+                if not_modified:
+                    return not_modified
+
+        # 3. Consulta o banco de dados
+        # Busca pela chave primária (ID), filtrando pelo dono da refeição.
+        meal = db.session.execute(queries.meal_statement(g.user_id, meal_id)).scalar()
         
-        # 2. Prática Sênior: Tratamento de "Não Encontrado"
+        # 4. Prática Sênior: Tratamento de "Não Encontrado"
         # Verificamos se 'meal' é None (não encontrado).
         if not meal:
             # Em vez de deixar o Flask retornar um 404 de HTML genérico,
@@ -146,12 +671,18 @@ def get_meal(meal_id):
             # o cliente da API receberá um JSON padronizado.
             raise InvalidAPIUsage("Refeição não encontrada.", status_code=404)
             
-        # 3. Serialização e Resposta
-        # Se encontramos a refeição, retornamos seu .to_dict().
-        return jsonify({'meal': meal.to_dict()}), 200
+        # 5. Serialização e Resposta
+        # Se encontramos a refeição, retornamos seu .to_dict(), junto
+        # com os validadores para as próximas requisições condicionais.
+        payload = meal.to_dict()
+        etag = conditional.meal_etag(meal.id, meal.version)
+        # Só leituras do primário vão para o cache (ver get_meals).
+        if not replicas.is_routed(db.session):
+            cache.set(cache_key, (payload, etag, meal.updated_at))
+        return conditional.add_validators(jsonify({'meal': payload}), etag, meal.updated_at), 200
 
     except SQLAlchemyError as e:
-        print(f"Erro de banco de dados: {str(e)}")
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}")
         raise InvalidAPIUsage("Erro interno ao consultar o banco de dados.", status_code=500)
 
 
@@ -159,6 +690,10 @@ def get_meal(meal_id):
 # -----------------------------------------------------------------
 # Rota: PUT /api/v1/meals/<int:meal_id>
 # Usamos PUT para a substituição completa do recurso.
+# Prática Sênior: Concorrência otimista. O cliente envia no 'If-Match'
+# o ETag que recebeu no GET; se outra requisição editou a refeição
+# desde então, a escrita responde 412 em vez de sobrescrever a edição
+# alheia (ver Meal.version e queries.update_meal).
 # -----------------------------------------------------------------
 @bp.route('/meals/<int:meal_id>', methods=['PUT'])
 def update_meal(meal_id):
@@ -166,84 +701,94 @@ def update_meal(meal_id):
     Atualiza (substitui) uma refeição existente com base no seu ID.
     O corpo da requisição deve conter o objeto *completo* da refeição.
     """
-    try:
-        # 1. Encontrar o Recurso
-        # Primeiro, buscamos a refeição no banco.
-        meal_to_update = Meal.query.get(meal_id)
-        
-        # 2. Tratar "Não Encontrado" (mesma lógica do get_meal)
-        if not meal_to_update:
-            raise InvalidAPIUsage("Refeição não encontrada.", status_code=404)
-            
-        # 3. Obter e Validar os Dados de Entrada
-        data = request.get_json()
-        if not data:
-            raise InvalidAPIUsage('Corpo da requisição não pode ser vazio.', status_code=400)
+    # 1. Precondição e Validação dos Dados (mesmas regras do create_meal)
+    versions = conditional.if_match_versions(request, meal_id)
+    values = validate_meal_payload(request.get_json())
 
-        required_fields = ['name', 'meal_datetime', 'is_on_diet']
-        missing_fields = [field for field in required_fields if field not in data]
+    # 2. Escrita condicional
+    return _write_meal(meal_id, versions, values)
 
-        if missing_fields:
-            raise InvalidAPIUsage(f'Campos obrigatórios ausentes: {", ".join(missing_fields)}', status_code=400)
-        
-        # 4. Validar o Formato da Data (mesma lógica do create_meal)
-        try:
-            meal_datetime_obj = datetime.fromisoformat(data['meal_datetime'])
-        except (ValueError, TypeError):
-            raise InvalidAPIUsage('Formato de "meal_datetime" inválido. Use o padrão ISO 8601 (YYYY-MM-DDTHH:MM:SS).', status_code=400)
-            
-        # 5. Atualizar os Campos do Objeto
-        # Prática Sênior: Atualizamos o objeto que já foi
-        # carregado da sessão do SQLAlchemy.
-        meal_to_update.name = data['name']
-        meal_to_update.description = data.get('description') # Opcional
-        meal_to_update.meal_datetime = meal_datetime_obj
-        meal_to_update.is_on_diet = bool(data['is_on_diet'])
-        
-        # Nota: O campo 'updated_at' será atualizado automaticamente
-        # graças ao 'onupdate=datetime.utcnow' que definimos no modelo.
+# -----------------------------------------------------------------
+# Endpoint: Atualizar Parte de uma Refeição (Update - Partial)
+# -----------------------------------------------------------------
+# Rota: PATCH /api/v1/meals/<int:meal_id>
+# Só os campos enviados são gravados (o UPDATE não reescreve as
+# outras colunas). Mesma regra de 'If-Match' do PUT.
+# -----------------------------------------------------------------
+@bp.route('/meals/<int:meal_id>', methods=['PATCH'])
+def patch_meal(meal_id):
+    """
+    Atualiza apenas os campos enviados de uma refeição.
+    """
+    versions = conditional.if_match_versions(request, meal_id)
+    values = validate_meal_patch(request.get_json())
+    return _write_meal(meal_id, versions, values)
 
-        # 6. Persistir as Mudanças
-        # Como o objeto 'meal_to_update' já estava na sessão
-        # (desde o .get(meal_id)), só precisamos dar 'commit'.
-        db.session.commit()
-        
-        # 7. Retornar o Recurso Atualizado
-        return jsonify({
-            'message': 'Refeição atualizada com sucesso!',
-            'meal': meal_to_update.to_dict()
-        }), 200 # 200 OK é o status padrão para um PUT bem-sucedido
+
+def _write_meal(meal_id, versions, values):
+    """
+    Grava os valores com a precondição de versão e monta a resposta
+    (com o ETag da nova versão).
+    """
+    try:
+        # Um único UPDATE ... WHERE id = ? AND version = ?; se nenhuma
+        # linha foi afetada, a refeição mudou (ou não existe): 412.
+        writer = current_app.extensions.get('group_commit')
+        if writer is not None:
+            meal = writer.submit(g.user_id, _update_meal_write, meal_id, versions, values)
+        else:
+            try:
+                meal = _update_meal_write(db.session, g.user_id, meal_id, versions, values)
+            except InvalidAPIUsage:
+                db.session.rollback()
+                raise
+            db.session.commit()
 
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro de banco de dados: {str(e)}")
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}")
         raise InvalidAPIUsage("Erro interno ao atualizar os dados.", status_code=500)
 
-        # -----------------------------------------------------------------
+    # 200 OK é o status padrão para um PUT/PATCH bem-sucedido
+    response = jsonify({
+        'message': 'Refeição atualizada com sucesso!',
+        'meal': Meal.serialize(meal)
+    })
+    return conditional.add_validators(response, conditional.meal_etag(meal_id, meal.version), meal.updated_at), 200
+
+
+def _update_meal_write(session, user_id, meal_id, versions, values):
+    """
+    Aplica a escrita condicional; levanta 412 se a precondição falhou
+    (nesse caso, nada foi gravado).
+    """
+    meal = queries.update_meal(session, user_id, meal_id, versions, values)
+    if meal is None:
+        raise conditional.precondition_failed()
+    return meal
+
+# -----------------------------------------------------------------
 # Endpoint: Deletar uma Refeição (Delete)
 # -----------------------------------------------------------------
 # Rota: DELETE /api/v1/meals/<int:meal_id>
+# Também exige 'If-Match': não se remove uma refeição que outro
+# cliente acabou de editar.
 # -----------------------------------------------------------------
 @bp.route('/meals/<int:meal_id>', methods=['DELETE'])
 def delete_meal(meal_id):
     """
     Deleta uma refeição existente com base no seu ID.
     """
+    versions = conditional.if_match_versions(request, meal_id)
     try:
-        # 1. Encontrar o Recurso
-        meal_to_delete = Meal.query.get(meal_id)
-        
-        # 2. Tratar "Não Encontrado"
-        if not meal_to_delete:
-            raise InvalidAPIUsage("Refeição não encontrada.", status_code=404)
-            
-        # 3. Deletar do Banco de Dados
-        # Prática Sênior: Adicionamos o objeto à sessão para
-        # deleção e então damos o commit.
-        db.session.delete(meal_to_delete)
+        # 1. Deletar do Banco de Dados (DELETE ... WHERE version = ?)
+        # Nenhuma linha removida: a refeição mudou ou não existe (412).
+        if not queries.delete_meal(db.session, g.user_id, meal_id, versions):
+            db.session.rollback()
+            raise conditional.precondition_failed()
         db.session.commit()
         
-        # 4. Prática Sênior: Resposta de Sucesso para DELETE
+        # 2. Prática Sênior: Resposta de Sucesso para DELETE
         # O padrão HTTP para uma deleção bem-sucedida é retornar
         # o status 204 (No Content - Sem Conteúdo).
         # Este status, por definição, NÃO DEVE ter um corpo (body)
@@ -253,5 +798,74 @@ def delete_meal(meal_id):
 
     except SQLAlchemyError as e:
         db.session.rollback()
-        print(f"Erro de banco de dados: {str(e)}")
-        raise InvalidAPIUsage("Erro interno ao deletar os dados.", status_code=500)
\ No newline at end of file
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}")
+        raise InvalidAPIUsage("Erro interno ao deletar os dados.", status_code=500)
+
+# -----------------------------------------------------------------
+# Endpoint: Métricas da Dieta
+# -----------------------------------------------------------------
+# Rota: GET /api/v1/metrics
+# Prática Sênior: Os valores são mantidos de forma incremental pelas
+# rotas de escrita (app/diet_metrics.py). Esta leitura consulta só a
+# linha de contadores e o MAX() indexado das sequências: custo
+# constante, sem varrer a tabela 'meal'.
+# -----------------------------------------------------------------
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Retorna o total de refeições do usuário, quantas estão dentro/fora
+    da dieta e a melhor sequência de refeições dentro da dieta.
+    """
+    try:
+        return jsonify({'metrics': diet_metrics.get_metrics(g.user_id)}), 200
+
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Erro de banco de dados: {str(e)}")
+        raise InvalidAPIUsage("Erro interno ao consultar o banco de dados.", status_code=500)
+
+# -----------------------------------------------------------------
+# Endpoint: Estatísticas do Cache
+# -----------------------------------------------------------------
+# Rota: GET /api/v1/cache/stats
+# Expõe os contadores de acertos, falhas e descartes do cache de
+# leitura, para acompanhar a taxa de acerto em produção.
+# -----------------------------------------------------------------
+@bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """
+    Retorna os contadores do cache de leitura.
+    """
+    return jsonify({'cache': cache.stats()}), 200
+
+# -----------------------------------------------------------------
+# Endpoint: Estatísticas do Pool de Conexões
+# -----------------------------------------------------------------
+# Rota: GET /api/v1/pool/stats
+# Mostra conexões em uso, overflow, timeouts e a espera média/máxima
+# no checkout, para distinguir "banco lento" de "fila no pool", além
+# da saúde, do atraso e do pool de cada réplica de leitura.
+# -----------------------------------------------------------------
+@bp.route('/pool/stats', methods=['GET'])
+def get_pool_stats():
+    """
+    Retorna as métricas do pool de conexões (primário e réplicas).
+    """
+    return jsonify({
+        'pool': current_app.extensions['pool_monitor'].stats(),
+        'replicas': replicas.stats()
+    }), 200
+
+# -----------------------------------------------------------------
+# Endpoint: Estatísticas do Controle de Admissão
+# -----------------------------------------------------------------
+# Rota: GET /api/v1/admission/stats
+# Requisições admitidas, enfileiradas e descartadas (429 do rate limit,
+# 503 de fila cheia ou prazo vencido), e a ocupação atual das vagas
+# das rotas caras (ver app/admission.py).
+# -----------------------------------------------------------------
+@bp.route('/admission/stats', methods=['GET'])
+def get_admission_stats():
+    """
+    Retorna os contadores do controle de admissão.
+    """
+    return jsonify({'admission': current_app.extensions['admission'].stats()}), 200
@@ -0,0 +1,137 @@
+# app/search.py
+import re
+
+from sqlalchemy import DDL, Float, event, func, cast, literal_column, select, tuple_, table, column
+
+from app.errors import InvalidAPIUsage
+from app.models import Meal
+from app.pagination import encode_search_cursor
+
+# Máximo de termos aceitos no parâmetro 'q' da busca.
+SEARCH_MAX_TERMS = 8
+
+# Palavras do texto buscado: letras (com acento), dígitos e '_'.
+_TERM = re.compile(r'\w+')
+
+
+# -----------------------------------------------------------------
+# Busca Textual em Nome e Descrição das Refeições
+# -----------------------------------------------------------------
+# Cada banco usa o seu próprio índice invertido, e o custo da busca
+# depende do número de refeições que casam com os termos, e não do
+# tamanho da tabela:
+#   - PostgreSQL: índice GIN sobre (user_id, tsvector de "name
+#     description") (configuração 'simple': sem stemming, bom para nomes
+#     de pratos). O 'user_id' no mesmo índice (extensão btree_gin) faz
+#     a busca ler só as refeições do usuário. A relevância vem do
+#     ts_rank_cd.
+#   - SQLite: tabela virtual FTS5 ('meal_fts', "external content" da
+#     tabela 'meal'), mantida por triggers. A relevância vem do bm25.
+#     O FTS5 não indexa o 'user_id': as refeições de outros usuários
+#     são descartadas no join com a 'meal', pela chave primária.
+# Nos dois casos o último termo casa por prefixo (type-ahead): "fran"
+# encontra "Frango".
+#
+# Os objetos são criados pela migração e, em bancos criados com
+# db.create_all() (testes, benchmarks), pelos eventos DDL abaixo.
+# -----------------------------------------------------------------
+
+# Documento indexado no PostgreSQL. A consulta precisa usar EXATAMENTE
+# a mesma expressão do índice para que o planner o escolha.
+PG_DOCUMENT_SQL = "to_tsvector('simple'::regconfig, coalesce(name, '') || ' ' || coalesce(description, ''))"
+
+# 'btree_gin' permite colunas escalares (o user_id) em um índice GIN.
+PG_CREATE_EXTENSION = 'CREATE EXTENSION IF NOT EXISTS btree_gin'
+PG_CREATE_INDEX = f'CREATE INDEX IF NOT EXISTS ix_meal_user_id_search_document ON meal USING gin (user_id, ({PG_DOCUMENT_SQL}))'
+
+SQLITE_CREATE_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS meal_fts USING fts5("
+    "name, description, content='meal', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS meal_fts_ai AFTER INSERT ON meal BEGIN "
+    "INSERT INTO meal_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS meal_fts_ad AFTER DELETE ON meal BEGIN "
+    "INSERT INTO meal_fts(meal_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS meal_fts_au AFTER UPDATE OF name, description ON meal BEGIN "
+    "INSERT INTO meal_fts(meal_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO meal_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+)
+
+event.listen(Meal.__table__, 'after_create', DDL(PG_CREATE_EXTENSION).execute_if(dialect='postgresql'))
+event.listen(Meal.__table__, 'after_create', DDL(PG_CREATE_INDEX).execute_if(dialect='postgresql'))
+for _statement in SQLITE_CREATE_FTS:
+    event.listen(Meal.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(Meal.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS meal_fts').execute_if(dialect='sqlite'))
+
+_meal_fts = table('meal_fts', column('rowid'))
+
+
+def parse_search_terms(value):
+    """
+    Valida o parâmetro 'q' e o separa em termos.
+    Levanta InvalidAPIUsage (400) se não houver nenhum termo.
+    """
+    terms = _TERM.findall(value or '')
+    if not terms:
+        raise InvalidAPIUsage('O parâmetro "q" deve ter pelo menos uma palavra.', status_code=400)
+    if len(terms) > SEARCH_MAX_TERMS:
+        raise InvalidAPIUsage(f'O parâmetro "q" pode ter no máximo {SEARCH_MAX_TERMS} palavras.', status_code=400)
+    return terms
+
+
+def search_statement(dialect_name, user_id, terms, prefix, fields, cursor, limit):
+    """
+    Consulta de uma página da busca nas refeições do usuário, da mais
+    relevante para a menos relevante (empates pelo id, do mais novo
+    para o mais antigo).
+
+    Retorna (statement, columns); as linhas trazem os campos pedidos, o
+    'id' e a relevância ('score'), usados pelo cursor.
+
+    Argumentos:
+        terms (list): Termos já validados por parse_search_terms().
+        prefix (bool): Se o último termo casa por prefixo.
+        cursor (tuple): (score, id) da última linha da página anterior.
+    """
+    if dialect_name == 'postgresql':
+        # Termos vêm de \w+: não há operadores do tsquery a escapar.
+        query = ' & '.join(terms) + (':*' if prefix else '')
+        tsquery = func.to_tsquery(literal_column("'simple'::regconfig"), query)
+        document = literal_column(PG_DOCUMENT_SQL)
+        # ts_rank_cd devolve 'real'; em double precision o valor faz o
+        # caminho de ida e volta pelo cursor sem perder precisão.
+        score = cast(func.ts_rank_cd(document, tsquery), Float(precision=53))
+        match = document.op('@@')(tsquery)
+        source = Meal
+    elif dialect_name == 'sqlite':
+        # Sintaxe do FTS5: termos entre aspas (AND implícito), '*' = prefixo.
+        query = ' '.join(f'"{term}"' for term in terms) + ('*' if prefix else '')
+        # bm25() é menor para as refeições mais relevantes.
+        score = -func.bm25(literal_column('meal_fts'))
+        match = literal_column('meal_fts').op('MATCH')(query)
+        source = Meal.__table__.join(_meal_fts, _meal_fts.c.rowid == Meal.id)
+    else:
+        raise InvalidAPIUsage(f'Busca não suportada no banco {dialect_name!r}.', status_code=501)
+
+    columns = fields + (('id',) if 'id' not in fields else ()) + ('score',)
+    statement = (
+        select(*[getattr(Meal, field) for field in columns[:-1]], score.label('score'))
+        .select_from(source)
+        .where(match, Meal.user_id == user_id)
+        .order_by(score.desc(), Meal.id.desc())
+    )
+    if cursor is not None:
+        statement = statement.where(tuple_(score, Meal.id) < cursor)
+    # Buscamos uma linha a mais só para saber se existe próxima página.
+    return statement.limit(limit + 1), columns
+
+
+def split_search_page(rows, limit):
+    """
+    Separa a linha extra buscada por search_statement.
+    Retorna (rows, next_cursor).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_search_cursor(rows[-1].score, rows[-1].id)
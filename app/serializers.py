@@ -0,0 +1,125 @@
+# app/serializers.py
+from datetime import datetime
+from functools import lru_cache
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+from app.models import Meal, MEAL_DATETIME_FIELDS
+
+
+# -----------------------------------------------------------------
+# Serialização Compilada de Refeições
+# -----------------------------------------------------------------
+# O caminho "clássico" (Meal.to_dict() + jsonify) monta um dicionário
+# por linha, chama .isoformat() e depois o json percorre tudo de novo.
+# Aqui, para cada combinação de colunas, montamos UMA vez um
+# codificador que lê a tupla do SELECT por posição e escreve o JSON
+# direto, sem dicionários intermediários. A forma de converter cada
+# coluna (datetime, booleano, texto, inteiro) é decidida na compilação,
+# e não a cada linha.
+#
+# A saída é byte a byte igual à de json.dumps(Meal.serialize(...)) com
+# as opções do provider do Flask (chaves ordenadas, separadores
+# compactos e ensure_ascii); tests/test_serializers.py confere isso.
+# -----------------------------------------------------------------
+
+# Prática Sênior: O isoformat() é a parte mais cara de cada linha, e os
+# mesmos instantes se repetem muito (created_at/updated_at de refeições
+# gravadas na mesma transação ou lote, horários "redondos" como 12:00).
+# Um cache LRU limitado troca a formatação por uma busca em dicionário.
+_format_datetime = lru_cache(maxsize=8192)(datetime.isoformat)
+
+
+def _column_expression(field, variable):
+    """
+    Expressão Python que converte a variável de uma coluna no seu JSON,
+    escolhida de acordo com o tipo da coluna no modelo. O valor do
+    datetime é envolvido em aspas pelo literal ao redor (ver abaixo).
+    """
+    column = Meal.__table__.c[field]
+    python_type = column.type.python_type
+    if field in MEAL_DATETIME_FIELDS:
+        # O isoformat() só gera caracteres ASCII, que não precisam de escape.
+        # Com fuso horário, instantes iguais em fusos diferentes seriam a
+        # mesma chave do cache, mas têm textos diferentes: sem cache.
+        formatter = '_isoformat' if column.type.timezone else '_format_datetime'
+        expression = f'{formatter}({variable})'
+    elif python_type is bool:
+        expression = f"('true' if {variable} else 'false')"
+    elif python_type is int:
+        expression = f'_int_repr({variable})'
+    else:
+        expression = f'_encode_string({variable})'
+
+    if column.nullable:
+        expression = f"('null' if {variable} is None else {expression})"
+    return expression
+
+
+@lru_cache(maxsize=128)
+def compile_meal_encoder(columns, fields, ensure_ascii=True, sort_keys=True):
+    """
+    Compila um codificador de linhas de refeição.
+
+    Argumentos:
+        columns (tuple): Ordem das colunas nas linhas (a do SELECT).
+        fields (tuple): Campos a incluir no objeto JSON (subconjunto de columns).
+        ensure_ascii, sort_keys: As mesmas opções do provider JSON.
+
+    Retorna uma função que recebe uma linha (tupla ou Row) e devolve a
+    string JSON do objeto.
+
+    Prática Sênior: Assim como o collections.namedtuple, geramos o
+    código-fonte de uma função específica para a projeção pedida: cada
+    linha vira uma única concatenação de strings, sem laços nem
+    chamadas de função por campo. Só nomes de campos do MEAL_FIELDS
+    entram no código gerado (parse_fields já rejeita os demais).
+    """
+    names = sorted(fields) if sort_keys else tuple(fields)
+    literals = []
+    expressions = []
+    separator = '{'
+    for index, name in enumerate(names):
+        variable = f'row[{columns.index(name)}]'
+        quote = '"' if name in MEAL_DATETIME_FIELDS else ''
+        literals.append(separator + encode_basestring(name) + ':' + quote)
+        expressions.append(_column_expression(name, variable))
+        separator = quote + ','
+    closing = separator[:-1] + '}'
+
+    body = ' + '.join(
+        f'{literal!r} + {expression}' for literal, expression in zip(literals, expressions)
+    ) + f' + {closing!r}'
+    namespace = {
+        '_format_datetime': _format_datetime,
+        '_isoformat': datetime.isoformat,
+        '_int_repr': int.__repr__,
+        '_encode_string': encode_basestring_ascii if ensure_ascii else encode_basestring
+    }
+    exec(f'def encode(row):\n    return {body}\n', namespace)
+    return namespace['encode']
+
+
+def encode_meals_page(rows, columns, fields, next_cursor, ensure_ascii=True, sort_keys=True):
+    """
+    Gera o corpo do GET /meals ({"meals": [...], "next_cursor": ...})
+    exatamente como o jsonify compacto do Flask o geraria, com o '\\n' final.
+    """
+    encode = compile_meal_encoder(columns, fields, ensure_ascii, sort_keys)
+    cursor = 'null' if next_cursor is None else encode_basestring_ascii(next_cursor)
+    # "meals" vem antes de "next_cursor" com ou sem ordenação de chaves.
+    return '{"meals":[' + ','.join(map(encode, rows)) + '],"next_cursor":' + cursor + '}\n'
+
+
+def render_meals_page(rows, columns, fields, next_cursor, provider):
+    """
+    Corpo do GET /meals de acordo com o provider JSON da aplicação.
+
+    No modo compacto (produção), usa o codificador compilado. No modo
+    debug, gera o JSON indentado de sempre a partir de Meal.serialize.
+    """
+    if provider.is_compact():
+        return encode_meals_page(rows, columns, fields, next_cursor, provider.ensure_ascii, provider.sort_keys)
+    return provider.dumps_body({
+        'meals': [Meal.serialize(row, fields) for row in rows],
+        'next_cursor': next_cursor
+    })
@@ -0,0 +1,214 @@
+# app/sync.py
+import heapq
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import tuple_, select, delete, text, bindparam, func, or_
+
+from app.errors import InvalidAPIUsage
+from app.models import Meal, MealTombstone, SyncBarrier
+from app.pagination import encode_sync_token
+
+# Tipos de alteração, na ordem em que empatam no mesmo instante.
+UPSERT = 0
+DELETE = 1
+
+
+# -----------------------------------------------------------------
+# Sincronização Incremental (GET /meals/changes?since=<token>)
+# -----------------------------------------------------------------
+# Clientes offline guardam o 'next_token' da última sincronização e,
+# na próxima, recebem só o que mudou depois dele: refeições criadas
+# ou editadas (pelo índice (user_id, updated_at, id)) e as removidas
+# (pelas lápides da tabela 'meal_tombstone'). O custo depende do
+# número de alterações, e não do tamanho do histórico.
+#
+# As duas fontes formam uma única sequência ordenada por
+# (instante, tipo, id), e o token é a posição da última alteração
+# entregue. Cada fonte é lida com uma varredura de intervalo no seu
+# índice (limit + 1 linhas) e as duas são intercaladas no Python.
+#
+# Prática Sênior: Janela de acomodação. O 'updated_at' é gravado
+# antes do commit, então uma transação mais lenta pode confirmar uma
+# alteração com instante ANTERIOR a outra já entregue, e ela ficaria
+# para trás do token. Por isso só entregamos alterações com mais de
+# MEALS_SYNC_SETTLE_SECONDS: as mais recentes saem na próxima chamada.
+#
+# Prática Sênior: Barreiras para as escritas em massa. Uma importação
+# (ou um arquivamento) leva bem mais que a janela de acomodação. Antes
+# de começar, ela confirma uma linha em 'sync_barrier' com o instante
+# do início e grava TODAS as suas linhas com esse instante, direto no
+# COPY/INSERT. Enquanto a barreira existir, o horizonte fica antes
+# dele: nenhum token passa das linhas ainda não confirmadas. A barreira
+# é removida depois do commit (ou do rollback), e as linhas saem na
+# chamada seguinte. A ordem vem do commit da barreira, e não do relógio
+# de cada linha; nada é regravado no fim.
+# -----------------------------------------------------------------
+
+def changes_statements(user_id, fields, token, horizon, limit):
+    """
+    Consultas das alterações do usuário depois do 'token' e até o
+    instante 'horizon'.
+
+    Retorna (meals_statement, tombstones_statement). As linhas de
+    refeição trazem os campos pedidos mais 'updated_at' e 'id', usados
+    na ordenação.
+    """
+    columns = fields + tuple(key for key in ('updated_at', 'id') if key not in fields)
+    meals = (
+        select(*[getattr(Meal, column) for column in columns])
+        .where(Meal.user_id == user_id, Meal.updated_at <= horizon)
+        .order_by(Meal.updated_at.asc(), Meal.id.asc())
+    )
+    tombstones = (
+        select(MealTombstone.deleted_at, MealTombstone.id, MealTombstone.meal_id)
+        .where(MealTombstone.user_id == user_id, MealTombstone.deleted_at <= horizon)
+        .order_by(MealTombstone.deleted_at.asc(), MealTombstone.id.asc())
+    )
+
+    if token is not None:
+        # Continua depois de (instante, tipo, id): no mesmo instante, as
+        # edições (UPSERT) vêm antes das remoções (DELETE).
+        timestamp, kind, key = token
+        if kind == UPSERT:
+            meals = meals.where(tuple_(Meal.updated_at, Meal.id) > (timestamp, key))
+            tombstones = tombstones.where(MealTombstone.deleted_at >= timestamp)
+        else:
+            meals = meals.where(Meal.updated_at > timestamp)
+            tombstones = tombstones.where(tuple_(MealTombstone.deleted_at, MealTombstone.id) > (timestamp, key))
+
+    # Uma linha a mais em cada fonte, só para saber se há mais alterações.
+    return meals.limit(limit + 1), tombstones.limit(limit + 1)
+
+
+def merge_changes(meal_rows, tombstone_rows, fields, limit, horizon):
+    """
+    Intercala as duas fontes na ordem (instante, tipo, id) e monta o
+    payload da resposta.
+
+    Retorna (changes, next_token, has_more).
+    """
+    merged = heapq.merge(
+        ((row.updated_at, UPSERT, row.id, row) for row in meal_rows),
+        ((row.deleted_at, DELETE, row.id, row) for row in tombstone_rows),
+        key=lambda entry: entry[:3]
+    )
+    entries = []
+    for entry in merged:
+        entries.append(entry)
+        if len(entries) > limit:
+            break
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    changes = [
+        {'op': 'upsert', 'meal': Meal.serialize(row, fields)} if kind == UPSERT
+        else {'op': 'delete', 'id': row.meal_id}
+        for _, kind, _, row in entries
+    ]
+    if has_more:
+        position = entries[-1][:3]
+    else:
+        # Tudo até o 'horizon' já foi entregue: o token avança até ele
+        # (mesmo sem alterações), para que um cliente sem novidades não
+        # fique com um token cada vez mais antigo.
+        position = max([(horizon, DELETE, 0), *(entry[:3] for entry in entries[-1:])])
+    return changes, encode_sync_token(*position), has_more
+
+
+def barrier_statement(user_id):
+    """
+    Início da escrita em massa em andamento mais antiga que afeta o
+    usuário (None se não houver; ver sync_barrier).
+    """
+    return select(func.min(SyncBarrier.started_at)).where(
+        or_(SyncBarrier.user_id == user_id, SyncBarrier.user_id.is_(None)),
+        SyncBarrier.expires_at > datetime.utcnow()
+    )
+
+
+def sync_horizon(settle_seconds, barrier_started_at=None):
+    """
+    Instante mais recente que pode ser entregue (ver "janela de
+    acomodação" e "barreiras" acima). 'barrier_started_at' é o
+    resultado de barrier_statement.
+    """
+    horizon = datetime.utcnow() - timedelta(seconds=settle_seconds)
+    if barrier_started_at is not None:
+        # Estritamente antes: as linhas da escrita em massa têm
+        # exatamente 'started_at'.
+        horizon = min(horizon, barrier_started_at - timedelta(microseconds=1))
+    return horizon
+
+
+@contextmanager
+def sync_barrier(engine, max_seconds, user_id=None):
+    """
+    Segura a sincronização durante uma escrita em massa. Devolve o
+    instante com que todas as linhas (ou lápides) dela devem ser
+    gravadas.
+
+    A barreira é confirmada na hora, em uma transação própria no
+    'engine' (precisa ser vista pelas outras conexões antes das linhas),
+    e removida ao sair do bloco, também em uma transação própria. O
+    commit (ou rollback) da escrita deve acontecer DENTRO do bloco.
+    'user_id' None segura a sincronização de todos os usuários.
+    """
+    started_at = datetime.utcnow()
+    with engine.begin() as connection:
+        barrier_id = connection.execute(SyncBarrier.__table__.insert().values(
+            user_id=user_id, started_at=started_at,
+            expires_at=started_at + timedelta(seconds=max_seconds)
+        )).inserted_primary_key[0]
+    try:
+        yield started_at
+    finally:
+        with engine.begin() as connection:
+            connection.execute(delete(SyncBarrier).where(SyncBarrier.id == barrier_id))
+
+
+def check_token_age(token, retention_days):
+    """
+    Recusa (410) um token mais antigo que a retenção das lápides: as
+    remoções daquele período podem já ter sido compactadas, e o cliente
+    precisa refazer a sincronização completa (sem 'since').
+    """
+    if token is not None and token[0] < datetime.utcnow() - timedelta(days=retention_days):
+        raise InvalidAPIUsage(
+            'Token de sincronização expirado. Refaça a sincronização completa (sem "since").',
+            status_code=410
+        )
+
+
+def record_tombstone(session, user_id, meal_id):
+    """
+    Registra a remoção de uma refeição (chamada na mesma transação do DELETE).
+    """
+    session.add(MealTombstone(user_id=user_id, meal_id=meal_id))
+
+
+def record_archived_tombstones(connection, partition_name, deleted_at):
+    """
+    Registra a remoção de todas as refeições de uma partição mensal que
+    está sendo arquivada (ver app/partitioning.py), com um único INSERT
+    ... SELECT. 'deleted_at' é o instante da barreira aberta para o
+    arquivamento (ver sync_barrier).
+    """
+    # O tipo da coluna no parâmetro: o instante é gravado no mesmo
+    # formato das outras lápides (e comparado com elas).
+    connection.execute(
+        text(f'INSERT INTO meal_tombstone (user_id, meal_id, deleted_at) SELECT user_id, id, :deleted_at FROM {partition_name}')
+        .bindparams(bindparam('deleted_at', deleted_at, type_=MealTombstone.deleted_at.type))
+    )
+
+
+def compact_tombstones(session, retention_days):
+    """
+    Apaga as lápides mais antigas que a retenção e as barreiras vencidas
+    (de escritas em massa que morreram no meio). Retorna quantas lápides
+    foram apagadas. O commit fica a cargo de quem chama.
+    """
+    now = datetime.utcnow()
+    session.execute(delete(SyncBarrier).where(SyncBarrier.expires_at <= now))
+    cutoff = now - timedelta(days=retention_days)
+    return session.execute(delete(MealTombstone).where(MealTombstone.deleted_at < cutoff)).rowcount
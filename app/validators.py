@@ -0,0 +1,168 @@
+# app/validators.py
+from datetime import datetime
+
+from app.errors import InvalidAPIUsage
+from app.models import Meal
+
+# Campos que o cliente precisa enviar para criar/substituir uma refeição.
+REQUIRED_FIELDS = ('name', 'meal_datetime', 'is_on_diet')
+
+
+def validate_meal_payload(data):
+    """
+    Valida o JSON de uma refeição e o converte nos valores das colunas.
+
+    Centraliza as regras usadas pelo create_meal, update_meal e pela
+    criação em lote, para que todos os caminhos de escrita aceitem (e
+    rejeitem) exatamente os mesmos dados.
+
+    Retorna um dict com as chaves 'name', 'description',
+    'meal_datetime' e 'is_on_diet'. Levanta InvalidAPIUsage (400)
+    se os dados forem inválidos.
+    """
+    if not data:
+        raise InvalidAPIUsage('Corpo da requisição não pode ser vazio.', status_code=400)
+
+    if not isinstance(data, dict):
+        raise InvalidAPIUsage('A refeição deve ser um objeto JSON.', status_code=400)
+
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in data]
+    if missing_fields:
+        raise InvalidAPIUsage(f'Campos obrigatórios ausentes: {", ".join(missing_fields)}', status_code=400)
+
+    return {
+        'name': check_meal_name(data['name']),
+        'description': check_meal_description(data.get('description')),  # Opcional
+        'meal_datetime': parse_meal_datetime(data['meal_datetime']),
+        'is_on_diet': bool(data['is_on_diet'])
+    }
+
+
+def validate_meal_patch(data):
+    """
+    Valida o JSON de uma edição parcial (PATCH) com as mesmas regras do
+    validate_meal_payload, mas só para os campos enviados.
+
+    Retorna um dict apenas com as colunas a gravar. Levanta
+    InvalidAPIUsage (400) se nenhum campo editável foi enviado ou se um
+    campo obrigatório veio nulo.
+    """
+    if not data:
+        raise InvalidAPIUsage('Corpo da requisição não pode ser vazio.', status_code=400)
+
+    if not isinstance(data, dict):
+        raise InvalidAPIUsage('A refeição deve ser um objeto JSON.', status_code=400)
+
+    null_fields = [field for field in REQUIRED_FIELDS if field in data and data[field] is None]
+    if null_fields:
+        raise InvalidAPIUsage(f'Campos obrigatórios não podem ser nulos: {", ".join(null_fields)}', status_code=400)
+
+    values = {}
+    if 'name' in data:
+        values['name'] = check_meal_name(data['name'])
+    if 'description' in data:
+        values['description'] = check_meal_description(data['description'])
+    if 'meal_datetime' in data:
+        values['meal_datetime'] = parse_meal_datetime(data['meal_datetime'])
+    if 'is_on_diet' in data:
+        values['is_on_diet'] = bool(data['is_on_diet'])
+
+    if not values:
+        raise InvalidAPIUsage(
+            'Nenhum campo para atualizar. Envie ao menos um de: name, description, meal_datetime, is_on_diet.',
+            status_code=400
+        )
+    return values
+
+
+def check_meal_name(value):
+    """
+    Confere o 'name' contra os limites da coluna. Sem isso, um nome que
+    não é texto (ou longo demais) só falharia no banco, com um 500 que
+    derruba o lote inteiro (POST /meals/batch) ou o bloco da importação.
+    """
+    limit = Meal.name.type.length
+    if not isinstance(value, str) or not value or len(value) > limit:
+        raise InvalidAPIUsage(f'O campo "name" deve ser um texto de 1 a {limit} caracteres.', status_code=400)
+    return value
+
+
+def check_meal_description(value):
+    """
+    Confere a 'description' (opcional) contra os limites da coluna.
+    """
+    limit = Meal.description.type.length
+    if value is not None and (not isinstance(value, str) or len(value) > limit):
+        raise InvalidAPIUsage(f'O campo "description" deve ser um texto de até {limit} caracteres.', status_code=400)
+    return value
+
+
+def parse_meal_datetime(value):
+    """
+    Converte o 'meal_datetime' enviado (ISO 8601) em um objeto datetime.
+    """
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise InvalidAPIUsage('Formato de "meal_datetime" inválido. Use o padrão ISO 8601 (YYYY-MM-DDTHH:MM:SS).', status_code=400)
+
+
+def parse_datetime_arg(args, name):
+    """
+    Lê um parâmetro de query opcional no formato ISO 8601 (ex: 'from').
+    Retorna None quando o parâmetro não foi enviado.
+    """
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidAPIUsage(f'Formato de "{name}" inválido. Use o padrão ISO 8601 (YYYY-MM-DDTHH:MM:SS).', status_code=400)
+
+
+def validate_meal_batch(items, max_items):
+    """
+    Valida os itens de um lote (POST /meals/batch) com as mesmas regras
+    do create_meal.
+
+    Retorna (results, valid_items): 'results' tem uma posição por item,
+    já preenchida com o erro dos itens inválidos, e 'valid_items' é uma
+    lista de (índice, valores) dos itens válidos. Levanta InvalidAPIUsage
+    se o lote for vazio (400) ou grande demais (413).
+    """
+    if not items:
+        raise InvalidAPIUsage('O lote não pode ser vazio.', status_code=400)
+    if len(items) > max_items:
+        raise InvalidAPIUsage(f'O lote pode ter no máximo {max_items} refeições.', status_code=413)
+
+    results = [None] * len(items)
+    valid_items = []
+    for index, item in enumerate(items):
+        if isinstance(item, InvalidAPIUsage):
+            # Linha NDJSON que nem chegou a ser um JSON válido.
+            results[index] = {'index': index, 'status': 'error', 'message': item.message}
+            continue
+        try:
+            valid_items.append((index, validate_meal_payload(item)))
+        except InvalidAPIUsage as error:
+            results[index] = {'index': index, 'status': 'error', 'message': error.message}
+    return results, valid_items
+
+
+def parse_ndjson_items(text, loads):
+    """
+    Lê um corpo NDJSON (uma refeição JSON por linha).
+
+    Uma linha com JSON inválido vira um InvalidAPIUsage na lista, para
+    ser reportada como erro daquele item (e não do lote todo).
+    """
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(loads(line))
+        except ValueError:
+            items.append(InvalidAPIUsage('Linha NDJSON não é um JSON válido.'))
+    return items
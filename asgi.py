@@ -0,0 +1,17 @@
+# asgi.py
+import os
+
+from app.asgi import create_asgi_app
+from config import config_by_name
+
+# Ponto de entrada do modo ASGI (assíncrono), ao lado do run.py (WSGI).
+# -----------------------------------------------------------------
+# Serve o mesmo contrato /api/v1 com handlers 'async def' e o
+# AsyncEngine do SQLAlchemy (ver app/asgi.py). Rode com um servidor
+# ASGI, por exemplo:
+#
+#     hypercorn asgi:app --bind 0.0.0.0:8000
+#     uvicorn asgi:app --port 8000
+#
+# O perfil (development, production, testing) vem de FLASK_CONFIG.
+app = create_asgi_app(config_by_name[os.environ.get('FLASK_CONFIG', 'default')])
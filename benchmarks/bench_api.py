@@ -0,0 +1,379 @@
+# benchmarks/bench_api.py
+"""
+Suíte de benchmarks da API de refeições.
+
+Popula um banco (SQLite temporário por padrão, ou o PostgreSQL de
+--database-url) com refeições sintéticas usando a factory create_app,
+mede vazão e latência (p50/p99) de listar, obter, criar, atualizar e
+deletar, tanto pelo cliente de teste do Flask quanto por um servidor
+WSGI real, e faz micro-benchmarks da serialização (incluindo a
+verificação de que o codificador compilado gera os mesmos bytes do
+caminho to_dict + jsonify).
+
+Uso:
+    python -m benchmarks.bench_api --rows 10000 100000 --output bench.json
+    python -m benchmarks.bench_api --rows 10000 --baseline bench.json --threshold 0.15
+
+Com --baseline, o processo termina com código 1 se alguma métrica
+piorar mais do que o --threshold (ex: 0.15 = 15%), o que permite
+usá-lo como verificação no CI.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import jsonify
+from sqlalchemy.engine import make_url
+from werkzeug.serving import make_server
+
+from app import create_app, db, auth, diet_metrics, filters, queries
+from app.models import Meal, MEAL_FIELDS
+from app.serializers import encode_meals_page
+from config import TestingConfig
+
+SEED_CHUNK_SIZE = 10000
+OPERATIONS = ('list', 'get', 'create', 'update', 'delete')
+
+
+def make_config(database_url):
+    """
+    Perfil de teste, sem cache de leitura (para medir o caminho até o
+    banco) e sem logs de consultas lentas (para não medir o logging).
+    """
+    class BenchmarkConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = database_url
+        CACHE_BACKEND = 'null'
+        SLOW_QUERY_MS = 10 ** 9
+    return BenchmarkConfig
+
+
+def seed(app, rows, rng):
+    """
+    Recria as tabelas, cria o usuário do benchmark e insere 'rows'
+    refeições sintéticas dele em lotes. Retorna o token do usuário.
+    """
+    start_date = datetime(2020, 1, 1)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user, token = auth.create_user(db.session, 'benchmark')
+        insert = db.insert(Meal)
+        for offset in range(0, rows, SEED_CHUNK_SIZE):
+            now = datetime.utcnow()
+            db.session.execute(insert, [
+                {
+                    'user_id': user.id,
+                    'name': f'Refeição {index}',
+                    'description': 'Gerada pelo benchmark',
+                    'meal_datetime': start_date + timedelta(minutes=rng.randrange(0, 60 * 24 * 365 * 5)),
+                    'is_on_diet': rng.random() < 0.7,
+                    'created_at': now,
+                    'updated_at': now
+                }
+                for index in range(offset, min(offset + SEED_CHUNK_SIZE, rows))
+            ])
+        diet_metrics.rebuild()
+        db.session.commit()
+    return token
+
+
+def meal_payload(rng):
+    return {
+        'name': 'Almoço',
+        'description': 'Frango grelhado e salada',
+        'meal_datetime': (datetime(2024, 1, 1) + timedelta(minutes=rng.randrange(0, 500000))).isoformat(),
+        'is_on_diet': rng.random() < 0.7
+    }
+
+
+# -----------------------------------------------------------------
+# Clientes: cliente de teste do Flask e servidor WSGI real
+# -----------------------------------------------------------------
+# PUT/PATCH/DELETE exigem 'If-Match'; o benchmark mede a escrita, e não
+# a disputa entre clientes, então envia '*' (qualquer versão).
+WRITE_METHODS = ('PUT', 'PATCH', 'DELETE')
+
+
+def request_headers(token, method):
+    headers = {'Authorization': f'Bearer {token}'}
+    if method in WRITE_METHODS:
+        headers['If-Match'] = '*'
+    return headers
+
+
+class TestClientDriver:
+    name = 'testclient'
+
+    def __init__(self, app, token):
+        self.client = app.test_client()
+        self.token = token
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body, headers=request_headers(self.token, method))
+        return response.status_code, response.get_data()
+
+    def close(self):
+        pass
+
+
+class WSGIServerDriver:
+    name = 'wsgi'
+
+    def __init__(self, app, token):
+        self.token = token
+        # Sem o log de acesso do werkzeug: ele pesaria na própria medição.
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port)
+
+    def request(self, method, path, body=None):
+        headers = request_headers(self.token, method)
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        self.connection.request(method, path, body=data, headers=headers)
+        response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def close(self):
+        self.connection.close()
+        self.server.shutdown()
+
+
+# -----------------------------------------------------------------
+# Medição
+# -----------------------------------------------------------------
+
+def summarize(latencies, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'ops_per_sec': round(len(ordered) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(statistics.median(ordered) * 1000, 3),
+        'p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3)
+    }
+
+
+def measure(driver, method, make_request, count):
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(count):
+        path, body = make_request()
+        begin = time.perf_counter()
+        status, _ = driver.request(method, path, body)
+        latencies.append(time.perf_counter() - begin)
+        if status >= 400:
+            raise RuntimeError(f'{method} {path} respondeu {status}')
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run_http_benchmarks(app, driver, rows, count, rng):
+    results = {}
+    results['list'] = measure(driver, 'GET', lambda: ('/api/v1/meals?limit=50', None), count)
+    results['get'] = measure(driver, 'GET', lambda: (f'/api/v1/meals/{rng.randint(1, rows)}', None), count)
+
+    created = []
+
+    def create_request():
+        return '/api/v1/meals', meal_payload(rng)
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(count):
+        path, body = create_request()
+        begin = time.perf_counter()
+        status, data = driver.request('POST', path, body)
+        latencies.append(time.perf_counter() - begin)
+        if status != 201:
+            raise RuntimeError(f'POST {path} respondeu {status}')
+        created.append(json.loads(data)['meal']['id'])
+    results['create'] = summarize(latencies, time.perf_counter() - started)
+
+    results['update'] = measure(driver, 'PUT', lambda: (f'/api/v1/meals/{rng.choice(created)}', meal_payload(rng)), count)
+
+    remaining = list(created)
+    rng.shuffle(remaining)
+    results['delete'] = measure(driver, 'DELETE', lambda: (f'/api/v1/meals/{remaining.pop()}', None), count)
+    return results
+
+
+def run_micro_benchmarks(app, count):
+    """
+    Mede a serialização isolada: Meal.to_dict, a codificação JSON de
+    uma página e o codificador compilado (app/serializers.py), sem HTTP
+    nem banco no caminho medido. Antes de medir, confere que o
+    codificador compilado gera exatamente os mesmos bytes do caminho
+    to_dict + jsonify.
+    """
+    with app.app_context():
+        meals = Meal.query.order_by(Meal.meal_datetime.desc(), Meal.id.desc()).limit(count).all()
+        rows = db.session.execute(
+            db.select(*[getattr(Meal, field) for field in MEAL_FIELDS])
+            .order_by(Meal.meal_datetime.desc(), Meal.id.desc())
+            .limit(count)
+        ).all()
+        check_serializer_parity(app, meals, rows)
+        dumps = app.json.dumps
+
+        started = time.perf_counter()
+        payload = [meal.to_dict() for meal in meals]
+        to_dict_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        dumps({'meals': payload})
+        json_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        encode_meals_page(rows, MEAL_FIELDS, MEAL_FIELDS, None)
+        compiled_elapsed = time.perf_counter() - started
+
+    return {
+        'to_dict': {'rows': len(meals), 'rows_per_sec': round(len(meals) / to_dict_elapsed, 2)},
+        'json_encode': {'rows': len(meals), 'rows_per_sec': round(len(meals) / json_elapsed, 2)},
+        'compiled_encode': {'rows': len(rows), 'rows_per_sec': round(len(rows) / compiled_elapsed, 2)}
+    }
+
+
+def check_serializer_parity(app, meals, rows):
+    """
+    Compara o corpo do GET /meals gerado pelo codificador compilado com o
+    do caminho original (to_dict + jsonify), para todas as projeções de
+    um campo e para a projeção completa. Levanta RuntimeError se diferir.
+    """
+    projections = [MEAL_FIELDS] + [(field,) for field in MEAL_FIELDS]
+    with app.test_request_context():
+        for fields in projections:
+            expected = jsonify({'meals': [meal.to_dict(fields) for meal in meals], 'next_cursor': 'x'}).get_data(as_text=True)
+            actual = encode_meals_page(rows, MEAL_FIELDS, fields, 'x')
+            if actual != expected:
+                raise RuntimeError(f'Codificador compilado difere do to_dict + jsonify (fields={",".join(fields)}).')
+
+
+def check_query_plans(app):
+    """
+    Confere, com EXPLAIN, que os filtros comuns do GET /meals usam
+    índices (ver app/filters.py). Levanta RuntimeError se algum cair
+    em uma varredura completa da tabela 'meal'.
+    """
+    def listing_statement(conditions):
+        statement, _ = queries.meals_page_statement(filters.PLAN_CHECK_USER_ID, MEAL_FIELDS, None, 50, conditions)
+        return statement
+
+    with app.app_context():
+        problems = filters.find_sequential_scans(db.session, listing_statement)
+    if problems:
+        cases = '; '.join(str(case) for case, _ in problems)
+        raise RuntimeError(f'Filtros sem índice (varredura completa de meal): {cases}')
+
+
+# -----------------------------------------------------------------
+# Comparação com o baseline (regressões)
+# -----------------------------------------------------------------
+
+def compare(results, baseline, threshold):
+    """
+    Compara com um resultado anterior. Vazão menor ou p99 maior do que
+    'threshold' (fração) conta como regressão.
+    """
+    regressions = []
+    for rows, current in results['results'].items():
+        previous = baseline.get('results', {}).get(rows)
+        if not previous:
+            continue
+        for driver in ('testclient', 'wsgi'):
+            for operation in OPERATIONS:
+                now = current.get(driver, {}).get(operation)
+                before = previous.get(driver, {}).get(operation)
+                if not now or not before:
+                    continue
+                if now['ops_per_sec'] < before['ops_per_sec'] * (1 - threshold):
+                    regressions.append(f'{rows} linhas / {driver} / {operation}: vazão {before["ops_per_sec"]} -> {now["ops_per_sec"]} ops/s')
+                if now['p99_ms'] > before['p99_ms'] * (1 + threshold):
+                    regressions.append(f'{rows} linhas / {driver} / {operation}: p99 {before["p99_ms"]} -> {now["p99_ms"]} ms')
+        for name, now in current.get('micro', {}).items():
+            before = previous.get('micro', {}).get(name)
+            if before and now['rows_per_sec'] < before['rows_per_sec'] * (1 - threshold):
+                regressions.append(f'{rows} linhas / micro / {name}: {before["rows_per_sec"]} -> {now["rows_per_sec"]} linhas/s')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks da API de refeições.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000], help='Tamanhos de tabela a testar (ex: 10000 100000 1000000).')
+    parser.add_argument('--requests', type=int, default=300, help='Requisições por operação.')
+    parser.add_argument('--database-url', help='Banco a usar (padrão: SQLite temporário). O conteúdo é APAGADO.')
+    parser.add_argument('--output', help='Arquivo JSON onde salvar os resultados.')
+    parser.add_argument('--baseline', help='Resultado anterior (JSON) para detectar regressões.')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Piora tolerada em relação ao baseline (fração).')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    tempdir = None
+    database_url = args.database_url
+    if not database_url:
+        tempdir = tempfile.TemporaryDirectory()
+        database_url = 'sqlite:///' + os.path.join(tempdir.name, 'bench.db')
+
+    app = create_app(make_config(database_url))
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': make_url(database_url).get_backend_name(),
+            'requests_per_operation': args.requests
+        },
+        'results': {}
+    }
+
+    for rows in args.rows:
+        rng = random.Random(args.seed)
+        print(f'Populando {rows} refeições...', file=sys.stderr)
+        token = seed(app, rows, rng)
+        check_query_plans(app)
+        entry = {}
+        for driver_class in (TestClientDriver, WSGIServerDriver):
+            driver = driver_class(app, token)
+            try:
+                print(f'  {driver.name}...', file=sys.stderr)
+                entry[driver.name] = run_http_benchmarks(app, driver, rows, args.requests, rng)
+            finally:
+                driver.close()
+        entry['micro'] = run_micro_benchmarks(app, min(rows, 5000))
+        report['results'][str(rows)] = entry
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            regressions = compare(report, json.load(handle), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSÃO: {regression}', file=sys.stderr)
+        exit_code = 1 if regressions else 0
+
+    if tempdir is not None:
+        tempdir.cleanup()
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
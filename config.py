@@ -17,4 +17,228 @@ class Config:
     # Se DATABASE_URL não for encontrada, ele vai dar erro (o que é bom,
     # pois sabemos que precisamos dela).
 
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # -----------------------------------------------------------------
+    # Paginação do GET /api/v1/meals
+    # -----------------------------------------------------------------
+    # Tamanho padrão da página e o máximo que o cliente pode pedir via 'limit'.
+    MEALS_PAGE_SIZE_DEFAULT = int(os.environ.get('MEALS_PAGE_SIZE_DEFAULT', 50))
+    MEALS_PAGE_SIZE_MAX = int(os.environ.get('MEALS_PAGE_SIZE_MAX', 200))
+
+    # Quantidade de linhas lidas do banco por lote na exportação em streaming.
+    MEALS_EXPORT_CHUNK_SIZE = int(os.environ.get('MEALS_EXPORT_CHUNK_SIZE', 1000))
+
+    # -----------------------------------------------------------------
+    # Sincronização incremental (GET /api/v1/meals/changes, ver app/sync.py)
+    # -----------------------------------------------------------------
+    # Alterações mais recentes que isso (segundos) ficam para a próxima
+    # chamada, para não serem ultrapassadas por commits mais lentos.
+    MEALS_SYNC_SETTLE_SECONDS = int(os.environ.get('MEALS_SYNC_SETTLE_SECONDS', 2))
+    # Prazo (segundos) de uma barreira de escrita em massa (importação,
+    # arquivamento): se o processo morrer no meio, a sincronização volta
+    # a andar depois disso. Deve passar da importação mais longa.
+    MEALS_SYNC_BARRIER_MAX_SECONDS = int(os.environ.get('MEALS_SYNC_BARRIER_MAX_SECONDS', 3600))
+    # Dias que as lápides das remoções são mantidas ('flask meals
+    # compact-tombstones'); tokens mais antigos exigem uma sincronização completa.
+    MEALS_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('MEALS_TOMBSTONE_RETENTION_DAYS', 30))
+
+    # -----------------------------------------------------------------
+    # Particionamento mensal e arquivamento (ver app/partitioning.py)
+    # -----------------------------------------------------------------
+    # Meses à frente com partição já criada ('flask meals create-partitions').
+    MEAL_PARTITION_MONTHS_AHEAD = int(os.environ.get('MEAL_PARTITION_MONTHS_AHEAD', 3))
+    # Partições com mais meses que isso são arquivadas ('flask meals
+    # archive-partitions'), na tabela 'meal_archive' ou, se definido,
+    # em arquivos .ndjson.gz neste diretório.
+    MEAL_ARCHIVE_AFTER_MONTHS = int(os.environ.get('MEAL_ARCHIVE_AFTER_MONTHS', 24))
+    MEAL_ARCHIVE_DIR = os.environ.get('MEAL_ARCHIVE_DIR', '')
+    # Linhas por parte (um membro gzip) na tabela 'meal_archive'.
+    MEAL_ARCHIVE_PART_ROWS = int(os.environ.get('MEAL_ARCHIVE_PART_ROWS', 50000))
+    # Espera máxima (ms) pelo lock do DETACH: sem ele, o mês fica para a
+    # próxima rodada, em vez de enfileirar as consultas da API.
+    MEAL_ARCHIVE_LOCK_TIMEOUT_MS = int(os.environ.get('MEAL_ARCHIVE_LOCK_TIMEOUT_MS', 5000))
+
+    # -----------------------------------------------------------------
+    # Criação em lote (POST /api/v1/meals/batch)
+    # -----------------------------------------------------------------
+    # Máximo de refeições por requisição e quantas linhas vão em cada INSERT.
+    MEALS_BATCH_MAX_ITEMS = int(os.environ.get('MEALS_BATCH_MAX_ITEMS', 1000))
+    MEALS_BATCH_CHUNK_SIZE = int(os.environ.get('MEALS_BATCH_CHUNK_SIZE', 200))
+
+    # -----------------------------------------------------------------
+    # Importação em massa (POST /api/v1/meals/import e 'flask meals import')
+    # -----------------------------------------------------------------
+    # Linhas válidas por COPY (PostgreSQL) ou INSERT em lote (SQLite) e
+    # quantas linhas rejeitadas a resposta do endpoint lista, no máximo.
+    MEALS_IMPORT_CHUNK_SIZE = int(os.environ.get('MEALS_IMPORT_CHUNK_SIZE', 5000))
+    MEALS_IMPORT_REPORT_LIMIT = int(os.environ.get('MEALS_IMPORT_REPORT_LIMIT', 1000))
+
+    # -----------------------------------------------------------------
+    # Chaves de idempotência do POST /meals e /meals/batch (ver app/idempotency.py)
+    # -----------------------------------------------------------------
+    # Por quanto tempo (segundos) um retry com a mesma 'Idempotency-Key'
+    # recebe a resposta original.
+    IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_SECONDS', 86400))
+    # Intervalo entre os expurgos em segundo plano das chaves vencidas
+    # (0 = só pelo comando 'flask meals purge-idempotency-keys') e
+    # quantas chaves cada expurgo apaga, no máximo.
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS = int(os.environ.get('IDEMPOTENCY_PURGE_INTERVAL_SECONDS', 300))
+    IDEMPOTENCY_PURGE_BATCH_SIZE = int(os.environ.get('IDEMPOTENCY_PURGE_BATCH_SIZE', 1000))
+
+    # -----------------------------------------------------------------
+    # Group commit do POST /meals e PUT/PATCH /meals/<id> (ver app/group_commit.py)
+    # -----------------------------------------------------------------
+    # Desligado: cada requisição confirma a sua própria transação.
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', 'false').lower() == 'true'
+    # Escritas por commit, no máximo, e quanto tempo (ms) o escritor
+    # espera outras escritas depois da primeira do lote.
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+    GROUP_COMMIT_WINDOW_MS = float(os.environ.get('GROUP_COMMIT_WINDOW_MS', 5))
+    # Segundos que uma requisição espera o commit do seu lote antes de
+    # desistir com 503 (o escritor travou ou caiu).
+    GROUP_COMMIT_TIMEOUT_SECONDS = float(os.environ.get('GROUP_COMMIT_TIMEOUT_SECONDS', 10))
+
+    # -----------------------------------------------------------------
+    # Cache de leitura das refeições (app/cache.py)
+    # -----------------------------------------------------------------
+    # 'memory' (LRU + TTL no processo), 'redis' (compartilhado) ou 'null' (desligado).
+    # Prática Sênior: O 'memory' só serve a UM processo. A invalidação
+    # das escritas só alcança o processo que gravou: com vários workers
+    # (gunicorn -w N), os outros continuariam servindo páginas (e 304s)
+    # velhas por até CACHE_TTL_SECONDS. Por isso o padrão é o 'redis'
+    # quando CACHE_REDIS_URL está definida e, sem ela, 'null'.
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'redis' if os.environ.get('CACHE_REDIS_URL') else 'null')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))
+    CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', 60))
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # -----------------------------------------------------------------
+    # Pool de conexões com o banco (ver app/pool.py)
+    # -----------------------------------------------------------------
+    # Conexões mantidas abertas e quantas extras podem ser abertas em picos.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    # Segundos esperando uma conexão livre antes de desistir (erro 500).
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    # Recicla conexões mais velhas que isso (evita conexões derrubadas pelo servidor/proxy).
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    # Testa a conexão com um "ping" antes de entregá-la à aplicação.
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # Limite de tempo por comando SQL no PostgreSQL, em ms (0 = sem limite).
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    # Esperas no pool acima deste valor (ms) são registradas no log.
+    DB_POOL_SLOW_CHECKOUT_MS = int(os.environ.get('DB_POOL_SLOW_CHECKOUT_MS', 100))
+
+    # -----------------------------------------------------------------
+    # Réplicas de leitura (ver app/replicas.py)
+    # -----------------------------------------------------------------
+    # URLs das réplicas, separadas por vírgula (vazio = tudo no primário).
+    SQLALCHEMY_REPLICA_URIS = [
+        uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()
+    ]
+    # Réplicas com atraso acima disso (segundos) saem do rodízio.
+    DB_REPLICA_MAX_LAG_SECONDS = float(os.environ.get('DB_REPLICA_MAX_LAG_SECONDS', 5))
+    # Intervalo entre as verificações de saúde/atraso das réplicas.
+    DB_REPLICA_CHECK_INTERVAL_SECONDS = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL_SECONDS', 5))
+    # Depois de uma escrita, as leituras do cliente ficam no primário por
+    # este tempo (deve cobrir o atraso aceito nas réplicas).
+    READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 10))
+
+    # -----------------------------------------------------------------
+    # Controle de admissão (ver app/admission.py)
+    # -----------------------------------------------------------------
+    # Rate limit por cliente: 'memory' (por processo), 'redis'
+    # (compartilhado) ou 'null' (desligado). Fichas por segundo e o
+    # acúmulo máximo (rajada) de cada cliente.
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_PER_SECOND = float(os.environ.get('RATE_LIMIT_PER_SECOND', 10))
+    RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 20))
+    # Clientes mantidos na memória (backend 'memory').
+    RATE_LIMIT_MAX_CLIENTS = int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', 100000))
+    RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL', CACHE_REDIS_URL)
+    # Listagens/exportações simultâneas por processo (0 = sem limite).
+    # Deve ficar abaixo de DB_POOL_SIZE + DB_MAX_OVERFLOW, deixando
+    # conexões livres para as rotas baratas.
+    ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 4))
+    # Requisições que podem esperar uma vaga, e por quantos segundos.
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 16))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_SECONDS', 2))
+    # 'Retry-After' (segundos) das respostas 503.
+    ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get('ADMISSION_RETRY_AFTER_SECONDS', 1))
+
+    # -----------------------------------------------------------------
+    # Compressão das respostas (ver app/compression.py)
+    # -----------------------------------------------------------------
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    # 'auto' (brotli se o pacote estiver instalado), 'on' (obrigatório) ou 'off'.
+    COMPRESSION_BROTLI = os.environ.get('COMPRESSION_BROTLI', 'auto')
+    # Respostas menores que isso (bytes) vão sem compressão (exceto streaming).
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    # Nível do gzip (1-9) e qualidade do brotli (0-11).
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+    # Tipos de conteúdo comprimidos.
+    COMPRESSION_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain')
+    # LRU (por processo) dos corpos comprimidos das respostas com ETag;
+    # 0 desliga o reaproveitamento. As entradas nunca ficam velhas (o
+    # ETag está na chave): o TTL só libera a memória das que saem de uso.
+    COMPRESSION_CACHE_ENTRIES = int(os.environ.get('COMPRESSION_CACHE_ENTRIES', 256))
+    COMPRESSION_CACHE_TTL_SECONDS = int(os.environ.get('COMPRESSION_CACHE_TTL_SECONDS', 600))
+
+    # -----------------------------------------------------------------
+    # Instrumentação (ver app/instrumentation.py)
+    # -----------------------------------------------------------------
+    # Consultas SQL mais lentas que isso (ms) geram um log estruturado.
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+    # Adiciona o cabeçalho 'Server-Timing' (app, db, pool) às respostas.
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+    # Expõe GET /metrics no formato do Prometheus.
+    METRICS_ENDPOINT_ENABLED = os.environ.get('METRICS_ENDPOINT_ENABLED', 'true').lower() == 'true'
+
+    # -----------------------------------------------------------------
+    # Serialização JSON (ver app/json_provider.py)
+    # -----------------------------------------------------------------
+    # 'auto' (orjson se estiver instalado), 'orjson' (obrigatório) ou 'stdlib'.
+    JSON_FAST_ENCODER = os.environ.get('JSON_FAST_ENCODER', 'auto')
+
+
+# -----------------------------------------------------------------
+# Perfis por Ambiente
+# -----------------------------------------------------------------
+# Escolhidos pela variável FLASK_CONFIG (ver run.py). Variáveis de
+# ambiente continuam podendo sobrescrever cada valor.
+# -----------------------------------------------------------------
+class DevelopmentConfig(Config):
+    DEBUG = True
+    # O 'flask run' é um processo só: o cache em memória é seguro aqui.
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 2))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 2))
+
+
+class ProductionConfig(Config):
+    # Pool maior, mas com timeout curto: em um pico, é melhor falhar rápido
+    # do que acumular requisições esperando conexão.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 5))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 300))
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 5000))
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+    SQLALCHEMY_REPLICA_URIS = []
+    CACHE_BACKEND = 'null'
+    RATE_LIMIT_BACKEND = 'null'
+    ADMISSION_MAX_CONCURRENT = 0
+
+
+config_by_name = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+    'default': Config
+}
@@ -0,0 +1,36 @@
+"""Add sync_barrier table (in-flight bulk writes hold back delta sync).
+
+Revision ID: 3a9c5e1b7d40
+Revises: f4b2d8c6a013
+Create Date: 2026-10-17 23:02:51.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a9c5e1b7d40'
+down_revision = 'f4b2d8c6a013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sync_barrier',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='sync_barrier_user_id_fkey'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('sync_barrier', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sync_barrier_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('sync_barrier', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sync_barrier_user_id'))
+
+    op.drop_table('sync_barrier')
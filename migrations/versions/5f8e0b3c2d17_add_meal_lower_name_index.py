@@ -0,0 +1,29 @@
+"""Add index on lower(meal.name) for the case-insensitive name prefix filter.
+
+Revision ID: 5f8e0b3c2d17
+Revises: c7d2a91f4e63
+Create Date: 2026-10-17 15:02:44.908213
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5f8e0b3c2d17'
+down_revision = 'c7d2a91f4e63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # 'text_pattern_ops' permite que o LIKE 'prefixo%' use o índice
+        # em qualquer collation do banco.
+        op.execute('CREATE INDEX ix_meal_lower_name ON meal (lower(name) text_pattern_ops)')
+    else:
+        op.execute('CREATE INDEX ix_meal_lower_name ON meal (lower(name))')
+
+
+def downgrade():
+    op.execute('DROP INDEX ix_meal_lower_name')
@@ -0,0 +1,63 @@
+"""Add meal.version for optimistic concurrency (If-Match on PUT/PATCH/DELETE).
+
+Revision ID: 6b3e9f2a7c14
+Revises: d41b7e9a0c58
+Create Date: 2026-10-17 18:02:41.517203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b3e9f2a7c14'
+down_revision = 'd41b7e9a0c58'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_FTS_TRIGGERS = (
+    "CREATE TRIGGER meal_fts_ai AFTER INSERT ON meal BEGIN "
+    "INSERT INTO meal_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER meal_fts_ad AFTER DELETE ON meal BEGIN "
+    "INSERT INTO meal_fts(meal_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER meal_fts_au AFTER UPDATE OF name, description ON meal BEGIN "
+    "INSERT INTO meal_fts(meal_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO meal_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+)
+
+
+def _drop_sqlite_extras():
+    # O DROP COLUMN do batch recria a tabela 'meal' no SQLite, e a cópia
+    # não leva os triggers da busca nem o índice de expressão do filtro
+    # por nome: eles são removidos antes e recriados depois.
+    for trigger in ('meal_fts_au', 'meal_fts_ad', 'meal_fts_ai'):
+        op.execute(f'DROP TRIGGER {trigger}')
+    op.execute('DROP INDEX ix_meal_user_id_lower_name')
+
+
+def _create_sqlite_extras():
+    for statement in SQLITE_FTS_TRIGGERS:
+        op.execute(statement)
+    op.execute('CREATE INDEX ix_meal_user_id_lower_name ON meal (user_id, lower(name))')
+
+
+def upgrade():
+    # Com um DEFAULT constante, o PostgreSQL 11+ não reescreve a tabela;
+    # no SQLite, o ADD COLUMN não recria a 'meal' (os triggers da busca
+    # continuam lá). As refeições existentes começam na versão 1.
+    with op.batch_alter_table('meal', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _drop_sqlite_extras()
+
+    with op.batch_alter_table('meal', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    if dialect == 'sqlite':
+        _create_sqlite_extras()
+
@@ -0,0 +1,173 @@
+"""Add users table and meal.user_id (backfilled), with per-user indexes and metrics.
+
+Revision ID: a83f5d6c1e29
+Revises: 5f8e0b3c2d17
+Create Date: 2026-10-17 16:11:52.340877
+
+"""
+import hashlib
+import secrets
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a83f5d6c1e29'
+down_revision = '5f8e0b3c2d17'
+branch_labels = None
+depends_on = None
+
+# Precisa ser idêntica à expressão usada pela consulta (app/search.py).
+PG_DOCUMENT_SQL = "to_tsvector('simple'::regconfig, coalesce(name, '') || ' ' || coalesce(description, ''))"
+
+SQLITE_FTS_TRIGGERS = (
+    "CREATE TRIGGER meal_fts_ai AFTER INSERT ON meal BEGIN "
+    "INSERT INTO meal_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER meal_fts_ad AFTER DELETE ON meal BEGIN "
+    "INSERT INTO meal_fts(meal_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER meal_fts_au AFTER UPDATE OF name, description ON meal BEGIN "
+    "INSERT INTO meal_fts(meal_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO meal_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+)
+
+
+def _drop_fts_triggers():
+    # No SQLite, o batch_alter_table recria a tabela 'meal' (e o DROP
+    # da antiga leva os triggers da busca junto): eles são removidos
+    # antes e recriados depois.
+    for trigger in ('meal_fts_au', 'meal_fts_ad', 'meal_fts_ai'):
+        op.execute(f'DROP TRIGGER {trigger}')
+
+
+def _create_fts_triggers():
+    for statement in SQLITE_FTS_TRIGGERS:
+        op.execute(statement)
+
+
+def upgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+
+    users = op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('api_token_hash', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name'),
+    sa.UniqueConstraint('api_token_hash')
+    )
+
+    # 1. Dono das refeições que já existem: um usuário 'default'. O token
+    # não é conhecido por ninguém; gere um com 'flask users rotate-token default'.
+    owner_id = None
+    if bind.execute(sa.text('SELECT 1 FROM meal LIMIT 1')).first() is not None:
+        owner_id = bind.execute(
+            sa.insert(users).values(
+                name='default',
+                api_token_hash=hashlib.sha256(secrets.token_urlsafe(32).encode('utf-8')).hexdigest(),
+                created_at=datetime.utcnow()
+            ).returning(users.c.id)
+        ).scalar()
+    else:
+        # Sem refeições, as métricas estão zeradas: não há o que migrar.
+        op.execute('DELETE FROM diet_streak')
+        op.execute('DELETE FROM diet_metrics')
+
+    # Prática Sênior: A coluna nasce NOT NULL com o dono como DEFAULT
+    # (no PostgreSQL 11+ isso não reescreve a tabela) e o DEFAULT é
+    # removido em seguida: não há um UPDATE de todas as linhas.
+    owner_default = sa.text(str(owner_id)) if owner_id is not None else None
+
+    # 2. meal.user_id e índices que começam por ele
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX ix_meal_search_document')
+    elif dialect == 'sqlite':
+        _drop_fts_triggers()
+    op.execute('DROP INDEX ix_meal_lower_name')
+
+    with op.batch_alter_table('meal', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=False, server_default=owner_default))
+        batch_op.create_foreign_key('meal_user_id_fkey', 'users', ['user_id'], ['id'])
+        batch_op.drop_index('ix_meal_is_on_diet_meal_datetime_id')
+        batch_op.drop_index('ix_meal_meal_datetime_id')
+        batch_op.create_index('ix_meal_user_id_meal_datetime_id', ['user_id', 'meal_datetime', 'id'], unique=False)
+        batch_op.create_index('ix_meal_user_id_is_on_diet_meal_datetime_id', ['user_id', 'is_on_diet', 'meal_datetime', 'id'], unique=False)
+    with op.batch_alter_table('meal', schema=None) as batch_op:
+        batch_op.alter_column('user_id', server_default=None)
+
+    if dialect == 'postgresql':
+        # 'btree_gin' permite o user_id (escalar) no índice GIN da busca.
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+        op.execute(f'CREATE INDEX ix_meal_user_id_search_document ON meal USING gin (user_id, ({PG_DOCUMENT_SQL}))')
+        op.execute('CREATE INDEX ix_meal_user_id_lower_name ON meal (user_id, lower(name) text_pattern_ops)')
+    else:
+        op.execute('CREATE INDEX ix_meal_user_id_lower_name ON meal (user_id, lower(name))')
+        if dialect == 'sqlite':
+            _create_fts_triggers()
+
+    # 3. Métricas por usuário (as atuais passam a ser do dono acima)
+    with op.batch_alter_table('diet_metrics', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=False, server_default=owner_default))
+        batch_op.create_unique_constraint('diet_metrics_user_id_key', ['user_id'])
+        batch_op.create_foreign_key('diet_metrics_user_id_fkey', 'users', ['user_id'], ['id'])
+    with op.batch_alter_table('diet_metrics', schema=None) as batch_op:
+        batch_op.alter_column('user_id', server_default=None)
+
+    with op.batch_alter_table('diet_streak', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=False, server_default=owner_default))
+        batch_op.create_foreign_key('diet_streak_user_id_fkey', 'users', ['user_id'], ['id'])
+        batch_op.drop_index('ix_diet_streak_length')
+        batch_op.drop_index('ix_diet_streak_left_datetime_left_meal_id')
+        batch_op.create_index('ix_diet_streak_user_id_left_datetime_left_meal_id', ['user_id', 'left_datetime', 'left_meal_id'], unique=False)
+        batch_op.create_index('ix_diet_streak_user_id_length', ['user_id', 'length'], unique=False)
+    with op.batch_alter_table('diet_streak', schema=None) as batch_op:
+        batch_op.alter_column('user_id', server_default=None)
+
+
+def downgrade():
+    # As refeições de todos os usuários voltam a formar um único
+    # histórico; as métricas por usuário são descartadas (recalcule-as
+    # com 'flask metrics rebuild' na versão anterior da aplicação).
+    dialect = op.get_bind().dialect.name
+
+    op.execute('DELETE FROM diet_streak')
+    op.execute('DELETE FROM diet_metrics')
+    with op.batch_alter_table('diet_streak', schema=None) as batch_op:
+        batch_op.drop_index('ix_diet_streak_user_id_length')
+        batch_op.drop_index('ix_diet_streak_user_id_left_datetime_left_meal_id')
+        batch_op.drop_constraint('diet_streak_user_id_fkey', type_='foreignkey')
+        batch_op.drop_column('user_id')
+        batch_op.create_index('ix_diet_streak_left_datetime_left_meal_id', ['left_datetime', 'left_meal_id'], unique=False)
+        batch_op.create_index('ix_diet_streak_length', ['length'], unique=False)
+
+    with op.batch_alter_table('diet_metrics', schema=None) as batch_op:
+        batch_op.drop_constraint('diet_metrics_user_id_fkey', type_='foreignkey')
+        batch_op.drop_constraint('diet_metrics_user_id_key', type_='unique')
+        batch_op.drop_column('user_id')
+
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX ix_meal_user_id_search_document')
+    elif dialect == 'sqlite':
+        _drop_fts_triggers()
+    op.execute('DROP INDEX ix_meal_user_id_lower_name')
+
+    with op.batch_alter_table('meal', schema=None) as batch_op:
+        batch_op.drop_index('ix_meal_user_id_is_on_diet_meal_datetime_id')
+        batch_op.drop_index('ix_meal_user_id_meal_datetime_id')
+        batch_op.drop_constraint('meal_user_id_fkey', type_='foreignkey')
+        batch_op.drop_column('user_id')
+        batch_op.create_index('ix_meal_meal_datetime_id', ['meal_datetime', 'id'], unique=False)
+        batch_op.create_index('ix_meal_is_on_diet_meal_datetime_id', ['is_on_diet', 'meal_datetime', 'id'], unique=False)
+
+    if dialect == 'postgresql':
+        op.execute(f'CREATE INDEX ix_meal_search_document ON meal USING gin (({PG_DOCUMENT_SQL}))')
+        op.execute('CREATE INDEX ix_meal_lower_name ON meal (lower(name) text_pattern_ops)')
+    else:
+        op.execute('CREATE INDEX ix_meal_lower_name ON meal (lower(name))')
+        if dialect == 'sqlite':
+            _create_fts_triggers()
+
+    op.drop_table('users')
@@ -0,0 +1,56 @@
+"""Add full-text search over meal name/description (GIN on PostgreSQL, FTS5 on SQLite).
+
+Revision ID: c7d2a91f4e63
+Revises: ea42f4eefd4e
+Create Date: 2026-10-17 14:20:05.417302
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2a91f4e63'
+down_revision = 'ea42f4eefd4e'
+branch_labels = None
+depends_on = None
+
+# Precisa ser idêntica à expressão usada pela consulta (app/search.py).
+PG_DOCUMENT_SQL = "to_tsvector('simple'::regconfig, coalesce(name, '') || ' ' || coalesce(description, ''))"
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(f'CREATE INDEX ix_meal_search_document ON meal USING gin (({PG_DOCUMENT_SQL}))')
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE meal_fts USING fts5("
+            "name, description, content='meal', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "CREATE TRIGGER meal_fts_ai AFTER INSERT ON meal BEGIN "
+            "INSERT INTO meal_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER meal_fts_ad AFTER DELETE ON meal BEGIN "
+            "INSERT INTO meal_fts(meal_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER meal_fts_au AFTER UPDATE OF name, description ON meal BEGIN "
+            "INSERT INTO meal_fts(meal_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+            "INSERT INTO meal_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END"
+        )
+        # Indexa as refeições que já existem.
+        op.execute("INSERT INTO meal_fts(meal_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX ix_meal_search_document')
+    elif dialect == 'sqlite':
+        op.execute('DROP TRIGGER meal_fts_au')
+        op.execute('DROP TRIGGER meal_fts_ad')
+        op.execute('DROP TRIGGER meal_fts_ai')
+        op.execute('DROP TABLE meal_fts')
@@ -0,0 +1,44 @@
+"""Add meal (user_id, updated_at, id) index and meal_tombstone table for delta sync.
+
+Revision ID: d41b7e9a0c58
+Revises: a83f5d6c1e29
+Create Date: 2026-10-17 17:40:13.206519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41b7e9a0c58'
+down_revision = 'a83f5d6c1e29'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('meal_tombstone',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('meal_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='meal_tombstone_user_id_fkey'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('meal_tombstone', schema=None) as batch_op:
+        batch_op.create_index('ix_meal_tombstone_user_id_deleted_at_id', ['user_id', 'deleted_at', 'id'], unique=False)
+        batch_op.create_index('ix_meal_tombstone_deleted_at', ['deleted_at'], unique=False)
+
+    with op.batch_alter_table('meal', schema=None) as batch_op:
+        batch_op.create_index('ix_meal_user_id_updated_at_id', ['user_id', 'updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('meal', schema=None) as batch_op:
+        batch_op.drop_index('ix_meal_user_id_updated_at_id')
+
+    with op.batch_alter_table('meal_tombstone', schema=None) as batch_op:
+        batch_op.drop_index('ix_meal_tombstone_deleted_at')
+        batch_op.drop_index('ix_meal_tombstone_user_id_deleted_at_id')
+
+    op.drop_table('meal_tombstone')
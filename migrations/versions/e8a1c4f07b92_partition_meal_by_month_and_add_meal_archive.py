@@ -0,0 +1,109 @@
+"""Partition meal by month of meal_datetime (PostgreSQL) and add meal_archive table.
+
+Revision ID: e8a1c4f07b92
+Revises: 9c4e2b7d1f35
+Create Date: 2026-10-17 19:52:31.118604
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a1c4f07b92'
+down_revision = '9c4e2b7d1f35'
+branch_labels = None
+depends_on = None
+
+# Meses à frente criados na conversão (os seguintes ficam a cargo de
+# 'flask meals create-partitions').
+MONTHS_AHEAD = 3
+
+# Precisa ser idêntica à expressão usada pela consulta (app/search.py).
+PG_DOCUMENT_SQL = "to_tsvector('simple'::regconfig, coalesce(name, '') || ' ' || coalesce(description, ''))"
+
+# Índices da 'meal', recriados depois da troca de tabelas (os mesmos de
+# app/models.py, app/filters.py e app/search.py).
+PG_MEAL_INDEXES = (
+    'CREATE INDEX ix_meal_user_id_meal_datetime_id ON meal (user_id, meal_datetime, id)',
+    'CREATE INDEX ix_meal_user_id_is_on_diet_meal_datetime_id ON meal (user_id, is_on_diet, meal_datetime, id)',
+    'CREATE INDEX ix_meal_user_id_updated_at_id ON meal (user_id, updated_at, id)',
+    'CREATE INDEX ix_meal_user_id_lower_name ON meal (user_id, lower(name) text_pattern_ops)',
+    f'CREATE INDEX ix_meal_user_id_search_document ON meal USING gin (user_id, ({PG_DOCUMENT_SQL}))',
+)
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _swap_tables(partition_clause, primary_key, partitions):
+    # Mesmo roteiro de app/partitioning.py: tabela nova, cópia das
+    # linhas, troca de nomes, chave estrangeira e índices.
+    op.execute('LOCK TABLE meal IN ACCESS EXCLUSIVE MODE')
+    op.execute(f'CREATE TABLE meal_partitioned (LIKE meal INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partition_clause}')
+    op.execute(f'ALTER TABLE meal_partitioned ADD PRIMARY KEY {primary_key}')
+    for name, bound in partitions:
+        op.execute(f'CREATE TABLE {name} PARTITION OF meal_partitioned {bound}')
+    op.execute('INSERT INTO meal_partitioned SELECT * FROM meal')
+    op.execute('ALTER SEQUENCE meal_id_seq OWNED BY meal_partitioned.id')
+    op.execute('DROP TABLE meal')
+    op.execute('ALTER TABLE meal_partitioned RENAME TO meal')
+    op.execute('ALTER TABLE meal ADD CONSTRAINT meal_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)')
+    for statement in PG_MEAL_INDEXES:
+        op.execute(statement)
+
+
+def upgrade():
+    op.create_table('meal_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('partition_name', sa.String(length=63), nullable=False),
+    sa.Column('range_start', sa.DateTime(), nullable=False),
+    sa.Column('range_end', sa.DateTime(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('partition_name')
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    # Quem já particionou por usuário ('flask meals partition-by-user')
+    # continua assim: só um dos dois particionamentos pode ser aplicado.
+    if bind.execute(sa.text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('meal')")).first():
+        return
+
+    today = date.today()
+    current = date(today.year, today.month, 1)
+    oldest = bind.execute(sa.text('SELECT min(meal_datetime) FROM meal')).scalar()
+    month = min(date(oldest.year, oldest.month, 1), current) if oldest else current
+    partitions = []
+    while month <= _add_months(current, MONTHS_AHEAD):
+        following = _add_months(month, 1)
+        partitions.append((
+            f'meal_y{month.year:04d}m{month.month:02d}',
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        ))
+        month = following
+    partitions.append(('meal_pdefault', 'DEFAULT'))
+    _swap_tables(' PARTITION BY RANGE (meal_datetime)', '(id, meal_datetime)', partitions)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        key = bind.execute(sa.text(
+            "SELECT a.attname FROM pg_partitioned_table p "
+            "JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0] "
+            "WHERE p.partrelid = to_regclass('meal')"
+        )).scalar()
+        # Volta a uma tabela comum. As refeições já arquivadas não voltam.
+        if key == 'meal_datetime':
+            _swap_tables('', '(id)', ())
+
+    op.drop_table('meal_archive')
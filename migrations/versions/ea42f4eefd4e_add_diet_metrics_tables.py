@@ -0,0 +1,98 @@
+"""Add diet_metrics and diet_streak tables for incremental diet metrics.
+
+Revision ID: ea42f4eefd4e
+Revises: ee535ede4953
+Create Date: 2026-10-17 10:03:17.884120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ea42f4eefd4e'
+down_revision = 'ee535ede4953'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('diet_metrics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('total_meals', sa.Integer(), nullable=False),
+    sa.Column('on_diet_meals', sa.Integer(), nullable=False),
+    sa.Column('off_diet_meals', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('diet_streak',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('left_datetime', sa.DateTime(), nullable=True),
+    sa.Column('left_meal_id', sa.Integer(), nullable=True),
+    sa.Column('length', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('diet_streak', schema=None) as batch_op:
+        batch_op.create_index('ix_diet_streak_left_datetime_left_meal_id', ['left_datetime', 'left_meal_id'], unique=False)
+        batch_op.create_index('ix_diet_streak_length', ['length'], unique=False)
+
+    with op.batch_alter_table('meal', schema=None) as batch_op:
+        batch_op.create_index('ix_meal_is_on_diet_meal_datetime_id', ['is_on_diet', 'meal_datetime', 'id'], unique=False)
+
+    # Preenche as métricas a partir das refeições já existentes
+    # (mesma lógica de app/diet_metrics.compute_from_scan).
+    bind = op.get_bind()
+    meal = sa.table('meal',
+        sa.column('id', sa.Integer()),
+        sa.column('meal_datetime', sa.DateTime()),
+        sa.column('is_on_diet', sa.Boolean())
+    )
+    diet_metrics = sa.table('diet_metrics',
+        sa.column('id', sa.Integer()),
+        sa.column('total_meals', sa.Integer()),
+        sa.column('on_diet_meals', sa.Integer()),
+        sa.column('off_diet_meals', sa.Integer())
+    )
+    diet_streak = sa.table('diet_streak',
+        sa.column('left_datetime', sa.DateTime()),
+        sa.column('left_meal_id', sa.Integer()),
+        sa.column('length', sa.Integer())
+    )
+
+    total = on_diet = 0
+    streaks = []
+    left = (None, None)
+    length = 0
+    rows = bind.execute(
+        sa.select(meal.c.meal_datetime, meal.c.id, meal.c.is_on_diet)
+        .order_by(meal.c.meal_datetime, meal.c.id)
+    )
+    for meal_datetime, meal_id, is_on_diet in rows:
+        total += 1
+        if is_on_diet:
+            on_diet += 1
+            length += 1
+        else:
+            if length:
+                streaks.append({'left_datetime': left[0], 'left_meal_id': left[1], 'length': length})
+            left = (meal_datetime, meal_id)
+            length = 0
+    if length:
+        streaks.append({'left_datetime': left[0], 'left_meal_id': left[1], 'length': length})
+
+    op.bulk_insert(diet_metrics, [{
+        'id': 1, 'total_meals': total, 'on_diet_meals': on_diet, 'off_diet_meals': total - on_diet
+    }])
+    if streaks:
+        op.bulk_insert(diet_streak, streaks)
+
+
+def downgrade():
+    with op.batch_alter_table('meal', schema=None) as batch_op:
+        batch_op.drop_index('ix_meal_is_on_diet_meal_datetime_id')
+
+    with op.batch_alter_table('diet_streak', schema=None) as batch_op:
+        batch_op.drop_index('ix_diet_streak_length')
+        batch_op.drop_index('ix_diet_streak_left_datetime_left_meal_id')
+
+    op.drop_table('diet_streak')
+    op.drop_table('diet_metrics')
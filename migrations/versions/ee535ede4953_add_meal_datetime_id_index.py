@@ -0,0 +1,26 @@
+"""Add composite index on meal (meal_datetime, id) for keyset pagination.
+
+Revision ID: ee535ede4953
+Revises: bb0002ee7410
+Create Date: 2026-10-17 09:12:41.532118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ee535ede4953'
+down_revision = 'bb0002ee7410'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('meal', schema=None) as batch_op:
+        batch_op.create_index('ix_meal_meal_datetime_id', ['meal_datetime', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('meal', schema=None) as batch_op:
+        batch_op.drop_index('ix_meal_meal_datetime_id')
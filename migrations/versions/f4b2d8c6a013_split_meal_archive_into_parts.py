@@ -0,0 +1,69 @@
+"""Split meal_archive into parts (one gzip member per block of rows).
+
+Revision ID: f4b2d8c6a013
+Revises: e8a1c4f07b92
+Create Date: 2026-10-17 21:14:08.402617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b2d8c6a013'
+down_revision = 'e8a1c4f07b92'
+branch_labels = None
+depends_on = None
+
+
+def _create_meal_archive(with_part):
+    columns = [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('partition_name', sa.String(length=63), nullable=False),
+        sa.Column('range_start', sa.DateTime(), nullable=False),
+        sa.Column('range_end', sa.DateTime(), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    ]
+    if with_part:
+        columns.insert(2, sa.Column('part', sa.Integer(), nullable=False, server_default='0'))
+        columns.append(sa.UniqueConstraint('partition_name', 'part', name='uq_meal_archive_partition_name_part'))
+    else:
+        columns.append(sa.UniqueConstraint('partition_name'))
+    op.create_table('meal_archive', *columns)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        # O arquivamento só existe no PostgreSQL (partições mensais):
+        # nos outros bancos a tabela está sempre vazia e é recriada.
+        op.drop_table('meal_archive')
+        _create_meal_archive(with_part=True)
+        return
+
+    # Os meses já arquivados viram a parte 0 (um único membro gzip).
+    op.add_column('meal_archive', sa.Column('part', sa.Integer(), nullable=False, server_default='0'))
+    op.drop_constraint('meal_archive_partition_name_key', 'meal_archive', type_='unique')
+    op.create_unique_constraint('uq_meal_archive_partition_name_part', 'meal_archive', ['partition_name', 'part'])
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        op.drop_table('meal_archive')
+        _create_meal_archive(with_part=False)
+        return
+
+    # Membros gzip concatenados formam um gzip válido: cada mês volta a
+    # ser uma única linha, com as partes na ordem.
+    op.execute(
+        "UPDATE meal_archive a SET "
+        "data = (SELECT string_agg(p.data, ''::bytea ORDER BY p.part) FROM meal_archive p WHERE p.partition_name = a.partition_name), "
+        "row_count = (SELECT sum(p.row_count) FROM meal_archive p WHERE p.partition_name = a.partition_name) "
+        "WHERE a.part = 0"
+    )
+    op.execute('DELETE FROM meal_archive WHERE part > 0')
+    op.drop_constraint('uq_meal_archive_partition_name_part', 'meal_archive', type_='unique')
+    op.create_unique_constraint('meal_archive_partition_name_key', 'meal_archive', ['partition_name'])
+    op.drop_column('meal_archive', 'part')
@@ -1,12 +1,17 @@
 # run.py
+import os
+
 from app import create_app, db
-from app.models import Meal
+from app.models import Meal, User
+from app.commands import metrics_cli, meals_cli, users_cli
+from config import config_by_name
 
 # 1. Criação da Aplicação
 # -----------------------------------------------------------------
 # Chamamos nossa factory 'create_app' que está no app/__init__.py
 # A factory carrega a configuração, inicializa o db e os blueprints.
-app = create_app()
+# O perfil (development, production, testing) vem de FLASK_CONFIG.
+app = create_app(config_by_name[os.environ.get('FLASK_CONFIG', 'default')])
 
 # 2. Configuração do Contexto do Shell (Prática Sênior)
 # -----------------------------------------------------------------
@@ -24,10 +29,23 @@ def make_shell_context():
     """
     return {
         'db': db,
-        'Meal': Meal
+        'Meal': Meal,
+        'User': User
     }
 
-# 3. Ponto de Execução (Opcional, mas bom para clareza)
+# 3. Comandos de Linha de Comando
+# -----------------------------------------------------------------
+# Registra os grupos de comandos definidos em app/commands.py.
+# Ex: 'flask metrics rebuild' recalcula as métricas da dieta e
+# 'flask meals check-plans' confere os planos de execução da listagem,
+# 'flask meals import <arquivo> --user <nome>' importa um histórico em
+# CSV/NDJSON e 'flask users create <nome>' cadastra um usuário e mostra
+# o seu token.
+app.cli.add_command(metrics_cli)
+app.cli.add_command(meals_cli)
+app.cli.add_command(users_cli)
+
+# 4. Ponto de Execução (Opcional, mas bom para clareza)
 # -----------------------------------------------------------------
 # Este bloco 'if' permite rodar a aplicação diretamente com
 # 'python run.py', que é uma alternativa a 'flask run'.
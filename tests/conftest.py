@@ -0,0 +1,58 @@
+# tests/conftest.py
+"""
+Fixtures comuns dos testes: a aplicação no perfil 'testing' (SQLite em
+memória, sem cache, sem rate limit), a mesma aplicação com um SQLite em
+arquivo, um usuário com token e o cliente de teste do Flask.
+
+Uso:
+    python -m pytest -q
+"""
+import pytest
+
+from app import create_app, db, auth
+from config import TestingConfig
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """
+    Aplicação com um SQLite em arquivo, e não 'sqlite://': para os testes
+    que precisam de conexões (e transações) diferentes. Sem janela de
+    acomodação na sincronização.
+    """
+    class FileTestingConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+        MEALS_SYNC_SETTLE_SECONDS = 0
+
+    app = create_app(FileTestingConfig)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app):
+    """
+    Retorna (user_id, headers) de um usuário novo, com o cabeçalho
+    'Authorization' pronto.
+    """
+    user, token = auth.create_user(db.session, 'teste')
+    db.session.commit()
+    return user.id, {'Authorization': f'Bearer {token}'}
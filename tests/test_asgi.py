@@ -0,0 +1,76 @@
+# tests/test_asgi.py
+"""
+O modo ASGI (app/asgi.py) serve o mesmo contrato do WSGI. Pulado se
+as dependências opcionais não estiverem instaladas
+(pip install -r requirements-asgi.txt).
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip('quart')
+pytest.importorskip('aiosqlite')
+
+from app import create_app, db, auth  # noqa: E402
+from app.asgi import create_asgi_app  # noqa: E402
+from config import TestingConfig  # noqa: E402
+
+
+@pytest.fixture
+def asgi_config(tmp_path):
+    # Um arquivo, e não 'sqlite://': no pool assíncrono, cada conexão
+    # em memória seria um banco diferente.
+    class AsgiTestingConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "asgi.db"}'
+    return AsgiTestingConfig
+
+
+@pytest.fixture
+def headers(asgi_config):
+    # As tabelas e o usuário são criados pelo modo WSGI (mesmo banco).
+    app = create_app(asgi_config)
+    with app.app_context():
+        db.create_all()
+        _, token = auth.create_user(db.session, 'asgi')
+        db.session.commit()
+        db.engine.dispose()
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_create_list_and_conditional_get(asgi_config, headers):
+    async def scenario():
+        app = create_asgi_app(asgi_config)
+        client = app.test_client()
+        created = await client.post('/api/v1/meals', headers=headers, json={
+            'name': 'Almoço', 'meal_datetime': '2024-05-01T12:00:00', 'is_on_diet': True
+        })
+        assert created.status_code == 201
+        meal = (await created.get_json())['meal']
+
+        page = await client.get('/api/v1/meals', headers=headers)
+        assert page.status_code == 200
+        assert [item['id'] for item in (await page.get_json())['meals']] == [meal['id']]
+
+        again = await client.get('/api/v1/meals', headers={**headers, 'If-None-Match': page.headers['ETag']})
+        assert again.status_code == 304
+
+        invalid = await client.post('/api/v1/meals', headers=headers, json={
+            'name': 'x' * 101, 'meal_datetime': '2024-05-01T12:00:00', 'is_on_diet': True
+        })
+        assert invalid.status_code == 400
+        await app.extensions['async_engine'].dispose()
+
+    asyncio.run(scenario())
+
+
+def test_import_is_wsgi_only(asgi_config, headers):
+    async def scenario():
+        app = create_asgi_app(asgi_config)
+        response = await app.test_client().post(
+            '/api/v1/meals/import', headers={**headers, 'Content-Type': 'text/csv'},
+            data='name,description,meal_datetime,is_on_diet\n'
+        )
+        assert response.status_code in (404, 405)
+        await app.extensions['async_engine'].dispose()
+
+    asyncio.run(scenario())
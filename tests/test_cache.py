@@ -0,0 +1,63 @@
+# tests/test_cache.py
+"""
+Cache de leitura (app/cache.py): a chave é tirada antes da leitura no
+banco, e uma escrita confirmada no meio do caminho nunca deixa uma
+resposta velha servida como atual.
+"""
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app import create_app, db, cache, auth
+from config import TestingConfig
+
+
+class MemoryCacheConfig(TestingConfig):
+    CACHE_BACKEND = 'memory'
+
+
+@pytest.fixture
+def app():
+    app = create_app(MemoryCacheConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def headers(app):
+    _, token = auth.create_user(db.session, 'teste')
+    db.session.commit()
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.mark.parametrize('key_for', [
+    lambda user_id: cache.page_key(user_id, MultiDict({'limit': '10'})),
+    lambda user_id: cache.meal_key(user_id, 1),
+])
+def test_store_after_a_concurrent_write_goes_to_a_dead_key(app, key_for):
+    # A rota tira a chave e lê o banco; uma escrita confirma no meio.
+    key = key_for(1)
+    cache.invalidate(meals=[(1, 1)])
+    cache.set(key, 'resposta velha')
+
+    assert cache.get(key_for(1)) is None
+    # As entradas dos outros usuários continuam valendo.
+    other = key_for(2)
+    cache.set(other, 'resposta')
+    cache.invalidate(user_ids=[1])
+    assert cache.get(key_for(2)) == 'resposta'
+
+
+def test_write_through_the_api_invalidates_the_cached_meal(client, headers):
+    client.post('/api/v1/meals', headers=headers, json={
+        'name': 'Almoço', 'description': 'Arroz e feijão', 'meal_datetime': '2024-05-01T12:00:00', 'is_on_diet': True
+    })
+    first = client.get('/api/v1/meals/1', headers=headers)
+    assert client.get('/api/v1/meals/1', headers=headers).get_json() == first.get_json()
+    assert cache.stats()['hits'] == 1
+
+    response = client.patch('/api/v1/meals/1', headers={**headers, 'If-Match': first.headers['ETag']}, json={'name': 'Jantar'})
+    assert response.status_code == 200
+    assert client.get('/api/v1/meals/1', headers=headers).get_json()['meal']['name'] == 'Jantar'
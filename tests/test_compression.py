@@ -0,0 +1,70 @@
+# tests/test_compression.py
+"""
+Compressão negociada (app/compression.py): cada codificação tem o seu
+próprio ETag forte, e os cabeçalhos condicionais continuam funcionando.
+"""
+import gzip
+
+import pytest
+
+
+@pytest.fixture
+def meals(client, user):
+    _, headers = user
+    for index in range(20):
+        response = client.post('/api/v1/meals', headers=headers, json={
+            'name': f'Refeição {index}', 'description': 'Arroz, feijão e salada',
+            'meal_datetime': f'2024-05-{index + 1:02d}T12:00:00', 'is_on_diet': index % 2 == 0
+        })
+        assert response.status_code == 201
+    return headers
+
+
+def test_each_encoding_has_its_own_strong_etag(client, meals):
+    identity = client.get('/api/v1/meals', headers={**meals, 'Accept-Encoding': 'identity'})
+    compressed = client.get('/api/v1/meals', headers={**meals, 'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in identity.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == identity.data
+    identity_etag, identity_weak = identity.get_etag()
+    compressed_etag, compressed_weak = compressed.get_etag()
+    assert not identity_weak and not compressed_weak
+    assert compressed_etag == f'{identity_etag}-gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+
+
+def test_not_modified_returns_the_etag_the_client_has(client, meals):
+    compressed = client.get('/api/v1/meals', headers={**meals, 'Accept-Encoding': 'gzip'})
+    etag = compressed.headers['ETag']
+
+    again = client.get('/api/v1/meals', headers={**meals, 'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+
+
+def test_if_match_accepts_the_etag_of_a_compressed_body(client, meals):
+    meal = client.get('/api/v1/meals/1', headers=meals)
+    etag, _ = meal.get_etag()
+    response = client.patch('/api/v1/meals/1', headers={**meals, 'If-Match': f'"{etag}-gzip"'}, json={'name': 'Almoço'})
+    assert response.status_code == 200
+    stale = client.patch('/api/v1/meals/1', headers={**meals, 'If-Match': f'"{etag}-br"'}, json={'name': 'Jantar'})
+    assert stale.status_code == 412
+
+
+def test_compressed_body_is_reused_without_a_response_cache(app, client, meals):
+    # O perfil de testes usa CACHE_BACKEND='null': o reaproveitamento
+    # não depende do cache de leitura.
+    bodies = app.extensions['compression'].bodies
+    first = client.get('/api/v1/meals', headers={**meals, 'Accept-Encoding': 'gzip'})
+    second = client.get('/api/v1/meals', headers={**meals, 'Accept-Encoding': 'gzip'})
+    assert second.data == first.data
+    assert bodies.hits == 1
+
+    # Uma escrita muda o ETag, e o corpo antigo não é mais usado.
+    client.post('/api/v1/meals', headers=meals, json={
+        'name': 'Ceia', 'description': 'Iogurte', 'meal_datetime': '2024-06-01T21:00:00', 'is_on_diet': True
+    })
+    third = client.get('/api/v1/meals', headers={**meals, 'Accept-Encoding': 'gzip'})
+    assert third.headers['ETag'] != first.headers['ETag']
+    assert bodies.hits == 1
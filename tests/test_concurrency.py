@@ -0,0 +1,134 @@
+# tests/test_concurrency.py
+"""
+Concorrência otimista nas escritas de refeições (If-Match/ETag, ver
+app/conditional.py e queries.update_meal).
+"""
+import pytest
+
+from app import db, diet_metrics
+from app.models import Meal
+
+MEAL = {'name': 'Almoço', 'description': 'Arroz e feijão', 'meal_datetime': '2024-05-01T12:00:00', 'is_on_diet': True}
+
+
+@pytest.fixture
+def meal(client, user):
+    """
+    Retorna (headers, meal_id, etag) de uma refeição recém-criada.
+    """
+    _, headers = user
+    response = client.post('/api/v1/meals', headers=headers, json=MEAL)
+    assert response.status_code == 201
+    return headers, response.get_json()['meal']['id'], response.headers['ETag']
+
+
+@pytest.fixture
+def moves(monkeypatch):
+    """
+    Registra as chamadas a diet_metrics.record_updated (as edições que
+    movem a refeição nas métricas).
+    """
+    calls = []
+    record_updated = diet_metrics.record_updated
+
+    def spy(user_id, old_position, new_position, session=None):
+        calls.append((old_position, new_position))
+        return record_updated(user_id, old_position, new_position, session=session)
+
+    monkeypatch.setattr(diet_metrics, 'record_updated', spy)
+    return calls
+
+
+def test_stale_if_match_is_rejected(client, meal):
+    headers, meal_id, etag = meal
+    first = client.patch(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etag}, json={'name': 'Jantar'})
+    assert first.status_code == 200
+    assert first.headers['ETag'] != etag
+
+    # Segunda escrita com o ETag antigo: 412 e nada gravado.
+    stale = client.put(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etag}, json={**MEAL, 'name': 'Ceia'})
+    assert stale.status_code == 412
+    assert client.delete(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etag}).status_code == 412
+    assert db.session.get(Meal, meal_id).name == 'Jantar'
+
+
+def test_missing_if_match_is_required(client, meal):
+    headers, meal_id, _ = meal
+    assert client.put(f'/api/v1/meals/{meal_id}', headers=headers, json=MEAL).status_code == 428
+    assert client.patch(f'/api/v1/meals/{meal_id}', headers=headers, json={'name': 'Ceia'}).status_code == 428
+    assert client.delete(f'/api/v1/meals/{meal_id}', headers=headers).status_code == 428
+
+
+def test_etag_of_another_meal_does_not_match(client, meal):
+    headers, meal_id, etag = meal
+    other = client.post('/api/v1/meals', headers=headers, json=MEAL).get_json()['meal']['id']
+    response = client.patch(f'/api/v1/meals/{other}', headers={**headers, 'If-Match': etag}, json={'name': 'Ceia'})
+    assert response.status_code == 412
+
+
+def test_star_matches_any_version(client, meal):
+    headers, meal_id, etag = meal
+    client.patch(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etag}, json={'name': 'Jantar'})
+    response = client.patch(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': '*'}, json={'name': 'Ceia'})
+    assert response.status_code == 200
+    assert response.get_json()['meal']['name'] == 'Ceia'
+
+    # '*' ainda exige que a refeição exista.
+    missing = client.patch('/api/v1/meals/999', headers={**headers, 'If-Match': '*'}, json={'name': 'Ceia'})
+    assert missing.status_code == 412
+    assert client.delete(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': '*'}).status_code == 204
+
+
+def test_each_write_bumps_the_version(client, meal):
+    headers, meal_id, etag = meal
+    assert etag == f'"{meal_id}-1"'
+    for version in (2, 3):
+        response = client.patch(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etag}, json={'name': f'v{version}'})
+        etag = response.headers['ETag']
+        assert etag == f'"{meal_id}-{version}"'
+    assert db.session.get(Meal, meal_id).version == 3
+    assert client.get(f'/api/v1/meals/{meal_id}', headers=headers).headers['ETag'] == etag
+
+
+def test_patch_writes_only_the_sent_fields(client, meal, moves):
+    headers, meal_id, etag = meal
+    response = client.patch(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etag}, json={'description': 'Salada'})
+    assert response.status_code == 200
+    body = response.get_json()['meal']
+    assert body['description'] == 'Salada'
+    assert body['name'] == MEAL['name']
+    assert body['is_on_diet'] is True
+    assert body['meal_datetime'].startswith('2024-05-01T12:00:00')
+    # Nem data nem dieta mudaram: as métricas não são tocadas.
+    assert moves == []
+    assert diet_metrics.verify() == []
+
+
+def test_position_changes_move_the_metrics(client, meal, moves):
+    headers, meal_id, etag = meal
+    response = client.patch(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etag}, json={'is_on_diet': False})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    response = client.put(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etag},
+                          json={**MEAL, 'meal_datetime': '2024-04-01T08:00:00', 'is_on_diet': False})
+    assert response.status_code == 200
+
+    assert len(moves) == 2
+    (old, new), (older, newer) = moves
+    assert (old[2], new[2]) == (True, False)
+    assert older[0] > newer[0]
+
+    metrics = client.get('/api/v1/metrics', headers=headers).get_json()['metrics']
+    assert metrics['on_diet_meals'] == 0
+    assert metrics['off_diet_meals'] == 1
+    assert diet_metrics.verify() == []
+
+
+def test_rejected_write_leaves_metrics_untouched(client, meal, moves):
+    headers, meal_id, etag = meal
+    client.patch(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etag}, json={'name': 'Jantar'})
+    response = client.patch(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etag}, json={'is_on_diet': False})
+    assert response.status_code == 412
+    assert moves == []
+    assert client.get('/api/v1/metrics', headers=headers).get_json()['metrics']['on_diet_meals'] == 1
+    assert diet_metrics.verify() == []
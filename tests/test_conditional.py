@@ -0,0 +1,73 @@
+# tests/test_conditional.py
+"""
+Requisições condicionais da listagem (app/conditional.py): o ETag de
+cada página vem das próprias linhas, sem agregado sobre todas as
+refeições do usuário.
+"""
+import pytest
+from sqlalchemy import event
+
+from app import db
+
+
+@pytest.fixture
+def meals(client, user):
+    _, headers = user
+    for index in range(5):
+        response = client.post('/api/v1/meals', headers=headers, json={
+            'name': f'Refeição {index}', 'description': 'Arroz e feijão',
+            'meal_datetime': f'2024-05-{index + 1:02d}T12:00:00', 'is_on_diet': True
+        })
+        assert response.status_code == 201
+    return headers
+
+
+@pytest.fixture
+def statements(app):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append(statement.lower())
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    yield captured
+    event.remove(db.engine, 'before_cursor_execute', capture)
+
+
+def test_listing_reads_only_the_page(client, meals, statements):
+    response = client.get('/api/v1/meals?limit=2', headers=meals)
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert not [statement for statement in statements if 'count(' in statement or 'max(' in statement]
+
+
+def test_page_etag_follows_the_rows_of_the_page(client, meals):
+    first = client.get('/api/v1/meals?limit=2', headers=meals)
+    etag = first.headers['ETag']
+    conditional = {**meals, 'If-None-Match': etag}
+    assert client.get('/api/v1/meals?limit=2', headers=conditional).status_code == 304
+
+    # Editar uma refeição fora da página (a mais antiga) não a muda.
+    oldest = client.get('/api/v1/meals/1', headers=meals)
+    response = client.patch('/api/v1/meals/1', headers={**meals, 'If-Match': oldest.headers['ETag']}, json={'name': 'Café'})
+    assert response.status_code == 200
+    assert client.get('/api/v1/meals?limit=2', headers=conditional).status_code == 304
+
+    # Editar uma refeição da página muda o ETag.
+    newest = client.get('/api/v1/meals/5', headers=meals)
+    response = client.patch('/api/v1/meals/5', headers={**meals, 'If-Match': newest.headers['ETag']}, json={'name': 'Ceia'})
+    assert response.status_code == 200
+    edited = client.get('/api/v1/meals?limit=2', headers=conditional)
+    assert edited.status_code == 200
+    assert edited.headers['ETag'] != etag
+
+    # Remover uma linha da página também.
+    conditional = {**meals, 'If-None-Match': edited.headers['ETag']}
+    assert client.delete('/api/v1/meals/4', headers={**meals, 'If-Match': '*'}).status_code == 204
+    assert client.get('/api/v1/meals?limit=2', headers=conditional).status_code == 200
+
+
+def test_if_modified_since_is_ignored_for_listings(client, meals):
+    response = client.get('/api/v1/meals', headers={**meals, 'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 200
+    assert 'Last-Modified' not in response.headers
@@ -0,0 +1,71 @@
+# tests/test_diet_metrics.py
+"""
+Manutenção incremental das métricas (app/diet_metrics.py): sequências
+aleatórias de criações, edições e remoções precisam terminar no mesmo
+estado de uma varredura completa.
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db, auth, diet_metrics
+
+START = datetime(2024, 5, 1, 8, 0)
+
+
+def _random_meal(rng):
+    # Poucos horários possíveis: força empates de data (desempate pelo id)
+    # e inserções no meio de sequências já existentes.
+    meal_datetime = START + timedelta(hours=6 * rng.randrange(12))
+    return {
+        'name': 'Refeição', 'description': 'Gerada no teste',
+        'meal_datetime': meal_datetime.isoformat(), 'is_on_diet': rng.random() < 0.7
+    }
+
+
+def _random_patch(rng):
+    meal = _random_meal(rng)
+    fields = rng.choice([['is_on_diet'], ['meal_datetime'], ['meal_datetime', 'is_on_diet'], ['name']])
+    return {field: meal[field] for field in fields}
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_random_writes_match_a_full_scan(client, seed):
+    rng = random.Random(seed)
+    users = []
+    for index in range(2):
+        _, token = auth.create_user(db.session, f'usuario-{index}')
+        db.session.commit()
+        users.append(({'Authorization': f'Bearer {token}'}, {}))
+
+    for step in range(60):
+        headers, etags = rng.choice(users)
+        action = rng.random()
+        if not etags or action < 0.45:
+            response = client.post('/api/v1/meals', headers=headers, json=_random_meal(rng))
+            assert response.status_code == 201
+            etags[response.get_json()['meal']['id']] = response.headers['ETag']
+        elif action < 0.65:
+            meal_id = rng.choice(sorted(etags))
+            response = client.put(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etags[meal_id]},
+                                  json=_random_meal(rng))
+            assert response.status_code == 200
+            etags[meal_id] = response.headers['ETag']
+        elif action < 0.85:
+            meal_id = rng.choice(sorted(etags))
+            response = client.patch(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etags[meal_id]},
+                                    json=_random_patch(rng))
+            assert response.status_code == 200
+            etags[meal_id] = response.headers['ETag']
+        else:
+            meal_id = rng.choice(sorted(etags))
+            response = client.delete(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': etags.pop(meal_id)})
+            assert response.status_code == 204
+        assert diet_metrics.verify() == [], f'semente {seed}, passo {step}'
+
+    # As métricas servidas são as mesmas depois de uma reconstrução total.
+    served = [client.get('/api/v1/metrics', headers=headers).get_json()['metrics'] for headers, _ in users]
+    diet_metrics.rebuild()
+    db.session.commit()
+    assert [client.get('/api/v1/metrics', headers=headers).get_json()['metrics'] for headers, _ in users] == served
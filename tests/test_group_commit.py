@@ -0,0 +1,56 @@
+# tests/test_group_commit.py
+"""
+Group commit (app/group_commit.py): uma requisição nunca espera o
+escritor sem prazo, e um escritor que morre não prende ninguém.
+"""
+import threading
+
+import pytest
+
+from app import db
+from app.errors import InvalidAPIUsage
+from app.group_commit import GroupCommitWriter, WriterStopped
+
+
+@pytest.fixture
+def writer(app):
+    return GroupCommitWriter(app, db, max_batch=8, window_seconds=0, timeout_seconds=0.2)
+
+
+def test_stalled_writer_answers_503_and_skips_cancelled_writes(writer):
+    release = threading.Event()
+    applied = []
+
+    def stall(session, user_id):
+        release.wait(5)
+        return 'lenta'
+
+    def record(session, user_id):
+        applied.append(user_id)
+        return 'rápida'
+
+    # A primeira escrita trava o escritor; a segunda fica na fila.
+    with pytest.raises(InvalidAPIUsage) as stalled:
+        writer.submit(1, stall)
+    with pytest.raises(InvalidAPIUsage) as queued:
+        writer.submit(2, record)
+    assert stalled.value.status_code == queued.value.status_code == 503
+    assert writer.stats()['timeouts'] == 2
+
+    # Destravado, o escritor pula a escrita cancelada e segue normalmente.
+    release.set()
+    assert writer.submit(3, record) == 'rápida'
+    assert applied == [3]
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_unexpected_error_fails_the_batch_and_restarts_the_writer(writer):
+    def broken(session, user_id):
+        raise RuntimeError('bug')
+
+    with pytest.raises(WriterStopped):
+        writer.submit(1, broken)
+    writer._thread.join(1)
+    assert not writer._thread.is_alive()
+
+    assert writer.submit(2, lambda session, user_id: user_id) == 2
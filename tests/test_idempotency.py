@@ -0,0 +1,112 @@
+# tests/test_idempotency.py
+"""
+Criações com 'Idempotency-Key' (app/idempotency.py): retries recebem a
+resposta gravada sem criar outra refeição.
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app import db, auth, idempotency
+from app.models import IdempotencyKey, Meal
+
+MEAL = {'name': 'Almoço', 'description': 'Arroz e feijão', 'meal_datetime': '2024-05-01T12:00:00', 'is_on_diet': True}
+
+
+@pytest.fixture
+def headers(app, user):
+    # Sem o expurgo em segundo plano: ele usaria outra thread no mesmo
+    # banco em memória.
+    app.config['IDEMPOTENCY_PURGE_INTERVAL_SECONDS'] = 0
+    _, headers = user
+    return {**headers, idempotency.HEADER: 'b7f0c6d2-criacao-1'}
+
+
+def _meal_count():
+    return db.session.execute(select(func.count()).select_from(Meal)).scalar()
+
+
+def test_retry_replays_the_first_response(client, headers):
+    first = client.post('/api/v1/meals', headers=headers, json=MEAL)
+    assert first.status_code == 201
+    assert idempotency.REPLAYED_MARKER not in first.headers
+
+    retry = client.post('/api/v1/meals', headers=headers, json=MEAL)
+    assert retry.status_code == 201
+    assert retry.get_json() == first.get_json()
+    assert retry.headers[idempotency.REPLAYED_MARKER] == 'true'
+    assert retry.headers['ETag'] == first.headers['ETag']
+    assert _meal_count() == 1
+
+
+def test_batch_retry_replays_the_first_response(client, headers):
+    items = [MEAL, {**MEAL, 'name': ''}]
+    first = client.post('/api/v1/meals/batch', headers=headers, json=items)
+    assert first.status_code == 207
+    retry = client.post('/api/v1/meals/batch', headers=headers, json=items)
+    assert retry.status_code == 207
+    assert retry.get_json() == first.get_json()
+    assert retry.headers[idempotency.REPLAYED_MARKER] == 'true'
+    assert _meal_count() == 1
+
+
+def test_key_reused_with_another_request_is_rejected(client, headers):
+    assert client.post('/api/v1/meals', headers=headers, json=MEAL).status_code == 201
+
+    other_body = client.post('/api/v1/meals', headers=headers, json={**MEAL, 'name': 'Jantar'})
+    assert other_body.status_code == 422
+    other_route = client.post('/api/v1/meals/batch', headers=headers, json=[MEAL])
+    assert other_route.status_code == 422
+    assert _meal_count() == 1
+
+
+def test_keys_are_per_user(client, headers):
+    _, token = auth.create_user(db.session, 'outro')
+    db.session.commit()
+    assert client.post('/api/v1/meals', headers=headers, json=MEAL).status_code == 201
+
+    other = {**headers, 'Authorization': f'Bearer {token}'}
+    response = client.post('/api/v1/meals', headers=other, json={**MEAL, 'name': 'Jantar'})
+    assert response.status_code == 201
+    assert idempotency.REPLAYED_MARKER not in response.headers
+    assert _meal_count() == 2
+
+
+def test_expired_key_can_be_reused(client, headers):
+    first = client.post('/api/v1/meals', headers=headers, json=MEAL)
+    db.session.execute(update(IdempotencyKey).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+    # A chave vencida não é reenviada nem conferida: vale como nova.
+    second = client.post('/api/v1/meals', headers=headers, json={**MEAL, 'name': 'Jantar'})
+    assert second.status_code == 201
+    assert idempotency.REPLAYED_MARKER not in second.headers
+    assert second.get_json()['meal']['id'] != first.get_json()['meal']['id']
+    assert _meal_count() == 2
+
+    # E a nova reserva substitui a vencida.
+    row = db.session.execute(select(IdempotencyKey)).scalar_one()
+    assert row.expires_at > datetime.utcnow()
+    assert json.loads(row.response_body)['meal']['name'] == 'Jantar'
+
+
+@pytest.mark.parametrize('key', ['', '   ', 'x' * (idempotency.MAX_KEY_LENGTH + 1), 'chave-ção'])
+def test_malformed_key_is_rejected(client, headers, key):
+    response = client.post('/api/v1/meals', headers={**headers, idempotency.HEADER: key}, json=MEAL)
+    assert response.status_code == 400
+    assert _meal_count() == 0
+
+
+def test_purge_removes_only_expired_keys(client, headers):
+    client.post('/api/v1/meals', headers=headers, json=MEAL)
+    client.post('/api/v1/meals', headers={**headers, idempotency.HEADER: 'b7f0c6d2-criacao-2'}, json=MEAL)
+    db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == 'b7f0c6d2-criacao-1')
+        .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    assert idempotency.purge_expired(db.session, batch_size=10) == 1
+    db.session.commit()
+    assert db.session.execute(select(IdempotencyKey.key)).scalars().all() == ['b7f0c6d2-criacao-2']
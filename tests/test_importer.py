@@ -0,0 +1,100 @@
+# tests/test_importer.py
+"""
+Importação em massa (app/importer.py) e a sua interação com a
+sincronização incremental (GET /meals/changes).
+"""
+import threading
+from datetime import datetime, timedelta
+
+from app import db, auth, importer, sync
+from app.models import Meal
+
+
+def _meal(index):
+    return {'name': f'Refeição {index}', 'meal_datetime': f'2024-05-{index + 1:02d}T12:00:00', 'is_on_diet': True}
+
+
+def test_sync_during_import_receives_every_imported_meal(file_app):
+    with file_app.app_context():
+        user, token = auth.create_user(db.session, 'importador')
+        db.session.commit()
+        user_id = user.id
+    headers = {'Authorization': f'Bearer {token}'}
+
+    first_chunk_written = threading.Event()
+    resume = threading.Event()
+
+    def items():
+        # O primeiro bloco (2 linhas) já está no banco, sem commit,
+        # quando a terceira linha é pedida: a importação para aí até o
+        # cliente sincronizar.
+        for index in range(4):
+            if index == 2:
+                first_chunk_written.set()
+                assert resume.wait(10)
+            yield index + 1, _meal(index)
+
+    errors = []
+
+    def run_import():
+        try:
+            with file_app.app_context(), sync.sync_barrier(db.engine, 60, user_id) as stamp:
+                importer.import_meals(db.session, user_id, items(), 2, lambda line, message: None, stamp)
+                db.session.commit()
+        except Exception as e:  # noqa: BLE001 - reportado pelo teste
+            errors.append(e)
+            first_chunk_written.set()
+
+    thread = threading.Thread(target=run_import)
+    thread.start()
+    client = file_app.test_client()
+    try:
+        assert first_chunk_written.wait(10)
+        during = client.get('/api/v1/meals/changes', headers=headers).get_json()
+        assert during['changes'] == []
+    finally:
+        resume.set()
+        thread.join(10)
+    assert not errors, errors
+
+    after = client.get('/api/v1/meals/changes', headers=headers, query_string={'since': during['next_token']}).get_json()
+    assert sorted(change['meal']['name'] for change in after['changes']) == [f'Refeição {index}' for index in range(4)]
+
+
+def test_import_rejects_invalid_rows_with_their_line(app, user):
+    user_id, _ = user
+    rejected_rows = []
+    lines = [
+        'name,description,meal_datetime,is_on_diet\n',
+        'Almoço,,2024-05-01T12:00:00,true\n',
+        f'{"x" * 101},,2024-05-01T12:00:00,true\n',
+        'Jantar,Sopa,ontem,false\n',
+        'Lanche,Fruta,2024-05-01T16:00:00,talvez\n',
+    ]
+    imported, rejected = importer.import_meals(
+        db.session, user_id, importer.iter_items(lines, 'csv', None), 2,
+        lambda line, message: rejected_rows.append(line), datetime(2024, 6, 1)
+    )
+    db.session.commit()
+    assert (imported, rejected) == (1, 3)
+    assert rejected_rows == [3, 4, 5]
+
+
+def test_imported_rows_carry_the_barrier_instant(app, user):
+    user_id, _ = user
+    items = ((index + 1, _meal(index)) for index in range(3))
+    with sync.sync_barrier(db.engine, 60, user_id) as stamp:
+        assert db.session.execute(sync.barrier_statement(user_id)).scalar() == stamp
+        # Outros usuários também esperam só as barreiras globais.
+        assert db.session.execute(sync.barrier_statement(user_id + 1)).scalar() is None
+        importer.import_meals(db.session, user_id, items, 2, lambda line, message: None, stamp)
+        db.session.commit()
+    assert db.session.execute(sync.barrier_statement(user_id)).scalar() is None
+    stamps = db.session.execute(db.select(Meal.created_at, Meal.updated_at)).all()
+    assert stamps == [(stamp, stamp)] * 3
+
+
+def test_horizon_stays_before_an_open_barrier():
+    started_at = datetime.utcnow() - timedelta(minutes=5)
+    assert sync.sync_horizon(2, started_at) < started_at
+    assert sync.sync_horizon(2) > started_at
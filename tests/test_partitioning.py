@@ -0,0 +1,145 @@
+# tests/test_partitioning.py
+"""
+Arquivamento das partições mensais (app/partitioning.py): as partes
+gzip, a ordem das transações (cópia antes do DETACH), o que acontece
+quando o mês muda no meio ou o lock não vem, e as lápides que ele deixa
+para a sincronização. O particionamento só existe no PostgreSQL: aqui,
+no SQLite, a partição é uma tabela comum e o DETACH é simulado.
+"""
+import gzip
+import json
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import db, auth, partitioning, sync
+from app.models import Meal, MealArchive, MealTombstone, SyncBarrier
+
+PARTITION = 'meal_y2020m01'
+
+
+def _rows(count):
+    return iter([
+        {'id': index, 'user_id': 1 + index % 3, 'name': f'Refeição {index}', 'meal_datetime': datetime(2020, 1, 1, 12)}
+        for index in range(count)
+    ])
+
+
+def test_archive_is_split_into_gzip_parts(app):
+    user_ids = set()
+    connection = db.session.connection()
+    total = partitioning._archive_to_table(connection, 'meal_y2020m01', date(2020, 1, 1), _rows(25), user_ids, 10)
+
+    parts = db.session.execute(
+        db.select(MealArchive).where(MealArchive.partition_name == 'meal_y2020m01').order_by(MealArchive.part)
+    ).scalars().all()
+    assert total == 25
+    assert [(part.part, part.row_count) for part in parts] == [(0, 10), (1, 10), (2, 5)]
+    assert user_ids == {1, 2, 3}
+    # Membros gzip concatenados: um único .ndjson.gz com o mês inteiro.
+    lines = gzip.decompress(b''.join(part.data for part in parts)).decode('utf-8').splitlines()
+    assert [json.loads(line)['id'] for line in lines] == list(range(25))
+
+
+def test_empty_month_still_records_part_zero(app):
+    partitioning._archive_to_table(db.session.connection(), 'meal_y2020m02', date(2020, 2, 1), _rows(0), set(), 10)
+    parts = db.session.execute(db.select(MealArchive.part, MealArchive.row_count)).all()
+    assert [tuple(part) for part in parts] == [(0, 0)]
+
+
+@pytest.fixture
+def old_month(file_app, monkeypatch):
+    """
+    Um usuário com 3 refeições de janeiro de 2020 e a "partição" desse
+    mês. Retorna (headers, token de sincronização anterior ao arquivamento).
+    """
+    with file_app.app_context():
+        _, api_token = auth.create_user(db.session, 'antigo')
+        db.session.commit()
+    headers = {'Authorization': f'Bearer {api_token}'}
+    client = file_app.test_client()
+    for day in (1, 2, 3):
+        response = client.post('/api/v1/meals', headers=headers, json={
+            'name': 'Antiga', 'meal_datetime': f'2020-01-0{day}T12:00:00', 'is_on_diet': True
+        })
+        assert response.status_code == 201
+    token = client.get('/api/v1/meals/changes', headers=headers).get_json()['next_token']
+
+    with file_app.app_context():
+        db.session.execute(text(f'CREATE TABLE {PARTITION} AS SELECT * FROM meal'))
+        db.session.commit()
+    monkeypatch.setattr(partitioning, '_require_monthly', lambda connection: None)
+    monkeypatch.setattr(partitioning, 'monthly_partitions', lambda connection: [(date(2020, 1, 1), PARTITION)])
+    return headers, token
+
+
+def _archive(directory=None):
+    return partitioning.archive_partitions(db.engine, 1, directory, part_rows=2, today=date(2024, 1, 1))
+
+
+def test_copy_is_committed_before_the_short_detach(file_app, old_month, monkeypatch):
+    headers, token = old_month
+    seen = {}
+
+    def detach(connection, name, lock_timeout_ms):
+        # Vista de outra conexão: a cópia já foi confirmada, e a barreira
+        # da sincronização está de pé.
+        with db.engine.connect() as other:
+            seen['parts'] = other.execute(db.select(db.func.count()).select_from(MealArchive)).scalar()
+            seen['barriers'] = other.execute(db.select(db.func.count()).select_from(SyncBarrier)).scalar()
+        # O que o DETACH faz: as linhas saem da tabela-mãe.
+        connection.execute(text(f'DELETE FROM meal WHERE id IN (SELECT id FROM {name})'))
+
+    monkeypatch.setattr(partitioning, '_detach', detach)
+    with file_app.app_context():
+        archived, skipped, user_ids = _archive()
+        assert (archived, skipped, user_ids) == ([(PARTITION, 3)], [], {1})
+        assert seen == {'parts': 2, 'barriers': 1}
+        assert db.session.execute(db.select(db.func.count()).select_from(SyncBarrier)).scalar() == 0
+        assert db.session.execute(text(f"SELECT count(*) FROM sqlite_master WHERE name = '{PARTITION}'")).scalar() == 0
+        assert db.session.execute(db.select(db.func.count()).select_from(Meal)).scalar() == 0
+
+    changes = file_app.test_client().get(
+        '/api/v1/meals/changes', headers=headers, query_string={'since': token}
+    ).get_json()['changes']
+    assert sorted(change['id'] for change in changes if change['op'] == 'delete') == [1, 2, 3]
+
+
+def _assert_postponed(file_app, path=None):
+    with file_app.app_context():
+        # Nada mudou: a partição continua lá, sem cópia, lápides nem barreira.
+        assert db.session.execute(text(f'SELECT count(*) FROM {PARTITION}')).scalar() == 3
+        assert db.session.execute(db.select(db.func.count()).select_from(Meal)).scalar() == 3
+        for model in (MealArchive, MealTombstone, SyncBarrier):
+            assert db.session.execute(db.select(db.func.count()).select_from(model)).scalar() == 0
+    if path:
+        assert not os.path.exists(path)
+
+
+def test_month_changed_during_the_copy_is_postponed(file_app, old_month, monkeypatch):
+    def detach(connection, name, lock_timeout_ms):
+        # Uma edição tardia chegou entre a cópia e o DETACH.
+        connection.execute(text(f'DELETE FROM meal WHERE id IN (SELECT id FROM {name})'))
+        connection.execute(text(f'UPDATE {name} SET version = version + 1 WHERE id = 2'))
+
+    monkeypatch.setattr(partitioning, '_detach', detach)
+    with file_app.app_context():
+        archived, skipped, user_ids = _archive()
+    assert archived == [] and user_ids == set()
+    assert skipped == [(PARTITION, 'alterada durante a cópia')]
+    _assert_postponed(file_app)
+
+
+def test_lock_timeout_postpones_the_month_and_removes_the_file(file_app, old_month, monkeypatch, tmp_path):
+    def detach(connection, name, lock_timeout_ms):
+        raise OperationalError('ALTER TABLE meal DETACH PARTITION', {}, Exception('lock timeout'))
+
+    monkeypatch.setattr(partitioning, '_detach', detach)
+    with file_app.app_context():
+        archived, skipped, _ = _archive(str(tmp_path))
+    assert archived == []
+    assert [name for name, _ in skipped] == [PARTITION]
+    _assert_postponed(file_app, tmp_path / f'{PARTITION}.ndjson.gz')
@@ -0,0 +1,38 @@
+# tests/test_query_plans.py
+"""
+Os filtros do GET /meals devem continuar usando índices (a mesma
+verificação do 'flask meals check-plans', com o EXPLAIN do SQLite).
+"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import db, filters, queries
+from app.models import MEAL_FIELDS
+
+
+def _listing_statement(conditions, cursor=None):
+    statement, _ = queries.meals_page_statement(filters.PLAN_CHECK_USER_ID, MEAL_FIELDS, cursor, 50, conditions)
+    return statement
+
+
+def test_listing_filters_are_index_backed(app):
+    problems = filters.find_sequential_scans(db.session, _listing_statement)
+    assert problems == [], problems
+
+
+def test_listing_filters_with_cursor_are_index_backed(app):
+    cursor = (datetime(2024, 1, 5), 1000)
+    problems = filters.find_sequential_scans(db.session, lambda conditions: _listing_statement(conditions, cursor))
+    assert problems == [], problems
+
+
+def test_full_scan_is_detected(app):
+    # Sem os índices que começam por 'user_id', toda consulta percorre
+    # a tabela: a verificação precisa acusar todos os casos.
+    for (name,) in db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'meal' AND name LIKE 'ix_meal_user_id%'"
+    )).all():
+        db.session.execute(text(f'DROP INDEX {name}'))
+    problems = filters.find_sequential_scans(db.session, _listing_statement)
+    assert len(problems) == len(filters.PLAN_CHECK_CASES)
@@ -0,0 +1,115 @@
+# tests/test_replicas.py
+"""
+Roteamento de leitura (app/replicas.py): dois arquivos SQLite, um de
+primário e outro de "réplica" (uma cópia do primário que não recebe as
+escritas seguintes, ou seja, atrasada).
+"""
+import shutil
+
+import pytest
+from sqlalchemy import insert, select, text
+
+from app import create_app, db, auth, cache, replicas
+from app.models import Meal
+from app.replicas import PRIMARY_PIN_HEADER
+from config import TestingConfig
+
+MEAL = {'name': 'Almoço', 'description': 'Arroz e feijão', 'meal_datetime': '2024-05-01T12:00:00', 'is_on_diet': True}
+
+
+def _replica_app(tmp_path, **settings):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+
+    class ReplicaTestingConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{primary}'
+        SQLALCHEMY_REPLICA_URIS = [f'sqlite:///{replica}']
+        CACHE_BACKEND = 'memory'
+
+    for key, value in settings.items():
+        setattr(ReplicaTestingConfig, key, value)
+    app = create_app(ReplicaTestingConfig)
+    with app.app_context():
+        db.create_all()
+        _, token = auth.create_user(db.session, 'leitor')
+        db.session.commit()
+        db.engine.dispose()
+    # A réplica começa igual ao primário (com o usuário).
+    shutil.copy(primary, replica)
+    return app, {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    app, headers = _replica_app(tmp_path)
+    yield app, headers
+    with app.app_context():
+        db.engine.dispose()
+        for replica in app.extensions['replicas'].replicas:
+            replica.engine.dispose()
+
+
+def _names(response):
+    return [meal['name'] for meal in response.get_json()['meals']]
+
+
+def test_session_sends_reads_to_the_replica_and_writes_to_the_primary(replica_app):
+    app, _ = replica_app
+    with app.app_context():
+        replica = app.extensions['replicas'].replicas[0]
+        replicas.route_reads(db.session, pinned=False)
+        assert db.session.get_bind(clause=select(Meal.id)) is replica.engine
+        assert db.session.get_bind(clause=insert(Meal)) is db.engine
+
+        # O flush do ORM também vai para o primário.
+        db.session.add(Meal(user_id=1, name='Jantar', meal_datetime=db.func.now(), is_on_diet=True))
+        db.session.commit()
+        with db.engine.connect() as connection:
+            assert connection.execute(text('SELECT count(*) FROM meal')).scalar() == 1
+        with replica.engine.connect() as connection:
+            assert connection.execute(text('SELECT count(*) FROM meal')).scalar() == 0
+
+
+def test_reads_go_to_the_replica_until_the_client_writes(replica_app):
+    app, headers = replica_app
+    client = app.test_client()
+    created = client.post('/api/v1/meals', headers=headers, json=MEAL)
+    assert created.status_code == 201
+
+    # Um cliente sem o "pin" lê da réplica atrasada.
+    other = app.test_client()
+    assert _names(other.get('/api/v1/meals', headers=headers)) == []
+
+    # Quem escreveu fica no primário (cookie) e vê a própria escrita...
+    assert _names(client.get('/api/v1/meals', headers=headers)) == ['Almoço']
+    # ...assim como um cliente sem cookies que reenvia o cabeçalho.
+    pinned = {**headers, PRIMARY_PIN_HEADER: created.headers[PRIMARY_PIN_HEADER]}
+    assert _names(other.get('/api/v1/meals', headers=pinned)) == ['Almoço']
+
+    stats = app.extensions['replicas'].stats()
+    assert stats['reads_on_replica'] == 1
+    assert stats['reads_on_primary'] == 2
+
+
+def test_replica_reads_do_not_populate_the_cache(replica_app):
+    app, headers = replica_app
+    client = app.test_client()
+    client.post('/api/v1/meals', headers=headers, json=MEAL)
+    other = app.test_client()
+    assert _names(other.get('/api/v1/meals', headers=headers)) == []
+    # A página velha da réplica não foi guardada para o cliente que escreveu.
+    assert _names(client.get('/api/v1/meals', headers=headers)) == ['Almoço']
+    with app.app_context():
+        assert cache.stats()['hits'] == 0
+
+
+def test_lagging_replica_falls_back_to_the_primary(tmp_path):
+    # Limite negativo: mesmo o atraso zero do SQLite passa dele.
+    app, headers = _replica_app(tmp_path, DB_REPLICA_MAX_LAG_SECONDS=-1)
+    client = app.test_client()
+    client.post('/api/v1/meals', headers=headers, json=MEAL)
+
+    other = app.test_client()
+    assert _names(other.get('/api/v1/meals', headers=headers)) == ['Almoço']
+    stats = app.extensions['replicas'].stats()
+    assert stats['reads_on_replica'] == 0
+    assert stats['replicas'][0]['healthy'] is False
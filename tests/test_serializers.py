@@ -0,0 +1,59 @@
+# tests/test_serializers.py
+"""
+O codificador compilado (app/serializers.py) deve gerar exatamente os
+mesmos bytes do FastJSONProvider, com e sem o orjson.
+"""
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+
+from app.json_provider import orjson
+from app.models import Meal, MEAL_FIELDS
+from app.serializers import encode_meals_page
+
+# Tupla com acesso por posição (o codificador) e por atributo (Meal.serialize).
+Row = namedtuple('Row', MEAL_FIELDS)
+
+ROWS = [
+    Row(1, 'Almoço', 'Arroz, feijão e salada', datetime(2024, 5, 1, 12, 0),
+        True, datetime(2024, 5, 1, 12, 5, 30, 123456), datetime(2024, 5, 1, 12, 5, 30, 123456)),
+    Row(2, 'Lanche "da tarde"', None, datetime(2024, 5, 1, 16, 30, 15),
+        False, datetime(2024, 5, 1, 16, 31), datetime(2024, 5, 2, 8, 0, 0, 1)),
+    Row(3, 'Café ☕ com pão \\ e 🍞', 'Linha 1\nLinha 2\t', datetime(1999, 12, 31, 23, 59, 59, 999999),
+        False, datetime(2024, 1, 1), datetime(2024, 1, 1))
+]
+
+PROJECTIONS = [
+    MEAL_FIELDS,
+    ('id', 'name'),
+    ('description', 'is_on_diet'),
+    ('meal_datetime', 'updated_at', 'id'),
+    ('is_on_diet',),
+]
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def provider(app, request):
+    if request.param == 'orjson' and orjson is None:
+        pytest.skip('orjson não está instalado')
+    provider = app.json
+    provider.use_orjson = request.param == 'orjson'
+    assert provider.is_compact()
+    return provider
+
+
+@pytest.mark.parametrize('fields', PROJECTIONS)
+@pytest.mark.parametrize('next_cursor', [None, 'MjAyNC0wNS0wMVQxMjowMDowMHwx'])
+def test_compiled_encoder_matches_provider(provider, fields, next_cursor):
+    expected = provider.dumps_body({
+        'meals': [Meal.serialize(row, fields) for row in ROWS],
+        'next_cursor': next_cursor
+    })
+    body = encode_meals_page(ROWS, MEAL_FIELDS, fields, next_cursor, provider.ensure_ascii, provider.sort_keys)
+    assert body.encode('utf-8') == expected.encode('utf-8')
+
+
+def test_compiled_encoder_matches_provider_on_empty_page(provider):
+    expected = provider.dumps_body({'meals': [], 'next_cursor': None})
+    assert encode_meals_page([], MEAL_FIELDS, MEAL_FIELDS, None) == expected
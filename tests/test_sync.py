@@ -0,0 +1,123 @@
+# tests/test_sync.py
+"""
+Sincronização incremental (GET /meals/changes, app/sync.py): janela de
+acomodação, lápides das remoções, tokens expirados e compactação.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from app import db, sync
+from app.models import MealTombstone, SyncBarrier
+from app.pagination import encode_sync_token
+
+MEAL = {'name': 'Almoço', 'description': 'Arroz e feijão', 'meal_datetime': '2024-05-01T12:00:00', 'is_on_diet': True}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Relógio do app/sync.py que só anda quando o teste manda.
+    """
+    class Clock(datetime):
+        offset = timedelta()
+
+        @classmethod
+        def utcnow(cls):
+            return datetime.utcnow() + cls.offset
+
+    monkeypatch.setattr(sync, 'datetime', Clock)
+    return Clock
+
+
+def _changes(client, headers, since=None):
+    query = {'since': since} if since else {}
+    response = client.get('/api/v1/meals/changes', headers=headers, query_string=query)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_recent_changes_wait_for_the_settle_window(app, client, user, clock):
+    app.config['MEALS_SYNC_SETTLE_SECONDS'] = 2
+    _, headers = user
+    client.post('/api/v1/meals', headers=headers, json=MEAL)
+
+    # Ainda dentro da janela: nada é entregue, mas o token avança até o horizonte.
+    early = _changes(client, headers)
+    assert early['changes'] == []
+    assert early['has_more'] is False
+
+    clock.offset = timedelta(seconds=3)
+    later = _changes(client, headers, early['next_token'])
+    assert [change['meal']['name'] for change in later['changes']] == ['Almoço']
+
+    # Nada novo depois do último token.
+    assert _changes(client, headers, later['next_token'])['changes'] == []
+
+
+def test_deleted_meals_come_back_as_tombstones(app, client, user):
+    app.config['MEALS_SYNC_SETTLE_SECONDS'] = 0
+    _, headers = user
+    created = client.post('/api/v1/meals', headers=headers, json=MEAL)
+    meal_id = created.get_json()['meal']['id']
+    first = _changes(client, headers)
+    assert [change['op'] for change in first['changes']] == ['upsert']
+
+    response = client.delete(f'/api/v1/meals/{meal_id}', headers={**headers, 'If-Match': created.headers['ETag']})
+    assert response.status_code == 204
+    assert db.session.execute(select(MealTombstone.meal_id)).scalars().all() == [meal_id]
+
+    after = _changes(client, headers, first['next_token'])
+    assert after['changes'] == [{'op': 'delete', 'id': meal_id}]
+    # Uma sincronização completa também entrega a remoção.
+    assert _changes(client, headers)['changes'] == [{'op': 'delete', 'id': meal_id}]
+
+
+def test_changes_are_paged_in_order(app, client, user):
+    app.config['MEALS_SYNC_SETTLE_SECONDS'] = 0
+    _, headers = user
+    for index in range(3):
+        client.post('/api/v1/meals', headers=headers, json={**MEAL, 'name': f'Refeição {index}'})
+
+    names, token = [], None
+    while True:
+        response = client.get('/api/v1/meals/changes', headers=headers, query_string={'limit': 2, **({'since': token} if token else {})})
+        page = response.get_json()
+        names += [change['meal']['name'] for change in page['changes']]
+        token = page['next_token']
+        if not page['has_more']:
+            break
+    assert names == ['Refeição 0', 'Refeição 1', 'Refeição 2']
+
+
+def test_token_older_than_the_retention_is_gone(app, client, user):
+    _, headers = user
+    retention = app.config['MEALS_TOMBSTONE_RETENTION_DAYS']
+    old = encode_sync_token(datetime.utcnow() - timedelta(days=retention, hours=1), sync.UPSERT, 1)
+    response = client.get('/api/v1/meals/changes', headers=headers, query_string={'since': old})
+    assert response.status_code == 410
+
+    recent = encode_sync_token(datetime.utcnow() - timedelta(days=retention - 1), sync.UPSERT, 1)
+    assert client.get('/api/v1/meals/changes', headers=headers, query_string={'since': recent}).status_code == 200
+
+
+def test_compact_tombstones_drops_only_expired_rows(app, user):
+    user_id, _ = user
+    retention = app.config['MEALS_TOMBSTONE_RETENTION_DAYS']
+    now = datetime.utcnow()
+    db.session.execute(insert(MealTombstone), [
+        {'user_id': user_id, 'meal_id': 1, 'deleted_at': now - timedelta(days=retention + 1)},
+        {'user_id': user_id, 'meal_id': 2, 'deleted_at': now - timedelta(days=retention - 1)},
+    ])
+    # Uma barreira vencida (importação que morreu no meio) e uma ativa.
+    db.session.execute(insert(SyncBarrier), [
+        {'user_id': user_id, 'started_at': now - timedelta(hours=2), 'expires_at': now - timedelta(hours=1)},
+        {'user_id': user_id, 'started_at': now, 'expires_at': now + timedelta(hours=1)},
+    ])
+    db.session.commit()
+
+    assert sync.compact_tombstones(db.session, retention) == 1
+    db.session.commit()
+    assert db.session.execute(select(MealTombstone.meal_id)).scalars().all() == [2]
+    assert db.session.execute(select(func.count()).select_from(SyncBarrier)).scalar() == 1